@@ -0,0 +1,146 @@
+#
+# PyAlgoGem Project
+# benchmarks/gemini_load_benchmark
+#
+# orders per second and latency of GeminiAPI against the local mock exchange
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyalgogem.deploy import GeminiAPI, AsyncGeminiAPI, MockGeminiExchange
+
+
+def make_orders(count, seed=0):
+    """Random btcusd orders, about half crossing the book (filled at once)"""
+    rng = np.random.RandomState(seed)
+    sides = np.where(rng.rand(count) < 0.5, 'buy', 'sell')
+    offsets = rng.uniform(-5, 5, count)
+    prices = np.where(sides == 'buy', 8000 + offsets, 8000 - offsets).round(2)
+    return [('btcusd', 0.01, float(price), str(side)) for price, side in zip(prices, sides)]
+
+
+def time_client_overhead(api, count):
+    """Microseconds per call to nonce/sign/serialize a payload and to parse a response"""
+    payload = {'request': '/v1/order/new', 'symbol': 'btcusd', 'amount': '0.01',
+               'price': '8000.0', 'side': 'buy', 'type': 'exchange limit'}
+    start = time.perf_counter()
+    for _ in range(count):
+        api.make_private_headers(dict(payload))
+    signing = (time.perf_counter() - start) / count * 1e6
+    response = json.dumps(dict(payload, order_id='1', is_live=True, is_cancelled=False,
+                               executed_amount='0', remaining_amount='0.01',
+                               avg_execution_price='0', timestampms=0))
+    start = time.perf_counter()
+    for _ in range(count):
+        json.loads(response)
+    parsing = (time.perf_counter() - start) / count * 1e6
+    return signing, parsing
+
+
+def timed(function):
+    """Wrap function to return (result, latency in ms)"""
+    def wrapper(*args):
+        started = time.perf_counter()
+        result = function(*args)
+        return result, (time.perf_counter() - started) * 1000
+    return wrapper
+
+
+def run_threads(api, orders, workers):
+    """Send orders from thread pool, returning latencies (ms) and seconds taken"""
+    send = timed(api.new_order)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda order: send(*order), orders))
+    return results, time.perf_counter() - start
+
+
+def run_async(url, orders, workers):
+    """Send orders from AsyncGeminiAPI, workers at a time"""
+    async def main():
+        api = AsyncGeminiAPI('mock-key', 'mock-secret', url=url, public_rate=None, private_rate=None,
+                             pool_maxsize=workers)
+        semaphore = asyncio.Semaphore(workers)
+
+        async def send(order):
+            async with semaphore:
+                started = time.perf_counter()
+                result = await api.new_order(*order)
+                return result, (time.perf_counter() - started) * 1000
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[send(order) for order in orders])
+        elapsed = time.perf_counter() - start
+        await api.close()
+        return results, elapsed
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def report(name, results, elapsed):
+    """Print orders/s and p50/p99 latency of run"""
+    latencies = np.array([latency for _, latency in results])
+    errors = sum(1 for result, _ in results if isinstance(result, dict) and result.get('result') == 'error')
+    print('{:<22}{:>8,}{:>12,.0f}{:>10.2f}{:>10.2f}{:>8}'.format(
+        name, len(results), len(results) / elapsed, np.percentile(latencies, 50),
+        np.percentile(latencies, 99), errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GeminiAPI load test against local mock exchange')
+    parser.add_argument('--orders', type=int, default=2000, help='number of orders per run')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32],
+                        help='concurrent requests of each run')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds of latency injected by mock exchange')
+    parser.add_argument('--jitter', type=float, default=0.002,
+                        help='max random seconds added to latency')
+    parser.add_argument('--no-async', action='store_true', help='skip AsyncGeminiAPI runs')
+    parser.add_argument('--lenient', action='store_true',
+                        help='accept any key and nonce (default rejects unknown keys and '
+                             'non-increasing nonces, as Gemini does)')
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders)
+    strict = not args.lenient
+    with MockGeminiExchange(latency=args.latency, jitter=args.jitter, update_rate=1, strict_nonce=strict,
+                            keys={'mock-key': 'mock-secret'} if strict else None) as exchange:
+        api = GeminiAPI('mock-key', 'mock-secret', url=exchange.url, public_rate=None,
+                        private_rate=None, pool_maxsize=max(args.workers))
+        signing, parsing = time_client_overhead(api, 20000)
+        print('client overhead: sign+serialize {:.1f} us, parse response {:.1f} us'.format(signing,
+                                                                                          parsing))
+        print('injected latency: {:.1f} ms + up to {:.1f} ms jitter'.format(args.latency * 1000,
+                                                                             args.jitter * 1000))
+        print('nonces: {}\n'.format('strict (errors - rejected requests)' if strict else 'not checked'))
+        print('{:<22}{:>8}{:>12}{:>10}{:>10}{:>8}'.format('run', 'orders', 'orders/s', 'p50 ms',
+                                                          'p99 ms', 'errors'))
+        for workers in args.workers:
+            report('threads x{}'.format(workers), *run_threads(api, orders, workers))
+        if not args.no_async:
+            for workers in args.workers:
+                report('async x{}'.format(workers), *run_async(exchange.url, orders, workers))
+        api.close()
+        server = exchange.get_stats('order/new')
+        print('\nserver handling time (order/new): p50 {:.1f} ms, p99 {:.1f} ms over {:,} requests'.format(
+            server['p50'], server['p99'], server['count']))
+
+
+if __name__ == '__main__':
+    main()
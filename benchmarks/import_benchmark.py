@@ -0,0 +1,86 @@
+#
+# PyAlgoGem Project
+# benchmarks/import_benchmark
+#
+# time taken by 'import pyalgogem' and heavy modules it loads
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# third-party modules 'import pyalgogem' must not load
+HEAVY_MODULES = ['pandas', 'numpy', 'tables', 'tstables', 'requests', 'scipy', 'sklearn',
+                 'pyarrow']
+
+# imports to time, each in a fresh interpreter
+STATEMENTS = ['import pyalgogem',
+              'import pyalgogem.deploy; pyalgogem.deploy.GeminiAPI',
+              'import pyalgogem.data; pyalgogem.data.read_datafile',
+              'import pyalgogem; pyalgogem.AlgorithmEnvironment']
+
+# run by each fresh interpreter: time statement, report loaded heavy modules
+TIMER = '''
+import sys, time, json
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+loaded = [name for name in {modules!r} if name in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'loaded': loaded}}))
+'''
+
+
+def time_import(statement, repeat):
+    """
+    Best time of statement over repeat fresh interpreters, and
+    heavy modules it loads (None and error message if it fails)
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get('PYTHONPATH', '')]))
+    best, loaded = None, list()
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, '-c', TIMER.format(statement=statement, modules=HEAVY_MODULES)],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            # e.g. dependency missing from this environment
+            return None, process.stderr.decode().strip().splitlines()[-1:]
+        result = json.loads(process.stdout.decode().strip().splitlines()[-1])
+        if best is None or result['seconds'] < best:
+            best = result['seconds']
+        loaded = result['loaded']
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="'import pyalgogem' startup benchmark")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='fresh interpreters per statement (best time is shown)')
+    parser.add_argument('--max-seconds', type=float, default=0.05,
+                        help="fail if 'import pyalgogem' takes longer")
+    args = parser.parse_args()
+
+    print('{:<55}{:>10}  {}'.format('statement', 'ms', 'heavy modules loaded'))
+    failed = False
+    for statement in STATEMENTS:
+        seconds, loaded = time_import(statement, args.repeat)
+        if seconds is None:
+            print('{:<55}{:>10}  {}'.format(statement, 'error', ''.join(loaded)))
+            failed = failed or statement == 'import pyalgogem'
+            continue
+        print('{:<55}{:>10.1f}  {}'.format(statement, seconds * 1000, ', '.join(loaded) or '-'))
+        if statement == 'import pyalgogem':
+            failed = seconds > args.max_seconds or len(loaded) > 0
+
+    if failed:
+        print("\n'import pyalgogem' regressed: must load no heavy modules "
+              'and take at most {:.0f} ms'.format(args.max_seconds * 1000))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#
+# PyAlgoGem Project
+# benchmarks/order_book_benchmark
+#
+# updates and queries per second of the local L2 order book
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyalgogem.deploy import OrderBook
+
+
+def synthetic_updates(count, levels, tick=0.01, seed=0):
+    """
+    Random level changes around a mid price of 10000, most of
+    them close to the top of the book as in live markets
+    """
+    rng = np.random.RandomState(seed)
+    sides = np.where(rng.rand(count) < 0.5, 'bid', 'ask')
+    distance = np.minimum(rng.geometric(0.05, count) - 1, levels - 1)
+    prices = np.where(sides == 'bid', 10000 - tick * (distance + 1), 10000 + tick * distance)
+    amounts = np.where(rng.rand(count) < 0.3, 0., np.round(rng.rand(count) * 5, 4))
+    return list(zip(sides.tolist(), np.round(prices, 2).tolist(), amounts.tolist()))
+
+
+def seed_book(book, levels, tick=0.01):
+    """Load snapshot of levels price levels on each side"""
+    book.load_snapshot({'bids': [{'price': str(round(10000 - tick * (i + 1), 2)), 'amount': '1'}
+                                 for i in range(levels)],
+                        'asks': [{'price': str(round(10000 + tick * i, 2)), 'amount': '1'}
+                                 for i in range(levels)]})
+
+
+def time_calls(function, count):
+    """Calls per second of function over count calls"""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local L2 order book benchmark')
+    parser.add_argument('--updates', type=int, default=200000,
+                        help='number of level changes to apply')
+    parser.add_argument('--levels', type=int, default=1000,
+                        help='price levels of each side of seeded book')
+    args = parser.parse_args()
+
+    updates = synthetic_updates(args.updates, args.levels)
+    book = OrderBook('btcusd')
+    seed_book(book, args.levels)
+    start = time.perf_counter()
+    for side, price, amount in updates:
+        book.update(side, price, amount)
+    elapsed = time.perf_counter() - start
+    print('{:,} updates on {:,}-level book: {:,.0f} updates/s ({:.2f} us/update)'.format(
+        args.updates, args.levels, args.updates / elapsed, elapsed / args.updates * 1e6))
+    print('book after updates: {:,} levels'.format(len(book)))
+
+    queries = [('best bid/ask', lambda: (book.get_best_bid(), book.get_best_ask())),
+               ('mid', book.get_mid),
+               ('microprice (1 level)', book.get_microprice),
+               ('microprice (10 levels)', lambda: book.get_microprice(10)),
+               ('depth (50 levels)', lambda: book.get_depth('bid', 50)),
+               ('fill price (5 amounts)', lambda: book.get_fill_price('ask', [1, 5, 10, 50, 100]))]
+    print('\n{:<26}{:>14}'.format('query', 'queries/s'))
+    for name, function in queries:
+        print('{:<26}{:>14,.0f}'.format(name, time_calls(function, 20000)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#
+# PyAlgoGem Project
+# benchmarks/storage_benchmark
+#
+# file size and read throughput of HDF5 storage settings
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# run from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyalgogem.data as data
+
+# (complib, complevel, shuffle) settings to compare
+SETTINGS = [(None, 0, False),
+            ('zlib', 5, True),
+            ('blosc', 5, True),
+            ('blosc:lz4', 5, True),
+            ('blosc:lz4', 9, True),
+            ('blosc:zstd', 5, True),
+            ('blosc:zstd', 9, True)]
+
+WINDOWS = {'daily': ('D', 3 * 365),
+           'hourly': ('H', 2 * 365 * 24),
+           'minute': ('T', 90 * 24 * 60)}
+
+
+def synthetic_bars(freq, periods, seed=0):
+    """Random-walk OHLCV bars in the CryptoCompareTable column order"""
+    rng = np.random.RandomState(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.001, periods)))
+    spread = np.abs(rng.normal(0, 0.002, periods)) * close
+    vol_from = np.abs(rng.normal(10, 3, periods))
+    index = pd.date_range('2015-01-01', periods=periods, freq=freq)
+    return pd.DataFrame({'close': close,
+                         'high': close + spread,
+                         'low': close - spread,
+                         'open': np.roll(close, 1),
+                         'vol_from': vol_from,
+                         'vol_to': vol_from * close},
+                        index=index,
+                        columns=['close', 'high', 'low', 'open', 'vol_from', 'vol_to'])
+
+
+def run_setting(directory, bars, complib, complevel, shuffle, chunkshape):
+    """Write bars with one setting, return file size and read throughput"""
+    name = os.path.join(directory, 'bench_{}_{}.h5'.format(str(complib).replace(':', '-'), complevel))
+    data.create_datafile(name, complib=complib, complevel=complevel,
+                         shuffle=shuffle, chunkshape=chunkshape)
+    data.append_to_datafile('BTC', bars, file=name)
+    size = os.path.getsize(name)
+    start = time.perf_counter()
+    dataset = data.read_datafile('BTC', file=name)
+    elapsed = time.perf_counter() - start
+    data.remove_datafile(name)
+    return size, len(dataset) / elapsed, dataset.values.nbytes / elapsed / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HDF5 storage settings benchmark')
+    parser.add_argument('--chunkshape', type=int, default=None,
+                        help='rows per HDF5 chunk (default: PyTables choice)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for window, (freq, periods) in WINDOWS.items():
+            bars = synthetic_bars(freq, periods)
+            print('\n{} bars: {:,} rows'.format(window, len(bars)))
+            print('{:<12}{:>6}{:>9}{:>12}{:>14}{:>10}'.format(
+                'complib', 'level', 'shuffle', 'size (MB)', 'rows/s', 'MB/s'))
+            for complib, complevel, shuffle in SETTINGS:
+                size, rows_s, mb_s = run_setting(directory, bars, complib, complevel,
+                                                 shuffle, args.chunkshape)
+                print('{:<12}{:>6}{:>9}{:>12.2f}{:>14,.0f}{:>10.1f}'.format(
+                    str(complib), complevel, str(shuffle), size / 2 ** 20, rows_s, mb_s))
+
+
+if __name__ == '__main__':
+    main()
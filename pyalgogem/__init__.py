@@ -7,4 +7,8 @@
 # Andrew Edmonds - 2018
 #
 
-from .base import AlgorithmEnvironment
+from ._lazy_loader import lazy_attributes
+
+# subpackages and their heavy dependencies are imported on first access
+lazy_attributes(__name__, {'.base': ['AlgorithmEnvironment']},
+                subpackages=['base', 'data', 'deploy', 'performance', 'strategy'])
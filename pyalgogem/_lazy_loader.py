@@ -0,0 +1,61 @@
+#
+# PyAlgoGem Project
+# lazy_loader
+#
+# import public attributes of packages on first access
+#
+# Andrew Edmonds - 2018
+#
+
+import sys
+import types
+import importlib
+
+
+class LazyModule(types.ModuleType):
+    """
+    Package module importing its public attributes (and
+    subpackages) from their modules on first access
+    -keeps 'import pyalgogem' from loading pandas, PyTables,
+    requests, scipy, ... until they are used
+    """
+
+    def __getattr__(self, name):
+        attributes = self.__dict__.get('_lazy_attributes', dict())
+        if name not in attributes:
+            raise AttributeError("module '{}' has no attribute '{}'".format(self.__name__, name))
+        module_name, attribute = attributes[name]
+        module = importlib.import_module(module_name, self.__name__)
+        value = module if attribute is None else getattr(module, attribute)
+        # later lookups find the attribute without calling __getattr__
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self.__dict__.get('_lazy_attributes', dict())))
+
+
+def lazy_attributes(package, modules=None, subpackages=None):
+    """
+    Make public attributes of package load on first access
+
+    Parameters
+    ==========
+    package : str
+        name of package, i.e. __name__ of its __init__
+    modules : dict
+        relative module name -> list of attributes
+        it provides, e.g. {'._dataset': ['Dataset']}
+    subpackages : list
+        names of subpackages imported on first access
+    """
+    attributes = dict()
+    for module_name, names in (modules or dict()).items():
+        for name in names:
+            attributes[name] = (module_name, name)
+    for name in subpackages or list():
+        attributes[name] = ('.' + name, None)
+    module = sys.modules[package]
+    module._lazy_attributes = attributes
+    module.__all__ = sorted(attributes)
+    module.__class__ = LazyModule
@@ -7,4 +7,6 @@
 # Andrew Edmonds - 2018
 #
 
-from ._algorithm_environment import AlgorithmEnvironment
+from pyalgogem._lazy_loader import lazy_attributes
+
+lazy_attributes(__name__, {'._algorithm_environment': ['AlgorithmEnvironment']})
@@ -13,15 +13,12 @@ import pyalgogem.deploy as deploy
 import pyalgogem.performance as performance
 import pyalgogem.strategy as strategy
 
-from pandas import DataFrame
+from pandas import DataFrame, MultiIndex
+from concurrent.futures import ThreadPoolExecutor
 
+import time
 import configparser
 
-config = configparser.ConfigParser()
-config.read('my_keys.cfg')
-
-SYMBOLS = ['BTC', 'ETH']
-
 
 class AlgorithmEnvironment(object):
     """
@@ -29,7 +26,7 @@ class AlgorithmEnvironment(object):
     Using the CryptoCompare API, HDF5, Sci-kit Learn, and Gemini exchange
     """
 
-    def __init__(self, sandbox=True, debug=False):
+    def __init__(self, sandbox=True, debug=False, config_file='my_keys.cfg'):
         """
         Creates container environment to store all data
         for algorithm development, backtesting, and deploy
@@ -40,11 +37,15 @@ class AlgorithmEnvironment(object):
             set to using sandbox account or live account
         debug : bool
             if true, print requests and function outputs
+        config_file : str
+            name of config file with Gemini API keys
+            -read on construction
 
         Attributes
         ==========
         symbol : str
             symbol of currency to be used - must be
+            registered in data symbol registry, e.g.
             -BTC : Bitcoin
             -ETH : Ethereum
         window : str
@@ -85,11 +86,27 @@ class AlgorithmEnvironment(object):
             -data will be written to currently selected data file
         update_all_historical_all :
             -load all available historical data available for
-            the all symbols for selected window timeframe
+            all registered symbols and windows in parallel
             -data will be written to currently selected data file
+            through a single background writer
+        backfill_historical :
+            -retrieve bars missing from the middle of the
+            stored timeseries and insert them in order
+        sync_trades :
+            -download public Gemini trades into local
+            tick-level trade store
+        backfill_trades :
+            -download public Gemini trades of a time range
+            concurrently into local trade store
         read_stored_data :
             -retrieve all (or subset) of locally-saved
             data into Dataset object
+        read_mirrored_data :
+            -memory-map locally-saved columnar mirror
+            into Dataset object reading the arrays in place
+        backtest_stored_data :
+            -run indicator's backtest over locally-saved
+            data in chunks, in fixed memory
         new_strategy :
             returns Strategy object
             -creates new Strategy object to use for housing
@@ -97,6 +114,9 @@ class AlgorithmEnvironment(object):
         """
 
         # ensure valid Gemini API keys in config file
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        self.__key = self.__secret_key = ''
         try:
             self.__key = config['gemini']['key']
             self.__secret_key = config['gemini']['secret_key']
@@ -150,14 +170,11 @@ class AlgorithmEnvironment(object):
 
     @symbol.setter
     def symbol(self, new_symbol):
-        """Only allow 'ETH', 'BTC' or 'None'"""
-        symbol_str = str(new_symbol)
+        """Only allow registered symbols or 'None'"""
         if new_symbol is None:
             self.__symbol = new_symbol
-        elif symbol_str.upper() not in SYMBOLS:
-            raise ValueError("Symbol must be BTC or ETH")
         else:
-            self.__symbol = new_symbol.upper()
+            self.__symbol = data.registry.ensure_symbol(new_symbol)
 
     @property
     def window(self):
@@ -169,10 +186,8 @@ class AlgorithmEnvironment(object):
         """Only allow 'D', 'H', or 'M'"""
         if new_window is None:
             self.__window = None
-        elif new_window.upper() in ['D', 'H', 'M']:
-            self.__window = new_window.upper()
         else:
-            raise ValueError("Time window must be: 'D', 'H', 'M'")
+            self.__window = data.registry.ensure_window(new_window)
 
     @property
     def dataset(self):
@@ -218,56 +233,228 @@ class AlgorithmEnvironment(object):
         to currently-selected data-file
         """
         self.check_key_attributes()
-        hist_df = None
-        if self.window == 'D':
-            hist_df = self.CC.historical_price_daily(self.symbol)
-        elif self.window == 'H':
-            hist_df = self.CC.historical_price_hourly(self.symbol)
-        elif self.window == 'M':
-            hist_df = self.CC.historical_price_minute(self.symbol)
+        new_df = self.get_new_historical(self.symbol, self.window)
+        # as long as there is new data to add, add to datafile
+        if new_df is not None:
+            data.append_to_datafile(symbol=self.symbol, data=new_df, file=self.file,
+                                    window=self.window)
+            print('All available historical data for {} has been successfully loaded!'.
+                  format(self.symbol))
+
+    def update_historical_all(self, windows=None, max_workers=4):
+        """
+        Retrieve all possible available data from CryptoCompare
+        for every registered symbol and window in parallel, and
+        append missing values to currently-selected data-file
+        -requests run on a thread pool, while all writes go
+        through a single background DatafileWriter
+        -self.symbol and self.window are left unchanged
+
+        Parameters
+        ==========
+        windows : list of str
+            time windows to update - default: all windows
+        max_workers : int
+            number of requests running at the same time
+
+        Returns
+        =======
+        return : DataFrame
+            rows added and seconds elapsed per (symbol, window)
+        """
+        if not self.file:
+            raise ValueError('Ensure you have chosen a local file')
+        if not (isinstance(max_workers, int) and max_workers > 0):
+            raise ValueError('max_workers must be a positive integer')
+        windows = data.registry.windows if windows is None else \
+            [data.registry.ensure_window(window) for window in windows]
+        pairs = [(symbol, window) for symbol in data.get_symbols() for window in windows]
+        # stored ranges are read up front, as the file is
+        # written to while the requests are running
+        stored = {pair: data.get_minmax_daterange(pair[0], self.file, window=pair[1])
+                  for pair in pairs}
+        started = time.time()
+
+        def update_pair(pair):
+            pair_started = time.time()
+            symbol, window = pair
+            hist_df = self.get_historical(symbol, window)
+            new_df = None
+            if hist_df is not None:
+                old_min, old_max = stored[pair] or (None, None)
+                new_df = data.select_new_values(dataframe=hist_df, old_min=old_min,
+                                                old_max=old_max)
+            if new_df is not None and len(new_df) > 0:
+                writer.put(symbol, new_df, window=window)
+            rows = 0 if new_df is None else len(new_df)
+            return rows, time.time() - pair_started
+
+        with data.DatafileWriter(self.file, flush_interval=0.5) as writer:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(update_pair, pairs))
+        summary = DataFrame(results, columns=['rows', 'seconds'],
+                            index=MultiIndex.from_tuples(pairs, names=['symbol', 'window']))
+        print(summary)
+        print('{} rows added for {} symbol/window pairs in {:.1f}s'.format(
+            summary['rows'].sum(), len(pairs), time.time() - started))
+        return summary
+
+    def get_historical(self, symbol, window):
+        """
+        Retrieve all possible available data for
+        symbol and window from CryptoCompare
+
+        Returns
+        =======
+        return : DataFrame
+            retrieved data (None if unable to connect)
+        """
+        if window == 'D':
+            return self.CC.historical_price_daily(symbol)
+        elif window == 'H':
+            return self.CC.historical_price_hourly(symbol)
+        elif window == 'M':
+            return self.CC.historical_price_minute(symbol)
+
+    def get_new_historical(self, symbol, window):
+        """
+        Retrieve all possible available data for symbol
+        and window from CryptoCompare, and select values
+        not yet stored in currently-selected data-file
+
+        Returns
+        =======
+        return : DataFrame
+            new values (None if no new data found)
+        """
+        hist_df = self.get_historical(symbol, window)
         if hist_df is None:
             print('No data saved locally')
             return
-        old_min, old_max = data.get_minmax_daterange(self.symbol, self.file)
+        old_min, old_max = data.get_minmax_daterange(symbol, self.file, window=window)
         # select subset of data that isn't within range of old min/max
         new_df = data.select_new_values(dataframe=hist_df, old_min=old_min, old_max=old_max)
-        # as long as there is new data to add, add to datafile
         if new_df is None:
             print('No new data for {} found - no data saved locally'.
-                  format(self.symbol))
-        else:
-            data.append_to_datafile(symbol=self.symbol, data=new_df)
-            print('All available historical data for {} has been successfully loaded!'.
-                  format(self.symbol))
+                  format(symbol))
+        return new_df
 
-    def update_historical_all(self):
+    def backfill_historical(self, max_workers=4):
         """
-        Retrieve all possible available daily
-        from CryptoCompare for both symbols and
-        append missing values to currently-selected data-file
+        Retrieve bars missing from the middle of the currently-selected
+        symbol and window's stored timeseries (see data.get_gaps())
+        from CryptoCompare in parallel, and insert them in order
+
+        Parameters
+        ==========
+        max_workers : int
+            number of requests running at the same time
+        """
+        self.check_key_attributes()
+        symbol, window = self.symbol, self.window
+        summary = data.backfill_datafile(symbol, lambda start, end: self.get_historical_range(
+            symbol, window, start, end), file=self.file, window=window, max_workers=max_workers)
+        print('{} of {} gaps requested, {} rows inserted for {}'.format(
+            summary['requests'], summary['gaps'], summary['rows'], symbol))
+        return summary
+
+    def get_historical_range(self, symbol, window, start, end):
         """
-        if self.window is None:
-            raise ValueError('Must have a valid window selected')
-        old_symbol = self.symbol
-        for symbol in SYMBOLS:
-            self.symbol = symbol
-            self.update_historical()
-        self.symbol = old_symbol
+        Retrieve data for symbol and window between
+        start and end (datetime) from CryptoCompare
 
-    def read_stored_data(self, start=None, end=None, all_data=True):
+        Returns
+        =======
+        return : DataFrame
+            bars ending at end (None if unable to connect)
+        """
+        seconds = {'D': 86400, 'H': 3600, 'M': 60}[window]
+        limit = max(int((end - start).total_seconds() // seconds), 1)
+        to_ts = end.timestamp()
+        if window == 'D':
+            return self.CC.historical_price_daily(symbol, all_data=False, limit=limit, to_ts=to_ts)
+        elif window == 'H':
+            return self.CC.historical_price_hourly(symbol, limit=limit, to_ts=to_ts)
+        elif window == 'M':
+            return self.CC.historical_price_minute(symbol, limit=limit, to_ts=to_ts)
+
+    def sync_trades(self, symbol='btcusd', since=None):
+        """
+        Download public Gemini trades of symbol (e.g. 'btcusd')
+        since the last stored trade into the trade file next to
+        the currently-selected data-file (data_trades.h5)
+        -read them back with data.read_trades(symbol, file=ae.file)
+        """
+        if not self.file:
+            raise ValueError('Ensure you have chosen a local file')
+        return data.sync_trades(self.GEM, symbol, file=self.file, since=since)
+
+    def backfill_trades(self, symbol, start, end=None, max_workers=4):
+        """
+        Download public Gemini trades of symbol between start
+        and end (default now), hourly sub-ranges concurrently,
+        into the trade file next to the currently-selected
+        data-file (trades already stored are skipped)
+        """
+        if not self.file:
+            raise ValueError('Ensure you have chosen a local file')
+        return data.backfill_trades(self.GEM, symbol, start, end=end, file=self.file,
+                                    max_workers=max_workers)
+
+    def read_stored_data(self, start=None, end=None, all_data=True, columns=None, level=None):
         """
         Load available locally-stored data into
         self.data_raw attribute
         -Can select subset of timeseries as ts object
+        -Can select subset of columns, e.g. ['close'],
+        which is all the Dataset and indicators need
+        -Can select pre-aggregated bar level built from
+        minute data: '1m', '5m', '15m', '1h', '4h', '1d'
         """
         self.check_key_attributes()
         if start or end:
             all_data = False
         self.dataset = data.read_datafile(symbol=self.symbol, start=start, end=end,
-                                          file=self.file, all_data=all_data)
+                                          file=self.file, all_data=all_data, columns=columns,
+                                          level=level, window=self.window)
         if self.dataset is not None:
             print("Data has been loaded into 'dataset' object!")
 
+    def read_mirrored_data(self, start=None, end=None, columns=None):
+        """
+        Load locally-stored data from columnar mirror
+        into Dataset object using memory-mapped arrays
+        -mirror is created on first use and kept in sync
+        on each append to the data file
+        """
+        self.check_key_attributes()
+        if not data.has_mirror(self.symbol, self.file, window=self.window):
+            data.create_mirror(self.symbol, self.file, window=self.window)
+        arrays = data.load_mirror(self.symbol, start=start, end=end, file=self.file,
+                                  columns=columns, window=self.window)
+        if arrays is not None:
+            self.dataset = strategy.Dataset.from_memmap(arrays)
+            print("Data has been loaded into 'dataset' object!")
+
+    def backtest_stored_data(self, indicator, start=None, end=None, rows=100000):
+        """
+        Run backtest of indicator over locally-saved data
+        streamed from disk in chunks of rows, so long histories
+        (e.g. years of minute data) run in fixed memory
+        -indicator can be created without dataset, e.g.
+        strategy.IndicatorSMA(50, 200, dataset=None, symbol='BTC')
+
+        Returns
+        =======
+        return : tuple
+            absolute and out/under performance as
+            returned by indicator.execute_strategy()
+        """
+        self.check_key_attributes()
+        chunks = data.iter_datafile(self.symbol, start=start, end=end, file=self.file, rows=rows,
+                                    columns=['close'], window=self.window)
+        return indicator.execute_strategy_chunked(chunks)
+
     def new_sma_indicator(self, sma1, sma2):
         """
         Create a new IndicatorSMA object
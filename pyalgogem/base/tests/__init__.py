@@ -0,0 +1,8 @@
+#
+# PyAlgoGem Project
+# base/tests/
+#
+# tests of the algorithm environment
+#
+# Andrew Edmonds - 2018
+#
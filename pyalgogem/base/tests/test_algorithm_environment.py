@@ -0,0 +1,70 @@
+#
+# PyAlgoGem Project
+# base/tests/test_algorithm_environment
+#
+# tests of parallel historical updates of the algorithm environment
+#
+# Andrew Edmonds - 2018
+#
+
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyalgogem.base import AlgorithmEnvironment
+from pyalgogem.data import read_datafile
+
+FREQS = {'D': 'D', 'H': '60min', 'M': 'min'}
+
+
+def make_history(symbol, window, periods):
+    """Bars as returned by CryptoCompareAPI"""
+    close = np.linspace(100, 200, periods) * (1 if symbol == 'BTC' else 0.1)
+    index = pd.date_range('2018-01-01', periods=periods, freq=FREQS[window])
+    return pd.DataFrame({'close': close, 'high': close, 'low': close, 'open': close,
+                         'volumefrom': np.ones(periods), 'volumeto': close}, index=index)
+
+
+@pytest.fixture
+def env(tmpdir, monkeypatch):
+    # data file is created in the working directory
+    monkeypatch.chdir(tmpdir)
+    tmpdir.join('my_keys.cfg').write('[gemini]\nkey = mock-key\nsecret_key = mock-secret\n')
+    return AlgorithmEnvironment(config_file=str(tmpdir.join('my_keys.cfg')))
+
+
+def test_update_historical_all(env):
+    periods = {'D': 30, 'H': 48, 'M': 120}
+    lock = threading.Lock()
+    running = {'now': 0, 'max': 0}
+
+    def get_historical(symbol, window):
+        with lock:
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+        time.sleep(0.05)
+        with lock:
+            running['now'] -= 1
+        return make_history(symbol, window, periods[window])
+
+    env.get_historical = get_historical
+    summary = env.update_historical_all(max_workers=3)
+    assert running['max'] > 1
+    assert len(summary) == 6
+    for (symbol, window), rows in summary['rows'].items():
+        assert rows == periods[window]
+        stored = read_datafile(symbol, file=env.file, window=window)
+        assert np.allclose(stored.values, make_history(symbol, window, periods[window]).values)
+    # selected symbol and window are left unchanged
+    assert env.symbol is None and env.window == 'D'
+    # nothing new on second run
+    assert env.update_historical_all(windows=['M'], max_workers=3)['rows'].sum() == 0
+
+
+def test_update_historical_all_checks_arguments(env):
+    with pytest.raises(ValueError):
+        env.update_historical_all(max_workers=0)
+    with pytest.raises(ValueError):
+        env.update_historical_all(windows=['W'])
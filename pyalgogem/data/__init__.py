@@ -7,8 +7,23 @@
 # Andrew Edmonds - 2018
 #
 
-from ._hdf5_access import append_to_datafile, read_datafile, get_minmax_daterange
-from ._cryptocompare_api import CryptoCompareAPI
-from ._helper_functions import ensure_datetime, ensure_hdf5, get_minmax_dataframe, \
-    get_minmax_timeseries, select_new_values
-from ._file_management import create_datafile, copy_datafile, remove_datafile
+from pyalgogem._lazy_loader import lazy_attributes
+
+lazy_attributes(__name__, {
+    '._symbol_registry': ['SymbolRegistry', 'registry', 'register_symbol', 'get_symbols'],
+    '._hdf5_access': ['append_to_datafile', 'append_to_datafiles', 'read_datafile', 'read_datafiles',
+                      'iter_datafile', 'get_minmax_daterange', 'get_datafile_metadata',
+                      'rebuild_metadata'],
+    '._cryptocompare_api': ['CryptoCompareAPI'],
+    '._helper_functions': ['ensure_datetime', 'ensure_hdf5', 'get_minmax_dataframe',
+                           'get_minmax_timeseries', 'select_new_values', 'make_filters'],
+    '._file_management': ['create_datafile', 'copy_datafile', 'remove_datafile', 'repack_datafile',
+                          'migrate_datafile'],
+    '._columnar_mirror': ['create_mirror', 'remove_mirror', 'load_mirror', 'has_mirror'],
+    '._bar_pyramid': ['build_pyramid'],
+    '._append_writer': ['DatafileWriter'],
+    '._gap_index': ['get_gaps', 'insert_to_datafile', 'backfill_datafile'],
+    '._parquet_io': ['export_parquet', 'import_parquet'],
+    '._trade_store': ['store_trades', 'sync_trades', 'backfill_trades', 'read_trades',
+                      'get_trades_metadata'],
+    '._bar_builder': ['BarBuilder', 'build_bars']})
@@ -0,0 +1,263 @@
+#
+# PyAlgoGem Project
+# data/append_writer
+#
+# single background writer coalescing appends to an HDF5 file
+#
+# Andrew Edmonds - 2018
+#
+
+import time
+import queue
+import threading
+import tables as tb
+
+from collections import OrderedDict
+from pandas import DataFrame, concat
+
+from ._hdf5_access import write_frames, get_minmax_metadata
+from ._gap_index import get_timestamps
+from ._columnar_mirror import append_to_mirror
+from ._helper_functions import ensure_hdf5, convert_datetime_to_timestamp
+from ._symbol_registry import registry
+
+
+class DatafileWriter(object):
+    """
+    Background thread owning all appends to one HDF5 file
+    -producers (historical updaters, live recorders, ...) enqueue
+    DataFrames with put() from any thread
+    -queued frames are coalesced per symbol/window and written in
+    batches with a single file open per flush
+    -rows at or before the last stored row are dropped, so frames
+    kept after a failed write can safely be put again
+
+    Attributes
+    ==========
+    file : str
+        name of HDF5 file
+    flush_interval : float
+        seconds to wait for more data before writing a batch
+    flush_rows : int
+        number of queued rows that triggers a write right away
+    max_queue : int
+        max number of frames waiting in queue (0 - unbounded)
+        -put() blocks while queue is full
+    pyramid : bool
+        also update pre-aggregated bar levels of minute data
+        -default: only for minute window
+
+    Methods
+    =======
+    start :
+        -start writer thread
+    stop :
+        -write all queued data and stop writer thread
+    put :
+        -enqueue DataFrame for symbol/window
+    flush :
+        -write all queued data and wait until done
+    get_failed :
+        -frames that failed to write
+    get_stats :
+        -queue depth and flush latency of writer
+    """
+
+    def __init__(self, file='data.h5', flush_interval=1.0, flush_rows=10000, max_queue=0,
+                 pyramid=None):
+        if flush_interval <= 0:
+            raise ValueError('Flush interval must be positive')
+        if flush_rows < 1:
+            raise ValueError('Flush rows must be at least 1')
+        self.file = ensure_hdf5(str(file))
+        self.flush_interval = float(flush_interval)
+        self.flush_rows = int(flush_rows)
+        self.pyramid = pyramid
+        self.__queue = queue.Queue(maxsize=max_queue)
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.__failed = list()
+        self.__stats = {'flushes': 0, 'rows_written': 0, 'rows_dropped': 0, 'errors': 0,
+                        'last_flush_latency': None, 'max_flush_latency': None,
+                        'total_flush_latency': 0.0}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def running(self):
+        """Writer thread is running"""
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """Start writer thread"""
+        if self.running:
+            return
+        self.__thread = threading.Thread(target=self.__run, name='DatafileWriter', daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout=None):
+        """Write all queued data and stop writer thread"""
+        if not self.running:
+            return
+        done = threading.Event()
+        self.__queue.put((None, done))
+        done.wait(timeout)
+        self.__thread.join(timeout)
+        self.__thread = None
+
+    def put(self, symbol, data, window='D'):
+        """
+        Enqueue data (DataFrame) to be appended
+        to symbol/window's timeseries
+        """
+        symbol = registry.ensure_symbol(symbol)
+        window = registry.ensure_window(window)
+        if not isinstance(data, DataFrame):
+            raise ValueError('Data must be Pandas DataFrame')
+        if not self.running:
+            raise ValueError('Writer is not running - call start()')
+        if len(data) > 0:
+            self.__queue.put(((symbol, window), data))
+
+    def flush(self, timeout=None):
+        """Write all queued data and wait until done"""
+        if not self.running:
+            return
+        done = threading.Event()
+        self.__queue.put((False, done))
+        done.wait(timeout)
+
+    def get_stats(self):
+        """
+        Get statistics of writer
+
+        Returns
+        =======
+        return : dict
+            queue_depth : frames waiting in queue
+            flushes : number of batches written
+            rows_written : number of rows written
+            rows_dropped : rows not newer than stored data
+            errors : number of failed symbol/window writes
+            failed : frames kept after failed writes
+            last_flush_latency : seconds taken by last batch
+            mean_flush_latency : mean seconds per batch
+            max_flush_latency : max seconds taken by a batch
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats['failed'] = len(self.__failed)
+        total = stats.pop('total_flush_latency')
+        stats['mean_flush_latency'] = total / stats['flushes'] if stats['flushes'] else None
+        stats['queue_depth'] = self.__queue.qsize()
+        return stats
+
+    def get_failed(self, clear=True):
+        """
+        List of (symbol, window, DataFrame) that failed to write
+        -put() them again to retry once the cause is fixed
+        """
+        with self.__lock:
+            failed = list(self.__failed)
+            if clear:
+                self.__failed = list()
+        return failed
+
+    def __run(self):
+        """Collect queued frames and write them in batches"""
+        pending = OrderedDict()
+        pending_rows = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            try:
+                key, item = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                key, item = False, None
+            if key is None or key is False:
+                # explicit flush/stop or flush interval elapsed
+                self.__write(pending)
+                pending, pending_rows, deadline = OrderedDict(), 0, None
+                if item is not None:
+                    item.set()
+                if key is None:
+                    return
+                continue
+            pending.setdefault(key, list()).append(item)
+            pending_rows += len(item)
+            if deadline is None:
+                deadline = time.time() + self.flush_interval
+            if pending_rows >= self.flush_rows:
+                self.__write(pending)
+                pending, pending_rows, deadline = OrderedDict(), 0, None
+
+    def __write(self, pending):
+        """
+        Append coalesced frames of each symbol/window with one file open
+        -rows at or before the stored max timestamp are dropped
+        -frames failing to write are kept (get_failed()), without
+        holding up the other symbols/windows of the batch
+        """
+        if len(pending) == 0:
+            return
+        batches = list()
+        for (symbol, window), frames in pending.items():
+            frame = frames[0] if len(frames) == 1 else concat(frames)
+            if not frame.index.is_monotonic_increasing:
+                frame = frame.sort_index(kind='mergesort')
+            batches.append((symbol, window, frame))
+        written, failed, dropped = list(), list(), 0
+        started = time.time()
+        try:
+            with tb.open_file(self.file, 'a', libver='latest') as f:
+                for symbol, window, frame in batches:
+                    try:
+                        new = select_unstored(f, symbol, window, frame)
+                        dropped += len(frame) - len(new)
+                        if len(new) == 0:
+                            continue
+                        pyramid = window == 'M' if self.pyramid is None else self.pyramid
+                        write_frames(f, {symbol: new}, window, pyramid)
+                        written.append((symbol, window, new))
+                    except:
+                        print("Error appending {} ({}) to {}".format(symbol, window, self.file))
+                        failed.append((symbol, window, frame))
+                f.flush()
+        except:
+            print("Error appending to {}".format(self.file))
+            # nothing is known to be stored - stored rows are dropped
+            # again if the kept frames are put back
+            written, failed = list(), batches
+        latency = time.time() - started
+        with self.__lock:
+            self.__failed.extend(failed)
+            stats = self.__stats
+            stats['errors'] += len(failed)
+            stats['rows_dropped'] += dropped
+            if len(failed) == len(batches):
+                return
+            stats['flushes'] += 1
+            stats['rows_written'] += sum(len(frame) for _, _, frame in written)
+            stats['last_flush_latency'] = latency
+            stats['total_flush_latency'] += latency
+            if stats['max_flush_latency'] is None or latency > stats['max_flush_latency']:
+                stats['max_flush_latency'] = latency
+        for symbol, window, frame in written:
+            append_to_mirror(symbol, frame, file=self.file, window=window)
+
+
+def select_unstored(h5, symbol, window, frame):
+    """
+    Rows of frame after the last stored row of
+    symbol/window's timeseries on open HDF5 file
+    """
+    node = registry.get_node(h5, symbol, window)
+    _, stored_max = (None, None) if node is None else get_minmax_metadata(node)
+    if stored_max is None:
+        return frame
+    return frame[get_timestamps(frame) > convert_datetime_to_timestamp(stored_max)]
@@ -0,0 +1,314 @@
+#
+# PyAlgoGem Project
+# data/bar_builder
+#
+# streaming aggregation of Gemini trades into OHLCV bars
+#
+# Andrew Edmonds - 2018
+#
+
+import threading
+import numpy as np
+
+from pandas import DataFrame, Timedelta, concat, to_datetime
+
+from ._hdf5_access import DATA_COLUMNS, append_to_datafile
+from ._gap_index import BAR_LENGTHS
+from ._trade_store import TRADE_DTYPE, make_trade_records
+from ._helper_functions import ensure_hdf5
+from ._symbol_registry import registry
+
+# kinds of bars: fixed time interval, traded volume or number of trades
+BAR_KINDS = ['time', 'volume', 'tick']
+
+
+class BarBuilder(object):
+    """
+    Streaming builder of OHLCV bars (CryptoCompareTable columns)
+    from Gemini trades
+    -trades are fed in batches with process(), from
+    GeminiAPI.get_trades_history(), read_trades() or a stream
+    -each batch is aggregated at once with numpy, finished bars
+    are returned and, if a file or writer is given, appended
+    to the symbol/window timeseries of the data store
+    -a bar is finished once a trade at least tolerance
+    milliseconds after its end has been seen, so trades
+    arriving out of order within the tolerance are included
+    -intervals without trades produce no bar
+
+    Attributes
+    ==========
+    symbol : str
+        registered symbol bars are stored as, e.g. 'BTC'
+        -only needed with file or writer
+    kind : str
+        'time' - bars of fixed time interval
+        'volume' - bars of size traded amount (base currency)
+        'tick' - bars of size trades
+    interval : int
+        length of time bars in milliseconds
+    size : float
+        traded amount or number of trades per bar
+    tolerance : int
+        milliseconds to wait for late trades
+    window : str
+        time window of timeseries bars are stored in: 'D', 'H', 'M'
+    file : str
+        name of HDF5 file finished bars are appended to
+    writer : DatafileWriter
+        writer finished bars are queued to (instead of file)
+
+    Methods
+    =======
+    process :
+        -aggregate batch of trades, return finished bars
+    flush :
+        -finish all pending bars (end of stream)
+    get_stats :
+        -number of trades, bars and late trades seen
+    """
+
+    def __init__(self, symbol=None, kind='time', interval=None, size=None, tolerance=0,
+                 window='M', file=None, writer=None):
+        if kind not in BAR_KINDS:
+            raise ValueError('Kind of bars must be in: {}'.format(', '.join(BAR_KINDS)))
+        self.symbol = None if symbol is None else registry.ensure_symbol(symbol)
+        self.window = registry.ensure_window(window)
+        self.kind = kind
+        self.interval = None
+        self.size = None
+        if kind == 'time':
+            self.interval = BAR_LENGTHS[self.window] if interval is None else \
+                get_interval_length(interval)
+        else:
+            if size is None or size <= 0:
+                raise ValueError('Size of {} bars must be positive'.format(kind))
+            self.size = float(size)
+        if tolerance < 0:
+            raise ValueError('Tolerance must not be negative')
+        self.tolerance = int(tolerance)
+        self.file = None if file is None else ensure_hdf5(str(file))
+        self.writer = writer
+        if (file is not None or writer is not None) and self.symbol is None:
+            raise ValueError('Symbol must be given to store bars')
+        if (file is not None or writer is not None) and self.interval != BAR_LENGTHS[self.window]:
+            raise ValueError('Only time bars of the length of window {} can be stored'.format(
+                self.window))
+        self.__pending = np.empty(0, dtype=TRADE_DTYPE)
+        # trades before this timestamp (ms) belong to finished bars
+        self.__closed = None
+        self.__latest = None
+        # traded amount or number of trades of finished volume/tick bars
+        self.__total = 0.0
+        self.__lock = threading.Lock()
+        self.__stats = {'trades': 0, 'bars': 0, 'late': 0, 'duplicates': 0}
+
+    def process(self, trades):
+        """
+        Aggregate batch of trades into bars
+
+        Parameters
+        ==========
+        trades : list of dict, DataFrame or array
+            trades as returned by GeminiAPI.get_trades_history()
+            or read_trades()
+
+        Returns
+        =======
+        return : DataFrame
+            bars finished by this batch, indexed by start
+            of interval (time bars) or first trade
+        """
+        records = ensure_trade_records(trades)
+        with self.__lock:
+            bars = self.__aggregate(records, final=False)
+        self.__store(bars)
+        return bars
+
+    def flush(self):
+        """
+        Finish all pending bars, including the open one
+        -trades in their intervals arriving later are dropped
+        """
+        with self.__lock:
+            bars = self.__aggregate(np.empty(0, dtype=TRADE_DTYPE), final=True)
+        self.__store(bars)
+        return bars
+
+    def get_stats(self):
+        """
+        Get statistics of builder
+
+        Returns
+        =======
+        return : dict
+            trades : number of trades aggregated
+            bars : number of finished bars
+            late : trades dropped as later than tolerance
+            duplicates : trades dropped as already seen
+            pending : trades of bars not finished yet
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats['pending'] = len(self.__pending)
+        return stats
+
+    def __aggregate(self, records, final):
+        """Merge records into pending trades and cut off finished bars"""
+        stats = self.__stats
+        if len(records) > 0:
+            # trade IDs are unique, repeats come from overlapping requests
+            unique = records[np.unique(records['tid'], return_index=True)[1]]
+            unique = unique[~np.isin(unique['tid'], self.__pending['tid'])]
+            stats['duplicates'] += len(records) - len(unique)
+            if self.__closed is not None:
+                late = unique['timestamp'] < self.__closed
+                stats['late'] += int(late.sum())
+                unique = unique[~late]
+            if len(unique) > 0:
+                pending = np.concatenate([self.__pending, unique])
+                self.__pending = pending[np.lexsort((pending['tid'], pending['timestamp']))]
+                latest = int(unique['timestamp'].max())
+                if self.__latest is None or latest > self.__latest:
+                    self.__latest = latest
+        if len(self.__pending) == 0:
+            return DataFrame(columns=DATA_COLUMNS)
+        pending = self.__pending
+        if final:
+            watermark = int(pending['timestamp'][-1]) + 1
+        else:
+            watermark = self.__latest - self.tolerance
+
+        if self.kind == 'time':
+            buckets = (pending['timestamp'] // self.interval) * self.interval
+            finished = int(np.searchsorted(buckets + self.interval, watermark, 'right'))
+            if final:
+                finished = len(pending)
+            closed = int(buckets[finished - 1]) + self.interval if finished else None
+        else:
+            # only trades up to the watermark are in their final order
+            ready = int(np.searchsorted(pending['timestamp'], watermark, 'left'))
+            weights = pending['amount'][:ready] if self.kind == 'volume' else np.ones(ready)
+            # running total over all trades, so a bar's overshoot counts
+            # towards the next bar however trades are batched
+            totals = self.__total + np.cumsum(weights)
+            buckets = np.floor((totals - weights) / self.size)
+            if ready == 0:
+                finished = 0
+            elif final:
+                finished = ready
+            elif totals[-1] >= (buckets[-1] + 1) * self.size:
+                finished = ready
+            else:
+                finished = int(np.searchsorted(buckets, buckets[-1], 'left'))
+            closed = int(pending['timestamp'][finished - 1]) + 1 if finished else None
+        if finished == 0:
+            return DataFrame(columns=DATA_COLUMNS)
+
+        bars = aggregate_trades(pending[:finished], buckets[:finished],
+                                labels=self.kind == 'time')
+        self.__pending = pending[finished:]
+        self.__closed = closed
+        if self.kind != 'time':
+            self.__total = totals[finished - 1]
+        stats['trades'] += finished
+        stats['bars'] += len(bars)
+        return bars
+
+    def __store(self, bars):
+        """Append finished bars to data store"""
+        if len(bars) == 0:
+            return
+        if self.writer is not None:
+            self.writer.put(self.symbol, bars, window=self.window)
+        elif self.file is not None:
+            append_to_datafile(self.symbol, bars, file=self.file, window=self.window)
+
+
+def get_interval_length(interval):
+    """
+    Get length of bar interval in milliseconds
+    -int: milliseconds, str: time window ('D', 'H', 'M')
+    or pandas offset, e.g. '5min', '4h'
+    """
+    if isinstance(interval, (int, np.integer)):
+        length = int(interval)
+    elif str(interval).upper() in BAR_LENGTHS:
+        length = BAR_LENGTHS[str(interval).upper()]
+    else:
+        try:
+            length = int(Timedelta(interval).total_seconds() * 1000)
+        except ValueError:
+            raise ValueError('Interval must be milliseconds or offset, e.g. 5min')
+    if length <= 0:
+        raise ValueError('Interval must be positive')
+    return length
+
+
+def ensure_trade_records(trades):
+    """
+    Get array of TradeTable rows, sorted by time, from trades
+    as returned by GeminiAPI.get_trades_history() or read_trades()
+    """
+    if isinstance(trades, np.ndarray):
+        records = trades.astype(TRADE_DTYPE, copy=False)
+        return records[np.lexsort((records['tid'], records['timestamp']))]
+    if isinstance(trades, DataFrame) and 'timestampms' not in trades.columns:
+        records = np.empty(len(trades), dtype=TRADE_DTYPE)
+        records['timestamp'] = trades.index.values.astype('datetime64[ms]').astype(np.int64)
+        for col in ['tid', 'price', 'amount', 'side']:
+            records[col] = trades[col].values
+        return records[np.lexsort((records['tid'], records['timestamp']))]
+    return make_trade_records(trades)
+
+
+def aggregate_trades(records, buckets, labels=True):
+    """
+    Aggregate trades (array of TradeTable rows, sorted by time)
+    into one bar per run of equal buckets
+    -bars are labeled with their bucket (start of interval in
+    milliseconds) if labels, otherwise with their first trade
+    """
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    prices = records['price']
+    amounts = records['amount']
+    index = buckets[starts] if labels else records['timestamp'][starts]
+    bars = DataFrame({'close': prices[ends],
+                      'high': np.maximum.reduceat(prices, starts),
+                      'low': np.minimum.reduceat(prices, starts),
+                      'open': prices[starts],
+                      'vol_from': np.add.reduceat(amounts, starts),
+                      'vol_to': np.add.reduceat(amounts * prices, starts)},
+                     index=to_datetime(index.astype(np.int64), unit='ms'),
+                     columns=DATA_COLUMNS)
+    return bars
+
+
+def build_bars(trades, kind='time', interval='M', size=None):
+    """
+    Aggregate all trades (e.g. of read_trades()) into bars at once
+
+    Parameters
+    ==========
+    trades : list of dict, DataFrame or array
+        trades as returned by GeminiAPI.get_trades_history()
+        or read_trades()
+    kind : str
+        'time', 'volume' or 'tick'
+    interval : int or str
+        length of time bars: milliseconds, time window
+        ('D', 'H', 'M') or pandas offset, e.g. '5min'
+    size : float
+        traded amount or number of trades per volume/tick bar
+
+    Returns
+    =======
+    return : DataFrame
+        bars in CryptoCompareTable columns
+    """
+    builder = BarBuilder(kind=kind, interval=interval if kind == 'time' else None, size=size)
+    bars = [frame for frame in [builder.process(trades), builder.flush()] if len(frame) > 0]
+    if len(bars) == 0:
+        return DataFrame(columns=DATA_COLUMNS)
+    return concat(bars)
@@ -0,0 +1,123 @@
+#
+# PyAlgoGem Project
+# data/bar_pyramid
+#
+# functions to maintain pre-aggregated OHLCV bar levels in HDF5 files
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import tables as tb
+
+from pandas import DataFrame, to_datetime
+
+from ._hdf5_access import PYRAMID_LEVELS, DATA_COLUMNS, get_level_path, read_columns, update_metadata
+from ._symbol_registry import CryptoCompareTable, registry, open_timeseries, init_metadata, \
+    set_storage_options
+from ._helper_functions import convert_timestamp_ms_to_datetime, ensure_hdf5
+
+
+def update_pyramid(node):
+    """
+    Aggregate newly appended minute bars of symbol's minute
+    timeseries group into each pre-aggregated bar level
+    -only complete bars are written, the open bar of each level
+    is kept pending until a minute bar after it arrives
+    """
+    attrs = node._v_attrs
+    if attrs.min_timestamp is None or attrs.max_timestamp is None:
+        return
+    for level, length in PYRAMID_LEVELS.items():
+        if level == '1m':
+            continue
+        level_node = get_level_node(node, level)
+        pending = level_node._v_attrs.pending_from
+        if pending is None:
+            pending = (int(attrs.min_timestamp) // length) * length
+        # end (exclusive) of the last bar covered by stored minute bars
+        complete = ((int(attrs.max_timestamp) + PYRAMID_LEVELS['1m']) // length) * length
+        if complete <= pending:
+            continue
+        minute = read_columns(node, convert_timestamp_ms_to_datetime(pending),
+                              convert_timestamp_ms_to_datetime(complete - 1), DATA_COLUMNS)
+        bars = aggregate_bars(minute, length)
+        if len(bars) > 0:
+            open_timeseries(level_node).append(bars)
+            update_metadata(level_node, bars)
+        level_node._v_attrs.pending_from = complete
+
+
+def get_level_node(node, level):
+    """Get (or create) pre-aggregated bar level group of symbol's minute timeseries group"""
+    h5 = node._v_file
+    path = get_level_path(node._v_parent._v_name, level)
+    if path not in h5:
+        parent, name = path.rsplit('/', 1)
+        filters = node._v_attrs.filters if 'filters' in node._v_attrs else None
+        chunkshape = node._v_attrs.chunkshape if 'chunkshape' in node._v_attrs else None
+        h5.create_ts(parent, name, CryptoCompareTable, filters=filters,
+                     chunkshape=chunkshape, createparents=True)
+        level_node = h5.get_node(path)
+        init_metadata(level_node)
+        if filters is not None:
+            set_storage_options(level_node, filters, chunkshape)
+        level_node._v_attrs.pending_from = None
+    return h5.get_node(path)
+
+
+def aggregate_bars(minute, length):
+    """
+    Aggregate minute bars (DataFrame in CryptoCompareTable
+    columns, sorted by time) into bars of length milliseconds
+    -bars are labeled with the start of their interval
+    """
+    if len(minute) == 0:
+        return DataFrame(columns=DATA_COLUMNS)
+    timestamps = minute.index.values.astype('datetime64[ms]').astype(np.int64)
+    buckets = (timestamps // length) * length
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    bars = DataFrame({'close': minute['close'].values[ends],
+                      'high': np.maximum.reduceat(minute['high'].values, starts),
+                      'low': np.minimum.reduceat(minute['low'].values, starts),
+                      'open': minute['open'].values[starts],
+                      'vol_from': np.add.reduceat(minute['vol_from'].values, starts),
+                      'vol_to': np.add.reduceat(minute['vol_to'].values, starts)},
+                     index=to_datetime(buckets[starts], unit='ms'),
+                     columns=DATA_COLUMNS)
+    return bars
+
+
+def rebuild_pyramid(node):
+    """
+    Remove pre-aggregated bar levels of symbol's minute timeseries
+    group and aggregate them again from all minute bars
+    """
+    h5 = node._v_file
+    for level in PYRAMID_LEVELS:
+        path = get_level_path(node._v_parent._v_name, level)
+        if path in h5:
+            h5.remove_node(path, recursive=True)
+    update_pyramid(node)
+
+
+def build_pyramid(symbol, file='data.h5'):
+    """
+    (Re)build pre-aggregated bar levels from the minute
+    bars of symbol's timeseries on HDF5 file
+    """
+    symbol = registry.ensure_symbol(symbol)
+    file = ensure_hdf5(str(file))
+
+    try:
+        with tb.open_file(file, 'a', libver='latest') as f:
+            node = registry.get_node(f, symbol, 'M')
+            if node is None:
+                print('No minute data found for {} in {}'.format(symbol, file))
+                return
+            rebuild_pyramid(node)
+            f.flush()
+        print('Bar levels of {} for {} successfully built!'.format(file, symbol))
+    except:
+        print("Error building bar levels of {}".format(file))
@@ -0,0 +1,179 @@
+#
+# PyAlgoGem Project
+# data/columnar_mirror
+#
+# functions to keep a memory-mapped columnar mirror of HDF5 files
+#
+# Andrew Edmonds - 2018
+#
+
+import io
+import os
+import shutil
+import numpy as np
+import tables as tb
+
+from pandas import DataFrame
+
+from ._helper_functions import ensure_hdf5, convert_to_datetime, convert_datetime_to_timestamp
+from ._hdf5_access import read_columns, get_minmax_metadata, DATA_COLUMNS
+from ._symbol_registry import registry
+
+# columns stored in mirror - one .npy file each
+MIRROR_COLUMNS = ['timestamp'] + DATA_COLUMNS
+
+
+def get_mirror_dir(file='data.h5'):
+    """Get name of mirror directory of HDF5 file"""
+    file = ensure_hdf5(str(file))
+    return file[:-3] + '_mirror'
+
+
+def get_mirror_path(symbol, window, column, file='data.h5'):
+    """Get name of .npy file of a symbol/window's column in mirror directory"""
+    return os.path.join(get_mirror_dir(file), registry.ensure_symbol(symbol),
+                        registry.ensure_window(window), column + '.npy')
+
+
+def has_mirror(symbol, file='data.h5', window='D'):
+    """Check if mirror exists for symbol and window"""
+    return os.path.isfile(get_mirror_path(symbol, window, 'timestamp', file))
+
+
+def create_mirror(symbol, file='data.h5', window='D'):
+    """
+    Create (or rebuild) columnar mirror of symbol/window's timeseries
+    -one .npy file per column, timestamp as int64 ms since epoch
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    file = ensure_hdf5(str(file))
+    directory = os.path.dirname(get_mirror_path(symbol, window, 'timestamp', file))
+
+    try:
+        with tb.open_file(file, 'r', libver='latest') as f:
+            node = registry.get_node(f, symbol, window)
+            startmin, endmax = (None, None) if node is None else get_minmax_metadata(node)
+            if startmin is None or endmax is None:
+                dataset = DataFrame(columns=DATA_COLUMNS)
+            else:
+                dataset = read_columns(node, startmin, endmax, DATA_COLUMNS)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+        for column, values in get_mirror_arrays(dataset).items():
+            np.save(get_mirror_path(symbol, window, column, file), values)
+        print('Mirror of {} for {} ({}) created!'.format(file, symbol, window))
+    except OSError:
+        print('Error creating mirror of {}'.format(file))
+
+
+def remove_mirror(file='data.h5'):
+    """Delete mirror directory of HDF5 file"""
+    directory = get_mirror_dir(file)
+
+    try:
+        shutil.rmtree(directory)
+        print('{} successfully removed!'.format(directory))
+    except OSError:
+        print('Error deleting {}'.format(directory))
+
+
+def append_to_mirror(symbol, data, file='data.h5', window='D'):
+    """
+    Append data (DataFrame) to symbol/window's mirror if one exists
+    -data older than the mirror triggers a rebuild from HDF5
+    """
+    if not has_mirror(symbol, file, window) or len(data) == 0:
+        return
+    timestamps = np.load(get_mirror_path(symbol, window, 'timestamp', file), mmap_mode='r')
+    last = int(timestamps[-1]) if len(timestamps) > 0 else None
+    del timestamps
+    arrays = get_mirror_arrays(data)
+    if last is not None and arrays['timestamp'][0] <= last:
+        create_mirror(symbol, file, window)
+        return
+    # timestamp file is written last, so readers never see
+    # timestamps without the matching values
+    for column in MIRROR_COLUMNS[1:] + MIRROR_COLUMNS[:1]:
+        append_npy(get_mirror_path(symbol, window, column, file), arrays[column])
+
+
+def load_mirror(symbol, start=None, end=None, file='data.h5', columns=None, window='D'):
+    """
+    Memory-map symbol/window's mirror arrays (read-only, zero-copy)
+    -pages are shared between processes through the OS cache
+
+    Returns
+    =======
+    return : dict
+        'timestamp' and each requested column as np.memmap
+        -sliced to start/end (inclusive) if given
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    if columns is None:
+        columns = DATA_COLUMNS
+    if isinstance(columns, str):
+        columns = [columns]
+    for col in columns:
+        if col not in DATA_COLUMNS:
+            raise ValueError('Columns must be in: {}'.format(', '.join(DATA_COLUMNS)))
+    if not has_mirror(symbol, file, window):
+        print('No mirror found for {} ({}) - run create_mirror()'.format(symbol, window))
+        return
+
+    arrays = {column: np.load(get_mirror_path(symbol, window, column, file), mmap_mode='r')
+              for column in ['timestamp'] + list(columns)}
+    # guard against reading while an append is in progress
+    length = min(len(values) for values in arrays.values())
+    first, last = 0, length
+    timestamps = arrays['timestamp'][:length]
+    if start is not None:
+        start = convert_datetime_to_timestamp(convert_to_datetime(start))
+        first = np.searchsorted(timestamps, start, side='left')
+    if end is not None:
+        end = convert_datetime_to_timestamp(convert_to_datetime(end))
+        last = np.searchsorted(timestamps, end, side='right')
+    return {column: values[first:last] for column, values in arrays.items()}
+
+
+def get_mirror_arrays(dataset):
+    """Split DataFrame into contiguous arrays of mirror columns"""
+    arrays = {'timestamp': np.asarray(dataset.index.values, dtype='datetime64[ms]').astype(np.int64)}
+    for position, column in enumerate(DATA_COLUMNS):
+        # appended frames may carry source names (volumefrom, ...)
+        # so columns are taken by position as in the HDF5 tables
+        arrays[column] = np.ascontiguousarray(dataset.iloc[:, position].values, dtype=np.float64)
+    return arrays
+
+
+def append_npy(path, values):
+    """
+    Append values to 1-D .npy file in-place by writing the new
+    rows at the end of the file and then updating the header
+    """
+    with open(path, 'r+b') as fp:
+        version = np.lib.format.read_magic(fp)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+        header_size = fp.tell()
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                      'fortran_order': False,
+                                                      'shape': (shape[0] + len(values),)})
+        header = header.getvalue()
+        if version == (1, 0) and len(header) == header_size:
+            fp.seek(0, io.SEEK_END)
+            fp.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            fp.seek(0)
+            fp.write(header)
+            return
+    # header grew past its padding - rewrite whole file
+    old = np.load(path)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as fp:
+        np.save(fp, np.concatenate([old, np.asarray(values, dtype=old.dtype)]))
+    os.replace(temp, path)
@@ -78,7 +78,7 @@ class CryptoCompareAPI(object):
         return data
 
     def historical_price_daily(self, symbol, comparison_symbol='USD', all_data=True,
-                               limit=1, aggregate=1, exchange='Gemini'):
+                               limit=1, aggregate=1, exchange='Gemini', to_ts=None):
         """Retrieve Daily OHLC prices, and to/from volume
         -values based on 00:00:00 GMT time
 
@@ -100,12 +100,17 @@ class CryptoCompareAPI(object):
             -max : 30
         exchange : str
             name of exchange to source from
+        to_ts : int
+            unix time (seconds) of last bar retrieved
+            -default : latest bar
         """
         df = None
         url = URL_BASE + 'histoday?fsym={}&tsym={}&limit={}&aggregate={}' \
             .format(symbol.upper(), comparison_symbol.upper(), limit, aggregate)
         if exchange:
             url += '&e={}'.format(exchange)
+        if to_ts is not None:
+            url += '&toTs={}'.format(int(to_ts))
         if all_data:
             url += '&allData=true'
 
@@ -120,7 +125,7 @@ class CryptoCompareAPI(object):
         return df
 
     def historical_price_hourly(self, symbol, comparison_symbol='USD', limit=1,
-                                aggregate=1, exchange='Gemini'):
+                                aggregate=1, exchange='Gemini', to_ts=None):
         """Retrieve Hourly OHLC prices, and to/from volume
         -values based on 00:00:00 GMT time
 
@@ -140,12 +145,17 @@ class CryptoCompareAPI(object):
             -max : None
         exchange : str
             name of exchange to source from
+        to_ts : int
+            unix time (seconds) of last bar retrieved
+            -default : latest bar
         """
         df = None
         url = URL_BASE + 'histohour?fsym={}&tsym={}&limit={}&aggregate={}' \
             .format(symbol.upper(), comparison_symbol.upper(), limit, aggregate)
         if exchange:
             url += '&e={}'.format(exchange)
+        if to_ts is not None:
+            url += '&toTs={}'.format(int(to_ts))
 
         try:
             page = requests.get(url)
@@ -158,7 +168,7 @@ class CryptoCompareAPI(object):
         return df
 
     def historical_price_minute(self, symbol, comparison_symbol='USD', limit=1,
-                                aggregate=1, exchange='Gemini'):
+                                aggregate=1, exchange='Gemini', to_ts=None):
         """Retrieve Minute OHLC prices, and to/from volume
         -values based on 00:00:00 GMT time
 
@@ -178,12 +188,17 @@ class CryptoCompareAPI(object):
             -max : None
         exchange : str
             name of exchange to source from
+        to_ts : int
+            unix time (seconds) of last bar retrieved
+            -default : latest bar
         """
         df = None
         url = URL_BASE + 'histominute?fsym={}&tsym={}&limit={}&aggregate={}' \
             .format(symbol.upper(), comparison_symbol.upper(), limit, aggregate)
         if exchange:
             url += '&e={}'.format(exchange)
+        if to_ts is not None:
+            url += '&toTs={}'.format(int(to_ts))
 
         try:
             page = requests.get(url)
@@ -12,38 +12,144 @@ import shutil
 import tables as tb
 import tstables as ts
 
-from ._helper_functions import ensure_hdf5
+from ._helper_functions import ensure_hdf5, make_filters
+from ._hdf5_access import get_timeseries_nodes, PYRAMID_GROUP
+from ._symbol_registry import CryptoCompareTable, registry, set_storage_options, is_legacy_node
 
 
-class CryptoCompareTable(tb.IsDescription):
-    """
-    Description of table to be used in HDF5 file
-    Same structure for BTC and ETH
-    """
-    timestamp = tb.Int64Col(pos=0)
-    close = tb.Float64Col(pos=1)
-    high = tb.Float64Col(pos=2)
-    low = tb.Float64Col(pos=3)
-    open = tb.Float64Col(pos=4)
-    vol_from = tb.Float64Col(pos=5)
-    vol_to = tb.Float64Col(pos=6)
-
-
-def create_datafile(name='data.h5'):
+def create_datafile(name='data.h5', complib='blosc:lz4', complevel=5, shuffle=True,
+                    chunkshape=None):
     """Create HDF5 file for data storage
-    of BTC and ETH timeseries"""
+    -timeseries of each symbol and window are
+    created on first append
+
+    Parameters
+    ==========
+    name : str
+        name of HDF5 file
+    complib : str
+        compression library for timeseries tables
+        -e.g. 'blosc:lz4', 'blosc:zstd', 'blosc' or None
+    complevel : int
+        compression level from 0 (none) to 9 (max)
+    shuffle : bool
+        apply byte-shuffle filter before compressing
+    chunkshape : int
+        number of rows per HDF5 chunk of timeseries tables
+        -None lets PyTables choose based on expected rows
+    """
     name = ensure_hdf5(str(name))
+    filters = make_filters(complib, complevel, shuffle)
+    chunkshape = ensure_chunkshape(chunkshape)
 
     if not os.path.isfile(name):
-        h5 = tb.open_file(name, 'w')
-        h5.create_ts('/', 'BTC', CryptoCompareTable)
-        h5.create_ts('/', 'ETH', CryptoCompareTable)
+        h5 = tb.open_file(name, 'w', filters=filters)
+        set_storage_options(h5.root, filters, chunkshape)
         h5.close()
         print('{} created!'.format(name))
 
     return name
 
 
+def repack_datafile(name='data.h5', complib='blosc:lz4', complevel=5, shuffle=True,
+                    chunkshape=None):
+    """
+    Rewrite existing HDF5 file with new compression
+    and chunk shape settings, in-place
+
+    Parameters
+    ==========
+    name : str
+        name of HDF5 file
+    complib : str
+        compression library for timeseries tables
+    complevel : int
+        compression level from 0 (none) to 9 (max)
+    shuffle : bool
+        apply byte-shuffle filter before compressing
+    chunkshape : int
+        number of rows per HDF5 chunk of timeseries tables
+        -None keeps the current chunk shape
+    """
+    name = ensure_hdf5(str(name))
+    filters = make_filters(complib, complevel, shuffle)
+    chunkshape = ensure_chunkshape(chunkshape)
+    temp = name[:-3] + '.repack.h5'
+
+    try:
+        # File.copy_file only applies filters to the new root,
+        # so leaves are copied with the new filters explicitly
+        with tb.open_file(name, 'r') as h5, tb.open_file(temp, 'w', filters=filters) as dst:
+            h5.root._v_attrs._f_copy(dst.root)
+            h5.root._f_copy_children(dst.root, recursive=True, filters=filters,
+                                     chunkshape='keep' if chunkshape is None else chunkshape)
+        with tb.open_file(temp, 'a') as h5:
+            for node in [h5.root] + get_timeseries_nodes(h5):
+                node_chunkshape = chunkshape
+                if chunkshape is None and 'chunkshape' in node._v_attrs:
+                    node_chunkshape = node._v_attrs.chunkshape
+                set_storage_options(node, filters, node_chunkshape)
+        os.replace(temp, name)
+        print('{} successfully repacked!'.format(name))
+    except (OSError, tb.exceptions.HDF5ExtError):
+        if os.path.isfile(temp):
+            os.remove(temp)
+        print('Error repacking {}'.format(name))
+
+
+def migrate_datafile(name='data.h5', window='D'):
+    """
+    Move timeseries of HDF5 file written by older versions
+    (one timeseries per symbol) to per-window groups
+
+    Parameters
+    ==========
+    name : str
+        name of HDF5 file
+    window : str
+        time window of the data stored in the file: 'D', 'H', 'M'
+    """
+    name = ensure_hdf5(str(name))
+    window = registry.ensure_window(window)
+    mirror_dir = name[:-3] + '_mirror'
+
+    try:
+        with tb.open_file(name, 'a') as h5:
+            symbols = [group._v_name for group in h5.root._f_iter_nodes(classname='Group')
+                       if is_legacy_node(group)]
+            for symbol in symbols:
+                h5.rename_node('/' + symbol, symbol + '_legacy')
+                h5.create_group('/', symbol)
+                h5.move_node('/{}_legacy'.format(symbol), newparent='/' + symbol, newname=window)
+                # bar levels were kept in a separate tree
+                if '/{}/{}'.format(PYRAMID_GROUP, symbol) in h5:
+                    h5.move_node('/{}/{}'.format(PYRAMID_GROUP, symbol),
+                                 newparent='/' + symbol, newname=PYRAMID_GROUP)
+                # mirror arrays follow the node layout
+                legacy_mirror = os.path.join(mirror_dir, symbol)
+                if os.path.isdir(legacy_mirror):
+                    temp = legacy_mirror + '_legacy'
+                    os.rename(legacy_mirror, temp)
+                    os.makedirs(legacy_mirror)
+                    os.rename(temp, os.path.join(legacy_mirror, window))
+            if '/' + PYRAMID_GROUP in h5 and len(h5.get_node('/' + PYRAMID_GROUP)._v_children) == 0:
+                h5.remove_node('/' + PYRAMID_GROUP)
+        print('{} successfully migrated!'.format(name))
+    except (OSError, tb.exceptions.NodeError):
+        print('Error migrating {}'.format(name))
+
+
+def ensure_chunkshape(chunkshape):
+    """Ensure chunk shape is a valid number of rows"""
+    if chunkshape is None:
+        return None
+    if isinstance(chunkshape, tuple) and len(chunkshape) == 1:
+        chunkshape = chunkshape[0]
+    if not (isinstance(chunkshape, int) and chunkshape > 0):
+        raise ValueError('chunkshape must be a positive integer')
+    return (chunkshape,)
+
+
 def copy_datafile(source=None, copy=None):
     """Duplicate HDF5 files"""
     if source is None or copy is None:
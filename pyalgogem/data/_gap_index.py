@@ -0,0 +1,369 @@
+#
+# PyAlgoGem Project
+# data/gap_index
+#
+# functions to track and backfill missing bars in HDF5 files
+#
+# Andrew Edmonds - 2018
+#
+
+import time
+import datetime as dt
+import numpy as np
+import tables as tb
+
+from concurrent.futures import ThreadPoolExecutor
+from pandas import DataFrame, concat
+
+from ._hdf5_access import DATA_COLUMNS, PYRAMID_LEVELS, PYRAMID_GROUP, get_level_path, \
+    get_partition_tables, has_metadata, set_metadata
+from ._helper_functions import ensure_hdf5, convert_timestamp_ms_to_datetime
+from ._symbol_registry import CryptoCompareTable, registry, open_timeseries
+
+# length of bars of each time window in milliseconds
+BAR_LENGTHS = {'D': 86400000, 'H': 3600000, 'M': 60000}
+
+# tstables partitions each timeseries by day
+PARTITION_LENGTH = 86400000
+
+
+def get_bar_length(node):
+    """
+    Get length of bars (ms) of symbol/window timeseries group
+    (None for pre-aggregated bar levels and older layouts)
+    """
+    if node._v_parent._v_name == PYRAMID_GROUP or node._v_parent == node._v_file.root:
+        return None
+    return BAR_LENGTHS.get(node._v_name)
+
+
+def get_timestamps(dataset):
+    """Get datetime index of DataFrame as int64 milliseconds since epoch"""
+    return np.asarray(dataset.index.values, dtype='datetime64[ms]').astype(np.int64)
+
+
+def find_gaps(timestamps, length, first=None, last=None):
+    """
+    Find runs of missing bars between sorted timestamps
+
+    Parameters
+    ==========
+    timestamps : array
+        sorted bar timestamps (ms since epoch)
+    length : int
+        length of bars in milliseconds
+    first, last : int
+        stored timestamps just before/after the
+        given ones, if any
+
+    Returns
+    =======
+    return : array
+        (n, 2) array of first and last missing
+        bar timestamp of each gap
+    """
+    points = np.asarray(timestamps, dtype=np.int64)
+    if first is not None:
+        points = np.r_[np.int64(first), points]
+    if last is not None:
+        points = np.r_[points, np.int64(last)]
+    if len(points) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    # at least one whole bar must be missing - irregular spacing of
+    # less than two bars (e.g. DST shifts of daily bars) is not a gap
+    starts = np.flatnonzero(np.diff(points) >= 2 * length)
+    return np.column_stack([points[starts] + length, points[starts + 1] - length])
+
+
+def set_gaps(node, length):
+    """Build gap index of timeseries group by walking its partitions"""
+    gaps = list()
+    last = None
+    for table in get_partition_tables(node):
+        timestamps = table.col('timestamp')
+        if len(timestamps) == 0:
+            continue
+        gaps.append(find_gaps(timestamps, length, first=last))
+        last = timestamps[-1]
+    node._v_attrs.gaps = np.concatenate(gaps) if gaps else np.empty((0, 2), dtype=np.int64)
+
+
+def update_gaps(node, timestamps, length):
+    """
+    Add gaps before and within bars about to be
+    appended to timeseries group to its gap index
+    -must be called before the metadata is updated
+    """
+    new = find_gaps(timestamps, length, first=node._v_attrs.max_timestamp)
+    if len(new) > 0:
+        node._v_attrs.gaps = np.concatenate([node._v_attrs.gaps, new])
+
+
+def fill_gaps(node, timestamps, length, old_min, old_max):
+    """
+    Update gap index of timeseries group after inserting bars
+    -bars inside gaps are removed from the index
+    -bars before the old first (after the old last) stored
+    bar may open new gaps
+    """
+    if old_min is None or old_max is None:
+        node._v_attrs.gaps = find_gaps(timestamps, length)
+        return
+    gaps = [find_gaps(timestamps[timestamps < old_min], length, last=old_min)]
+    for start, end in node._v_attrs.gaps:
+        inside = timestamps[(timestamps >= start) & (timestamps <= end)]
+        if len(inside) == 0:
+            gaps.append(np.array([[start, end]], dtype=np.int64))
+        else:
+            gaps.append(find_gaps(inside, length, first=start - length, last=end + length))
+    gaps.append(find_gaps(timestamps[timestamps > old_max], length, first=old_max))
+    node._v_attrs.gaps = np.concatenate(gaps)
+
+
+def get_gaps(symbol, file='data.h5', window='D'):
+    """
+    Get missing bar intervals of timeseries on HDF5 file
+
+    Returns
+    =======
+    return : list of tuple
+        first and last missing bar (UTC datetime) of each gap
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    file = ensure_hdf5(str(file))
+
+    try:
+        with tb.open_file(file, 'r', libver='latest') as f:
+            node = registry.get_node(f, symbol, window)
+            if node is None:
+                print('No data found for {} in {}'.format(symbol, file))
+                return
+            if 'gaps' not in node._v_attrs:
+                print('No gap index found in {} - run rebuild_metadata()'.format(file))
+                return
+            gaps = [(convert_timestamp_ms_to_datetime(int(start)),
+                     convert_timestamp_ms_to_datetime(int(end)))
+                    for start, end in node._v_attrs.gaps]
+        return gaps
+    except:
+        print("Error getting gaps from {}".format(file))
+
+
+def insert_to_datafile(symbol, data, file='data.h5', window='D'):
+    """Insert data (DataFrame) into HDF5 file
+    -unlike append_to_datafile(), rows may fall anywhere
+    in the timeseries (e.g. into gaps)
+    -rows with timestamps already stored are skipped
+
+    Parameters
+    ==========
+    symbol : str
+        symbol of timeseries to insert into
+    data : DataFrame
+        rows to insert, indexed by datetime
+    file : str
+        name of HDF5 file
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+
+    Returns
+    =======
+    return : int
+        number of rows inserted
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    if not isinstance(data, DataFrame):
+        raise ValueError('Data must be Pandas DataFrame')
+    file = ensure_hdf5(str(file))
+    # imported here as both modules build on this one
+    from ._bar_pyramid import rebuild_pyramid
+    from ._columnar_mirror import has_mirror, create_mirror
+
+    try:
+        with tb.open_file(file, 'a', libver='latest') as f:
+            node = registry.get_node(f, symbol, window, create=True)
+            inserted = insert_frame(node, data)
+            if len(inserted) > 0:
+                # bar levels are only built from minute bars
+                if window == 'M' and get_level_path(symbol, list(PYRAMID_LEVELS)[1]) in f:
+                    rebuild_pyramid(node)
+            f.flush()
+    except:
+        print("Error inserting into {}".format(file))
+        return 0
+    if len(inserted) > 0 and has_mirror(symbol, file, window):
+        create_mirror(symbol, file, window)
+    return len(inserted)
+
+
+def insert_frame(node, data):
+    """
+    Insert rows of DataFrame into symbol/window timeseries
+    group, keeping its gap index up to date
+
+    Returns
+    =======
+    return : array
+        timestamps (ms since epoch) of inserted rows
+    """
+    # bring metadata of files from older versions up
+    # to date before counting the new rows
+    if not has_metadata(node):
+        set_metadata(node, open_timeseries(node))
+    length = get_bar_length(node)
+    if 'gaps' not in node._v_attrs:
+        set_gaps(node, length)
+    old_min, old_max = node._v_attrs.min_timestamp, node._v_attrs.max_timestamp
+    inserted = insert_rows(node, data)
+    if len(inserted) > 0:
+        fill_gaps(node, inserted, length, old_min, old_max)
+    return inserted
+
+
+def insert_rows(node, data):
+    """
+    Insert rows of DataFrame into partitions of timeseries group
+    in timestamp order and update its metadata
+
+    Returns
+    =======
+    return : array
+        timestamps (ms since epoch) of inserted rows
+    """
+    timestamps, first = np.unique(get_timestamps(data), return_index=True)
+    if len(timestamps) == 0:
+        return timestamps
+    rows = np.empty(len(timestamps), dtype=tb.Description(CryptoCompareTable.columns)._v_dtype)
+    rows['timestamp'] = timestamps
+    for position, column in enumerate(DATA_COLUMNS):
+        # frames may carry source names (volumefrom, ...)
+        # so columns are taken by position as in the HDF5 tables
+        rows[column] = data.iloc[first, position].values
+    inserted = list()
+    days = timestamps // PARTITION_LENGTH
+    for day in np.unique(days):
+        table = get_partition_table(node, int(day) * PARTITION_LENGTH)
+        stored = table.col('timestamp')
+        new = rows[days == day]
+        new = new[~np.isin(new['timestamp'], stored)]
+        if len(new) == 0:
+            continue
+        merge_rows(table, new)
+        inserted.append(new['timestamp'])
+    if len(inserted) == 0:
+        return np.empty(0, dtype=np.int64)
+    inserted = np.concatenate(inserted)
+    attrs = node._v_attrs
+    if attrs.min_timestamp is None or inserted[0] < attrs.min_timestamp:
+        attrs.min_timestamp = int(inserted[0])
+    if attrs.max_timestamp is None or inserted[-1] > attrs.max_timestamp:
+        attrs.max_timestamp = int(inserted[-1])
+    attrs.nrows = attrs.nrows + len(inserted)
+    attrs.last_append = int(time.time() * 1000)
+    return inserted
+
+
+def merge_rows(table, rows):
+    """
+    Merge rows (sorted by timestamp) into partition table in
+    timestamp order, rewriting it from the first new row onwards
+    """
+    position = int(np.searchsorted(table.col('timestamp'), rows['timestamp'][0], side='right'))
+    merged = np.concatenate([rows, table.read(position).astype(rows.dtype)])
+    merged = merged[np.argsort(merged['timestamp'], kind='mergesort')]
+    table.truncate(position)
+    table.append(merged)
+
+
+def get_partition_table(node, day, description=CryptoCompareTable):
+    """
+    Get (or create) partition table of timeseries
+    group for day (ms since epoch, start of day)
+    -same layout as written by tstables
+    """
+    date = convert_timestamp_ms_to_datetime(day)
+    path = '{}/{}/{}/{}'.format(node._v_pathname, date.strftime('y%Y'), date.strftime('m%m'),
+                                date.strftime('d%d'))
+    h5 = node._v_file
+    if path + '/ts_data' in h5:
+        return h5.get_node(path + '/ts_data')
+    attrs = node._v_attrs
+    tables = get_partition_tables(node)
+    expectedrows = tables[0].attrs._TS_TABLES_EXPECTEDROWS_PER_PARTITION if tables else 10000
+    where, name = path.rsplit('/', 1)
+    h5.create_group(where, name, createparents=True)
+    table = h5.create_table(path, 'ts_data', description,
+                            filters=attrs.filters if 'filters' in attrs else None,
+                            expectedrows=expectedrows,
+                            chunkshape=attrs.chunkshape if 'chunkshape' in attrs else None)
+    table.attrs._TS_TABLES_EXPECTEDROWS_PER_PARTITION = expectedrows
+    return table
+
+
+def backfill_datafile(symbol, fetch, file='data.h5', window='D', max_workers=4, max_bars=2000):
+    """
+    Fetch bars missing from timeseries on HDF5 file (as listed
+    in its gap index) in parallel and insert them in order
+    -gaps the source has no data for stay in the index
+
+    Parameters
+    ==========
+    symbol : str
+        symbol of timeseries to backfill
+    fetch : callable
+        fetch(start, end) returning DataFrame of bars between
+        start and end (UTC datetimes, inclusive)
+    file : str
+        name of HDF5 file
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+    max_workers : int
+        number of requests running at the same time
+    max_bars : int
+        max number of bars per request
+
+    Returns
+    =======
+    return : dict
+        gaps : number of gaps before backfill
+        requests : number of requests made
+        rows : number of rows inserted
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    if not (isinstance(max_workers, int) and max_workers > 0):
+        raise ValueError('max_workers must be a positive integer')
+    if not (isinstance(max_bars, int) and max_bars > 0):
+        raise ValueError('max_bars must be a positive integer')
+    length = BAR_LENGTHS[window]
+    gaps = get_gaps(symbol, file, window)
+    if not gaps:
+        return {'gaps': 0, 'requests': 0, 'rows': 0}
+
+    # split long gaps into requests of at most max_bars bars
+    ranges = list()
+    for start, end in gaps:
+        while start <= end:
+            stop = min(start + dt.timedelta(milliseconds=length * (max_bars - 1)), end)
+            ranges.append((start, stop))
+            start = stop + dt.timedelta(milliseconds=length)
+
+    def fetch_range(bounds):
+        dataset = fetch(*bounds)
+        if dataset is None or len(dataset) == 0:
+            return None
+        # keep only the bars that were requested
+        timestamps = get_timestamps(dataset)
+        start_ms, end_ms = [int(bound.timestamp() * 1000) for bound in bounds]
+        return dataset[(timestamps >= start_ms) & (timestamps <= end_ms)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        datasets = [dataset for dataset in pool.map(fetch_range, ranges)
+                    if dataset is not None and len(dataset) > 0]
+    rows = 0
+    if datasets:
+        # ranges are in chronological order - insert with one file open
+        rows = insert_to_datafile(symbol, concat(datasets), file=file, window=window)
+    return {'gaps': len(gaps), 'requests': len(ranges), 'rows': rows}
@@ -7,36 +7,174 @@
 # Andrew Edmonds - 2018
 #
 
+import os
+import re
+import time
+import datetime as dt
+import numpy as np
 import tables as tb
 import tstables as ts
 
-from pandas import DataFrame
+from collections import OrderedDict
+from pandas import DataFrame, to_datetime
 
-from ._helper_functions import convert_to_datetime, ensure_datetime, ensure_hdf5, get_minmax_timeseries
+from ._helper_functions import convert_to_datetime, ensure_datetime, ensure_hdf5, get_minmax_timeseries, \
+    convert_datetime_to_timestamp, convert_timestamp_ms_to_datetime, get_minmax_dataframe_timestamp
+from ._symbol_registry import registry, open_timeseries, init_metadata, is_legacy_node
 
+# node attributes kept under each symbol's timeseries group
+METADATA_ATTRS = ['min_timestamp', 'max_timestamp', 'nrows', 'last_append']
 
-def append_to_datafile(symbol, data, file='data.h5'):
-    """Append data (DataFrame) to HDF5 file"""
-    if symbol.upper() not in ['BTC', 'ETH']:
-        raise ValueError('Symbol must be BTC or ETH')
-    if not isinstance(data, DataFrame):
-        raise ValueError('Data must be Pandas DataFrame')
+# value columns of CryptoCompareTable (timestamp is used as index)
+DATA_COLUMNS = ['close', 'high', 'low', 'open', 'vol_from', 'vol_to']
+
+# tstables stores each day as partition /yYYYY/mMM/dDD under the group
+PARTITION_PATTERN = re.compile(r'y(\d{4})/m(\d{2})/d(\d{2})')
+
+# pre-aggregated bar levels and their length in milliseconds
+# -'1m' is served from the symbol's minute timeseries itself
+PYRAMID_LEVELS = OrderedDict([('1m', 60000),
+                              ('5m', 300000),
+                              ('15m', 900000),
+                              ('1h', 3600000),
+                              ('4h', 14400000),
+                              ('1d', 86400000)])
+PYRAMID_GROUP = 'pyramid'
+
+
+def append_to_datafile(symbol, data, file='data.h5', pyramid=None, window='D'):
+    """Append data (DataFrame) to HDF5 file
+
+    Parameters
+    ==========
+    symbol : str
+        symbol of timeseries to append to
+    data : DataFrame
+        rows to append, indexed by datetime
+    file : str
+        name of HDF5 file
+    pyramid : bool
+        data are minute bars - also update the
+        pre-aggregated bar levels (5m to 1d)
+        -default: only for minute window
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+    """
+    append_to_datafiles({symbol: data}, file=file, pyramid=pyramid, window=window)
+
+
+def append_to_datafiles(data, file='data.h5', pyramid=None, window='D'):
+    """Append data of many symbols to HDF5 file
+    while opening the file only once
+
+    Parameters
+    ==========
+    data : dict
+        DataFrame of rows to append for each symbol
+    file : str
+        name of HDF5 file
+    pyramid : bool
+        data are minute bars - also update the
+        pre-aggregated bar levels (5m to 1d)
+        -default: only for minute window
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+    """
+    data = {registry.ensure_symbol(symbol): frame for symbol, frame in data.items()}
+    window = registry.ensure_window(window)
+    for frame in data.values():
+        if not isinstance(frame, DataFrame):
+            raise ValueError('Data must be Pandas DataFrame')
+    if pyramid is None:
+        pyramid = window == 'M'
     file = ensure_hdf5(str(file))
+    # imported here as the module builds on this one
+    from ._columnar_mirror import append_to_mirror
 
     try:
-        with tb.open_file(file, 'a',libver='latest') as f:
-            if symbol.upper() == 'BTC':
-                tseries = f.root.BTC._f_get_timeseries()
-            else:
-                tseries = f.root.ETH._f_get_timeseries()
-            tseries.append(data)
+        with tb.open_file(file, 'a', libver='latest') as f:
+            write_frames(f, data, window, pyramid)
+            f.flush()
     except:
         print("Error appending to {}".format(file))
+        return
+    for symbol, frame in data.items():
+        append_to_mirror(symbol, frame, file=file, window=window)
+
 
+def write_frames(h5, data, window, pyramid=False):
+    """
+    Append DataFrame of each symbol to its window's
+    timeseries group on open HDF5 file
+    -symbols and window must already be validated
+    """
+    # imported here as both modules build on this one
+    from ._bar_pyramid import update_pyramid
+    from ._gap_index import BAR_LENGTHS, set_gaps, update_gaps, get_timestamps
 
-def read_datafile(symbol, start=None, end=None, file='data.h5', all_data=True):
+    for symbol, frame in data.items():
+        node = registry.get_node(h5, symbol, window, create=True)
+        tseries = open_timeseries(node)
+        # bring metadata of files from older versions up
+        # to date before counting the new rows
+        if not has_metadata(node):
+            set_metadata(node, tseries)
+        if 'gaps' not in node._v_attrs:
+            set_gaps(node, BAR_LENGTHS[window])
+        update_gaps(node, get_timestamps(frame), BAR_LENGTHS[window])
+        tseries.append(frame)
+        update_metadata(node, frame)
+        if pyramid:
+            update_pyramid(node)
+
+
+def read_datafile(symbol, start=None, end=None, file='data.h5', all_data=True, columns=None,
+                  level=None, window='D'):
     """Read historical data from HDF5 file
-    into in-memory DataFrame"""
+    into in-memory DataFrame
+
+    Parameters
+    ==========
+    symbol : str
+        symbol of timeseries to read
+    start, end : datetime
+        first and last date of timeslice to read
+    file : str
+        name of HDF5 file
+    all_data : bool
+        read whole timeseries if no start/end are given
+    columns : list of str
+        only read these columns from the table
+        -e.g. ['close'] - default reads all columns
+    level : str
+        read pre-aggregated bars of the minute timeseries
+        instead: '1m', '5m', '15m', '1h', '4h' or '1d'
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+    """
+    datasets = read_datafiles([symbol], start=start, end=end, file=file, all_data=all_data,
+                              columns=columns, level=level, window=window)
+    if datasets is not None:
+        return datasets.get(registry.ensure_symbol(symbol))
+
+
+def read_datafiles(symbols, start=None, end=None, file='data.h5', all_data=True, columns=None,
+                   level=None, window='D'):
+    """Read historical data of many symbols from HDF5
+    file while opening the file only once
+
+    Parameters
+    ==========
+    symbols : list of str
+        symbols of timeseries to read
+    (others) :
+        same as read_datafile()
+
+    Returns
+    =======
+    return : dict
+        DataFrame for each symbol with stored data
+    """
     # ensure datetime parameters are valid
     # unless requesting all available data
     start, end = convert_to_datetime(start), convert_to_datetime(end)
@@ -47,41 +185,408 @@ def read_datafile(symbol, start=None, end=None, file='data.h5', all_data=True):
         if start and end:
             if (start - end).total_seconds() >= 0:
                 raise ValueError('Start time must be prior to end time')
-    if symbol.upper() not in ['BTC', 'ETH']:
-        raise ValueError('Symbol must be BTC or ETH')
+    symbols = [registry.ensure_symbol(symbol) for symbol in symbols]
+    window = registry.ensure_window(window)
+    columns = ensure_columns(columns)
+    if level is not None and level not in PYRAMID_LEVELS:
+        raise ValueError('Level must be in: {}'.format(', '.join(PYRAMID_LEVELS)))
     file = ensure_hdf5(str(file))
 
     try:
-        with tb.open_file(file, 'r',libver='latest') as f:
-            if symbol.upper() == 'BTC':
-                tseries = f.root.BTC._f_get_timeseries()
+        datasets = dict()
+        with tb.open_file(file, 'r', libver='latest') as f:
+            for symbol in symbols:
+                if level is None:
+                    node = registry.get_node(f, symbol, window)
+                elif level == '1m':
+                    node = registry.get_node(f, symbol, 'M')
+                elif get_level_path(symbol, level) in f:
+                    node = f.get_node(get_level_path(symbol, level))
+                else:
+                    node = None
+                startmin, endmax = (None, None) if node is None else get_minmax_metadata(node)
+                if startmin is None and endmax is None:
+                    print('No data found for {} in {}'.format(symbol, file))
+                    continue
+                symbol_start = startmin if start is None else start
+                symbol_end = endmax if end is None else end
+                if columns is None:
+                    datasets[symbol] = open_timeseries(node).read_range(symbol_start, symbol_end)
+                else:
+                    datasets[symbol] = read_columns(node, symbol_start, symbol_end, columns)
+        return datasets
+    except:
+        print("Error reading from {}".format(file))
+
+
+def iter_datafile(symbol, start=None, end=None, file='data.h5', chunk='1D', rows=None,
+                  columns=None, level=None, window='D', as_arrays=False):
+    """Read historical data from HDF5 file in chunks
+    -yields chunks in chronological order while keeping
+    only one chunk in memory at a time
+    -chunks follow the daily partitions of the timeseries,
+    so each chunk is a contiguous read from disk
+
+    Parameters
+    ==========
+    symbol : str
+        symbol of timeseries to read
+    start, end : datetime
+        first and last date of timeslice to read
+        -default: all stored data
+    file : str
+        name of HDF5 file
+    chunk : str
+        number of daily partitions per chunk, e.g. '1D', '7D'
+        -ignored if rows is given
+    rows : int
+        number of rows per chunk (last chunk may be shorter)
+    columns : list of str
+        only read these columns - default reads all columns
+    level : str
+        read pre-aggregated bars of the minute timeseries
+        instead: '1m', '5m', '15m', '1h', '4h' or '1d'
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+    as_arrays : bool
+        yield dict of NumPy arrays ('timestamp' as int64 ms
+        since epoch and each column) instead of DataFrames
+    """
+    start, end = convert_to_datetime(start), convert_to_datetime(end)
+    if start and end:
+        if (start - end).total_seconds() >= 0:
+            raise ValueError('Start time must be prior to end time')
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    columns = ensure_columns(columns) or DATA_COLUMNS
+    if level is not None and level not in PYRAMID_LEVELS:
+        raise ValueError('Level must be in: {}'.format(', '.join(PYRAMID_LEVELS)))
+    if rows is not None:
+        if int(rows) < 1:
+            raise ValueError('Rows per chunk must be at least 1')
+        rows, days = int(rows), None
+    else:
+        match = re.match(r'^(\d+)D$', str(chunk).upper())
+        if match is None or int(match.group(1)) < 1:
+            raise ValueError("Chunk must be a number of days, e.g. '1D' or '7D'")
+        days = int(match.group(1))
+    file = ensure_hdf5(str(file))
+    return iter_chunks(symbol, start, end, file, days, rows, columns, level, window, as_arrays)
+
+
+def iter_chunks(symbol, start, end, file, days, rows, columns, level, window, as_arrays):
+    """Generator behind iter_datafile() - arguments must already be validated"""
+    try:
+        with tb.open_file(file, 'r', libver='latest') as f:
+            if level is None:
+                node = registry.get_node(f, symbol, window)
+            elif level == '1m':
+                node = registry.get_node(f, symbol, 'M')
+            elif get_level_path(symbol, level) in f:
+                node = f.get_node(get_level_path(symbol, level))
             else:
-                tseries = f.root.ETH._f_get_timeseries()
-            startmin, endmax = get_minmax_daterange(symbol, file=file)
+                node = None
+            startmin, endmax = (None, None) if node is None else get_minmax_metadata(node)
             if startmin is None and endmax is None:
-                print('No data found in {}'.format(file))
+                print('No data found for {} in {}'.format(symbol, file))
                 return
-            if start is None: start = startmin
-            if end is None: end = endmax
-            dataset = tseries.read_range(start, end)
-        return dataset
-    except:
+            start_ms = convert_datetime_to_timestamp(startmin if start is None else start)
+            end_ms = convert_datetime_to_timestamp(endmax if end is None else end)
+
+            parts = list()
+            nrows = 0
+            for table in get_partition_tables(node, start_ms, end_ms):
+                part = read_partition(table, start_ms, end_ms, columns)
+                if part is None:
+                    continue
+                parts.append(part)
+                nrows += len(part['timestamp'])
+                if days is not None:
+                    if len(parts) == days:
+                        yield make_chunk(parts, columns, as_arrays)
+                        parts, nrows = list(), 0
+                    continue
+                while nrows >= rows:
+                    merged = merge_parts(parts, columns)
+                    yield make_chunk([{col: values[:rows] for col, values in merged.items()}],
+                                     columns, as_arrays)
+                    parts = [{col: values[rows:] for col, values in merged.items()}]
+                    nrows -= rows
+            if nrows > 0:
+                yield make_chunk(parts, columns, as_arrays)
+    except (OSError, tb.exceptions.HDF5ExtError):
         print("Error reading from {}".format(file))
 
 
-def get_minmax_daterange(symbol, file='data.h5'):
+def merge_parts(parts, columns):
+    """Concatenate partition reads into one dict of arrays"""
+    if len(parts) == 1:
+        return parts[0]
+    return {col: np.concatenate([part[col] for part in parts])
+            for col in ['timestamp'] + columns}
+
+
+def make_chunk(parts, columns, as_arrays):
+    """Build chunk (DataFrame or dict of arrays) from partition reads"""
+    merged = merge_parts(parts, columns)
+    if as_arrays:
+        return merged
+    return make_frame(merged['timestamp'], {col: merged[col] for col in columns}, columns)
+
+
+def get_minmax_daterange(symbol, file='data.h5', window='D'):
     """Get min and max of timeseries on HDF5 file"""
-    if symbol.upper() not in ['BTC', 'ETH']:
-        raise ValueError('Symbol must be BTC or ETH')
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
     file = ensure_hdf5(str(file))
 
     try:
-        with tb.open_file(file, 'r',libver='latest') as f:
-            if symbol.upper() == 'BTC':
-                tseries = f.root.BTC._f_get_timeseries()
-            else:
-                tseries = f.root.ETH._f_get_timeseries()
-            min_date, max_date = get_minmax_timeseries(tseries)
+        with tb.open_file(file, 'r', libver='latest') as f:
+            node = registry.get_node(f, symbol, window)
+            if node is None:
+                return None, None
+            min_date, max_date = get_minmax_metadata(node)
         return min_date, max_date
     except:
         print("Error getting min-max dates from to {}".format(file))
+
+
+def get_datafile_metadata(symbol, file='data.h5', window='D'):
+    """
+    Get stored metadata of timeseries on HDF5 file
+
+    Returns
+    =======
+    return : dict
+        min_timestamp : datetime (UTC) of first stored row
+        max_timestamp : datetime (UTC) of last stored row
+        nrows : number of stored rows
+        last_append : datetime (UTC) of last append to timeseries
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    file = ensure_hdf5(str(file))
+
+    try:
+        with tb.open_file(file, 'r', libver='latest') as f:
+            node = registry.get_node(f, symbol, window)
+            if node is None:
+                print('No data found for {} in {}'.format(symbol, file))
+                return
+            if not has_metadata(node):
+                print('No metadata found in {} - run rebuild_metadata()'.format(file))
+                return
+            metadata = dict()
+            for attr in METADATA_ATTRS:
+                value = node._v_attrs[attr]
+                if attr != 'nrows' and value is not None:
+                    value = convert_timestamp_ms_to_datetime(value)
+                metadata[attr] = value
+        return metadata
+    except:
+        print("Error getting metadata from {}".format(file))
+
+
+def rebuild_metadata(file='data.h5'):
+    """
+    Recalculate metadata (and gap index) of all timeseries
+    on HDF5 file
+    -needed for files written by older versions
+    """
+    file = ensure_hdf5(str(file))
+    # imported here as the module builds on this one
+    from ._gap_index import get_bar_length, set_gaps
+
+    try:
+        with tb.open_file(file, 'a', libver='latest') as f:
+            for node in get_timeseries_nodes(f):
+                set_metadata(node, open_timeseries(node),
+                             last_append=int(os.path.getmtime(file) * 1000))
+                if get_bar_length(node) is not None:
+                    set_gaps(node, get_bar_length(node))
+            f.flush()
+        print('Metadata of {} successfully rebuilt!'.format(file))
+    except:
+        print("Error rebuilding metadata of {}".format(file))
+
+
+def get_timeseries_nodes(h5):
+    """
+    Get all timeseries groups (symbol/window and
+    pre-aggregated bar levels) of open HDF5 file
+    """
+    nodes = list()
+    for group in h5.root._f_iter_nodes(classname='Group'):
+        if is_legacy_node(group):
+            nodes.append(group)
+            continue
+        for window in registry.windows:
+            if window in group:
+                nodes.append(group._f_get_child(window))
+        if PYRAMID_GROUP in group:
+            nodes.extend(group._f_get_child(PYRAMID_GROUP)._f_iter_nodes(classname='Group'))
+    return nodes
+
+
+def get_level_path(symbol, level):
+    """Get path of pre-aggregated bar level group of symbol"""
+    return '/{}/{}/bars_{}'.format(registry.ensure_symbol(symbol), PYRAMID_GROUP, level)
+
+
+def read_columns(node, start, end, columns):
+    """
+    Read subset of columns of timeseries group between
+    start and end (inclusive) into DataFrame
+    -only the requested fields are read from each partition
+    """
+    start_ms = convert_datetime_to_timestamp(start)
+    end_ms = convert_datetime_to_timestamp(end)
+    timestamps = list()
+    values = {col: list() for col in columns}
+    for table in get_partition_tables(node, start_ms, end_ms):
+        part = read_partition(table, start_ms, end_ms, columns)
+        if part is None:
+            continue
+        timestamps.append(part['timestamp'])
+        for col in columns:
+            values[col].append(part[col])
+    if len(timestamps) == 0:
+        return DataFrame(columns=columns)
+    return make_frame(np.concatenate(timestamps),
+                      {col: np.concatenate(values[col]) for col in columns}, columns)
+
+
+def read_partition(table, start_ms, end_ms, columns):
+    """
+    Read timestamps and subset of columns of partition table
+    between start_ms and end_ms (inclusive)
+
+    Returns
+    =======
+    return : dict
+        'timestamp' and each column as array
+        (None if no rows are in range)
+    """
+    ts_col = table.col('timestamp')
+    mask = (ts_col >= start_ms) & (ts_col <= end_ms)
+    if mask.all():
+        part = {col: table.col(col) for col in columns}
+        part['timestamp'] = ts_col
+        return part
+    coords = np.flatnonzero(mask)
+    if len(coords) == 0:
+        return None
+    part = {'timestamp': ts_col[coords]}
+    for col in columns:
+        if coords[-1] - coords[0] + 1 == len(coords):
+            part[col] = table.read(coords[0], coords[-1] + 1, field=col)
+        else:
+            part[col] = table.read_coordinates(coords, field=col)
+    return part
+
+
+def make_frame(timestamps, values, columns):
+    """Build DataFrame of column arrays indexed by timestamps (ms since epoch)"""
+    # decode timestamps only once for the whole range
+    index = to_datetime(timestamps, unit='ms')
+    dataset = DataFrame(values, index=index, columns=columns)
+    if not dataset.index.is_monotonic_increasing:
+        dataset.sort_index(inplace=True)
+    return dataset
+
+
+def get_partition_tables(node, start_ms=None, end_ms=None):
+    """
+    Get partition tables of timeseries group in chronological
+    order, skipping days outside of start and end
+    """
+    tables = sorted(node._v_file.walk_nodes(node, classname='Table'),
+                    key=lambda table: table._v_pathname)
+    if start_ms is None and end_ms is None:
+        return tables
+    selected = list()
+    for table in tables:
+        day = get_partition_timestamp(table)
+        if day is not None:
+            if start_ms is not None and day + 86400000 <= start_ms:
+                continue
+            if end_ms is not None and day > end_ms:
+                continue
+        selected.append(table)
+    return selected
+
+
+def get_partition_timestamp(table):
+    """
+    Get start of day of partition table in milliseconds
+    since epoch from its path (None if not found)
+    """
+    match = PARTITION_PATTERN.search(table._v_pathname)
+    if match is None:
+        return None
+    year, month, day = [int(part) for part in match.groups()]
+    return convert_datetime_to_timestamp(dt.datetime(year, month, day))
+
+
+def ensure_columns(columns):
+    """Ensure requested columns are part of the timeseries table"""
+    if columns is None:
+        return None
+    if isinstance(columns, str):
+        columns = [columns]
+    columns = list(columns)
+    for col in columns:
+        if col not in DATA_COLUMNS:
+            raise ValueError('Columns must be in: {}'.format(', '.join(DATA_COLUMNS)))
+    if len(columns) == 0:
+        raise ValueError('Select at least one column')
+    return columns
+
+
+def has_metadata(node):
+    """Check if timeseries group holds metadata attributes"""
+    return all(attr in node._v_attrs for attr in METADATA_ATTRS)
+
+
+def set_metadata(node, tseries, last_append=None):
+    """
+    Set metadata attributes of timeseries group
+    by walking the partitions of the timeseries
+    """
+    tsmin, tsmax = get_minmax_timeseries(tseries)
+    if tsmin is None or tsmax is None:
+        init_metadata(node)
+        return
+    node._v_attrs.min_timestamp = convert_datetime_to_timestamp(tsmin)
+    node._v_attrs.max_timestamp = convert_datetime_to_timestamp(tsmax)
+    node._v_attrs.nrows = sum(table.nrows for table in
+                              node._v_file.walk_nodes(node, classname='Table'))
+    node._v_attrs.last_append = last_append
+
+
+def update_metadata(node, data):
+    """Update metadata attributes of timeseries group after appending data"""
+    dfmin, dfmax = get_minmax_dataframe_timestamp(data)
+    if dfmin is None or dfmax is None:
+        return
+    attrs = node._v_attrs
+    if attrs.min_timestamp is None or dfmin < attrs.min_timestamp:
+        attrs.min_timestamp = dfmin
+    if attrs.max_timestamp is None or dfmax > attrs.max_timestamp:
+        attrs.max_timestamp = dfmax
+    attrs.nrows = attrs.nrows + len(data)
+    attrs.last_append = int(time.time() * 1000)
+
+
+def get_minmax_metadata(node):
+    """
+    Get min and max of timeseries from metadata attributes
+    -falls back to walking the timeseries for older files
+    """
+    if not has_metadata(node):
+        return get_minmax_timeseries(node._f_get_timeseries())
+    attrs = node._v_attrs
+    if attrs.min_timestamp is None or attrs.max_timestamp is None:
+        return None, None
+    return convert_timestamp_ms_to_datetime(attrs.min_timestamp), \
+           convert_timestamp_ms_to_datetime(attrs.max_timestamp)
@@ -9,6 +9,8 @@
 
 import datetime as dt
 
+import tables as tb
+
 from numpy import NaN
 from pandas import DataFrame
 from tstables import TsTable
@@ -33,6 +35,31 @@ def ensure_hdf5(name):
     return name
 
 
+def make_filters(complib='blosc:lz4', complevel=5, shuffle=True):
+    """
+    Create PyTables filters for timeseries storage
+
+    Parameters
+    ==========
+    complib : str
+        compression library - e.g. 'blosc', 'blosc:lz4',
+        'blosc:zstd', 'zlib' (None for no compression)
+    complevel : int
+        compression level from 0 (none) to 9 (max)
+    shuffle : bool
+        apply byte-shuffle filter before compressing
+    """
+    if complib is None or complevel == 0:
+        return tb.Filters(complevel=0)
+    if complib not in tb.filters.all_complibs:
+        raise ValueError('complib must be one of: {}'.format(', '.join(tb.filters.all_complibs)))
+    if not (isinstance(complevel, int) and 0 <= complevel <= 9):
+        raise ValueError('complevel must be an integer from 0 to 9')
+    if shuffle not in [True, False]:
+        raise ValueError("Enter valid boolean value for 'shuffle'")
+    return tb.Filters(complevel=complevel, complib=complib, shuffle=shuffle)
+
+
 def ensure_datetime(dt):
     """
     Ensure datetime file is compatible
@@ -88,6 +115,35 @@ def convert_timestamp_to_datetime(timestamp):
     return timestamp.tz_localize('UTC').to_pydatetime()
 
 
+def convert_datetime_to_timestamp(input_date):
+    """
+    Convert datetime objects to integer milliseconds since epoch
+    -naive datetimes are treated as UTC (as done by tstables)
+    """
+    input_date = convert_to_datetime(input_date)
+    if input_date.tzinfo is None:
+        input_date = input_date.replace(tzinfo=dt.timezone.utc)
+    return int(input_date.timestamp() * 1000)
+
+
+def convert_timestamp_ms_to_datetime(timestamp):
+    """Convert integer milliseconds since epoch to UTC datetime objects"""
+    return dt.datetime.fromtimestamp(timestamp / 1000, tz=dt.timezone.utc)
+
+
+def get_minmax_dataframe_timestamp(dataframe):
+    """
+    Get min and max of datetime index of DataFrame object
+    as integer milliseconds since epoch
+    """
+    if isinstance(dataframe, DataFrame) and len(dataframe) > 0:
+        # Timestamp.value is nanoseconds since epoch for naive and UTC indexes
+        return dataframe.index.min().value // 10 ** 6, \
+               dataframe.index.max().value // 10 ** 6
+    else:
+        return None, None
+
+
 def select_new_values(dataframe, old_min, old_max):
     """
     Select subset of DataFrame that resides outside
@@ -0,0 +1,248 @@
+#
+# PyAlgoGem Project
+# data/parquet_io
+#
+# functions to export/import HDF5 timeseries to/from partitioned Parquet
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import glob
+import numpy as np
+import tables as tb
+
+from ._hdf5_access import DATA_COLUMNS, iter_datafile
+from ._gap_index import insert_frame
+from ._bar_pyramid import rebuild_pyramid
+from ._columnar_mirror import has_mirror, create_mirror
+from ._helper_functions import ensure_hdf5, convert_timestamp_ms_to_datetime
+from ._symbol_registry import registry
+
+# name format of Parquet file of each partition
+PARTITIONS = {'Y': '%Y', 'M': '%Y-%m', 'D': '%Y-%m-%d'}
+
+
+def get_parquet_modules():
+    """Import pyarrow (optional dependency) on first use"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Parquet export/import requires pyarrow - pip install pyarrow')
+    return pa, pq
+
+
+def get_parquet_dir(directory, symbol, window):
+    """Get directory of Parquet files of symbol/window: <directory>/<symbol>/<window>"""
+    return os.path.join(str(directory), registry.ensure_symbol(symbol), registry.ensure_window(window))
+
+
+def export_parquet(symbol, directory, start=None, end=None, file='data.h5', window='D',
+                   partition='M'):
+    """
+    Export timeseries on HDF5 file to Parquet files partitioned
+    by time, e.g. <directory>/BTC/M/2018-01.parquet
+    -data are streamed one day at a time, each day
+    written as a row group of its partition's file
+    -existing partition files are merged: their rows before the
+    first and after the last exported row are kept, the exported
+    rows replace the ones in between
+
+    Parameters
+    ==========
+    symbol : str
+        symbol of timeseries to export
+    directory : str
+        root directory of Parquet files
+    start, end : datetime
+        first and last date of timeslice to export
+        -default: all stored data
+    file : str
+        name of HDF5 file
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+    partition : str
+        one Parquet file per year 'Y', month 'M' or day 'D'
+
+    Returns
+    =======
+    return : int
+        number of rows exported
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    if partition not in PARTITIONS:
+        raise ValueError('Partition must be in: {}'.format(', '.join(PARTITIONS)))
+    # fail before reading if pyarrow is missing
+    get_parquet_modules()
+    target = get_parquet_dir(directory, symbol, window)
+
+    rows = 0
+    key, partition_file = None, None
+    try:
+        for chunk in iter_datafile(symbol, start=start, end=end, file=file, chunk='1D',
+                                   window=window, as_arrays=True):
+            first = int(chunk['timestamp'][0])
+            chunk_key = convert_timestamp_ms_to_datetime(first).strftime(PARTITIONS[partition])
+            if chunk_key != key:
+                if partition_file is not None:
+                    partition_file.close()
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                key = chunk_key
+                partition_file = ParquetPartition(os.path.join(target, key + '.parquet'), first)
+            partition_file.write(chunk)
+            rows += len(chunk['timestamp'])
+    except:
+        if partition_file is not None:
+            partition_file.discard()
+        raise
+    if partition_file is not None:
+        partition_file.close()
+    print('{} rows of {} ({}) exported to {}'.format(rows, symbol, window, target))
+    return rows
+
+
+def get_parquet_schema(pa):
+    """Schema of exported Parquet files"""
+    return pa.schema([pa.field('timestamp', pa.timestamp('ms'))] +
+                     [pa.field(col, pa.float64()) for col in DATA_COLUMNS])
+
+
+def make_parquet_table(pa, chunk):
+    """Table of chunk: 'timestamp' (int64 ms since epoch) and value column arrays"""
+    arrays = [pa.array(chunk['timestamp'].astype('datetime64[ms]'), type=pa.timestamp('ms'))]
+    arrays.extend(pa.array(chunk[col]) for col in DATA_COLUMNS)
+    return pa.Table.from_arrays(arrays, schema=get_parquet_schema(pa))
+
+
+def read_parquet_arrays(pq, path):
+    """Arrays of Parquet file as chunks of iter_datafile(as_arrays=True)"""
+    names = pq.ParquetFile(path).schema.names
+    if not all(col in names for col in ['timestamp'] + DATA_COLUMNS):
+        raise ValueError('{} must hold columns: timestamp, {}'.format(path, ', '.join(DATA_COLUMNS)))
+    # read through pandas, as tables of older pyarrow cannot be cast
+    dataset = pq.read_table(path, columns=['timestamp'] + DATA_COLUMNS).to_pandas()
+    arrays = {col: dataset[col].values.astype(np.float64) for col in DATA_COLUMNS}
+    arrays['timestamp'] = np.asarray(dataset['timestamp'].values, dtype='datetime64[ms]').astype(np.int64)
+    return arrays
+
+
+class ParquetPartition(object):
+    """
+    Parquet file of one partition being exported, written to a
+    temporary file that replaces the partition's file once closed
+    -rows of the existing file before the first and after the
+    last exported row are kept
+
+    Methods
+    =======
+    write :
+        write chunk of exported rows as a row group
+    close :
+        write kept rows after the exported ones and replace file
+    discard :
+        remove temporary file, keeping the existing file
+    """
+
+    def __init__(self, path, first):
+        self.__pa, pq = get_parquet_modules()
+        self.path = path
+        self.__temp = path + '.tmp'
+        self.__last = None
+        self.__kept = read_parquet_arrays(pq, path) if os.path.isfile(path) else None
+        self.__writer = pq.ParquetWriter(self.__temp, get_parquet_schema(self.__pa))
+        self.__write_kept(None, first)
+
+    def __write_kept(self, after, before):
+        """Write rows of existing file after/before timestamps (ms), if any"""
+        if self.__kept is None:
+            return
+        timestamps = self.__kept['timestamp']
+        first = 0 if after is None else np.searchsorted(timestamps, after, side='right')
+        last = len(timestamps) if before is None else np.searchsorted(timestamps, before, side='left')
+        if last > first:
+            self.__writer.write_table(make_parquet_table(
+                self.__pa, {col: values[first:last] for col, values in self.__kept.items()}))
+
+    def write(self, chunk):
+        """Write chunk of exported rows (dict of arrays, as make_parquet_table())"""
+        self.__writer.write_table(make_parquet_table(self.__pa, chunk))
+        self.__last = int(chunk['timestamp'][-1])
+
+    def close(self):
+        """Write kept rows after the exported ones and replace partition's file"""
+        if self.__last is not None:
+            self.__write_kept(self.__last, None)
+        self.__writer.close()
+        os.replace(self.__temp, self.path)
+
+    def discard(self):
+        """Remove temporary file, keeping the existing partition's file"""
+        self.__writer.close()
+        os.remove(self.__temp)
+
+
+def import_parquet(symbol, directory, file='data.h5', window='D', pyramid=None):
+    """
+    Import Parquet files written by export_parquet() into timeseries
+    on HDF5 file, one row group at a time
+    -rows may fall anywhere in the timeseries, rows with
+    timestamps already stored are skipped
+
+    Parameters
+    ==========
+    symbol : str
+        symbol of timeseries to import into
+    directory : str
+        root directory of Parquet files
+    file : str
+        name of HDF5 file
+    window : str
+        time window of timeseries: 'D', 'H', 'M'
+    pyramid : bool
+        data are minute bars - also rebuild the
+        pre-aggregated bar levels (5m to 1d)
+        -default: only for minute window
+
+    Returns
+    =======
+    return : int
+        number of rows imported
+    """
+    symbol = registry.ensure_symbol(symbol)
+    window = registry.ensure_window(window)
+    if pyramid is None:
+        pyramid = window == 'M'
+    file = ensure_hdf5(str(file))
+    _, pq = get_parquet_modules()
+    paths = sorted(glob.glob(os.path.join(get_parquet_dir(directory, symbol, window), '*.parquet')))
+    if len(paths) == 0:
+        print('No Parquet files found for {} ({}) in {}'.format(symbol, window, directory))
+        return 0
+    for path in paths:
+        names = pq.ParquetFile(path).schema.names
+        if not all(col in names for col in ['timestamp'] + DATA_COLUMNS):
+            raise ValueError('{} must hold columns: timestamp, {}'.format(
+                path, ', '.join(DATA_COLUMNS)))
+    rows = 0
+    try:
+        with tb.open_file(file, 'a', libver='latest') as f:
+            node = registry.get_node(f, symbol, window, create=True)
+            for path in paths:
+                parquet = pq.ParquetFile(path)
+                for group in range(parquet.num_row_groups):
+                    dataset = parquet.read_row_group(group, columns=['timestamp'] + DATA_COLUMNS) \
+                        .to_pandas().set_index('timestamp')
+                    rows += len(insert_frame(node, dataset))
+            if rows > 0 and pyramid:
+                rebuild_pyramid(node)
+            f.flush()
+    except:
+        print("Error importing into {} after {} rows".format(file, rows))
+        raise
+    if rows > 0 and has_mirror(symbol, file, window):
+        create_mirror(symbol, file, window)
+    print('{} rows of {} ({}) imported into {}'.format(rows, symbol, window, file))
+    return rows
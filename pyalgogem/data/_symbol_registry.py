@@ -0,0 +1,220 @@
+#
+# PyAlgoGem Project
+# data/symbol_registry
+#
+# registry of symbols and their timeseries nodes in HDF5 files
+#
+# Andrew Edmonds - 2018
+#
+
+import re
+import tables as tb
+import tstables as ts
+
+# symbols and time windows available by default
+SYMBOLS = ['BTC', 'ETH']
+WINDOWS = ['D', 'H', 'M']
+
+
+class CryptoCompareTable(tb.IsDescription):
+    """
+    Description of table to be used in HDF5 file
+    Same structure for all symbols and windows
+    """
+    timestamp = tb.Int64Col(pos=0)
+    close = tb.Float64Col(pos=1)
+    high = tb.Float64Col(pos=2)
+    low = tb.Float64Col(pos=3)
+    open = tb.Float64Col(pos=4)
+    vol_from = tb.Float64Col(pos=5)
+    vol_to = tb.Float64Col(pos=6)
+
+
+class SymbolRegistry(object):
+    """
+    Registry of symbols stored in HDF5 files
+    -each symbol has one group holding one
+    timeseries per time window: /<symbol>/<window>
+    -timeseries are created lazily on first append
+
+    Attributes
+    ==========
+    symbols : list
+        registered symbols, e.g. ['BTC', 'ETH']
+    windows : list
+        time windows available for each symbol
+
+    Methods
+    =======
+    register :
+        -add symbol(s) to registry
+    unregister :
+        -remove symbol from registry
+    ensure_symbol :
+        -return normalized symbol or raise error if unknown
+    ensure_window :
+        -return normalized window or raise error if unknown
+    get_path :
+        -return path of symbol/window timeseries in HDF5 file
+    get_node :
+        -look up (or create) symbol/window timeseries group
+    """
+
+    def __init__(self, symbols=None, windows=None):
+        self.__symbols = list()
+        self.__windows = list(WINDOWS if windows is None else windows)
+        self.register(*(SYMBOLS if symbols is None else symbols))
+
+    @property
+    def symbols(self):
+        """Registered symbols"""
+        return list(self.__symbols)
+
+    @property
+    def windows(self):
+        """Time windows available for each symbol"""
+        return list(self.__windows)
+
+    def register(self, *symbols):
+        """Add symbol(s) to registry"""
+        for symbol in symbols:
+            symbol_str = str(symbol).upper()
+            # symbols become HDF5 group names
+            if not re.match(r'^[A-Z][A-Z0-9]*$', symbol_str):
+                raise ValueError('Symbol must be alphanumeric, e.g. BTC or ETHUSD')
+            if symbol_str not in self.__symbols:
+                self.__symbols.append(symbol_str)
+
+    def unregister(self, symbol):
+        """Remove symbol from registry (stored data is kept)"""
+        self.__symbols.remove(self.ensure_symbol(symbol))
+
+    def ensure_symbol(self, symbol):
+        """Return normalized symbol or raise error if not registered"""
+        symbol_str = str(symbol).upper()
+        if symbol is None or symbol_str not in self.__symbols:
+            raise ValueError('Symbol must be one of: {}'.format(', '.join(self.__symbols)))
+        return symbol_str
+
+    def ensure_window(self, window):
+        """Return normalized window or raise error if not available"""
+        window_str = str(window).upper()
+        if window is None or window_str not in self.__windows:
+            raise ValueError('Time window must be one of: {}'.format(', '.join(self.__windows)))
+        return window_str
+
+    def get_path(self, symbol, window):
+        """Path of symbol/window timeseries group in HDF5 file"""
+        return '/{}/{}'.format(self.ensure_symbol(symbol), self.ensure_window(window))
+
+    def get_node(self, h5, symbol, window, create=False):
+        """
+        Look up timeseries group of symbol and window in open HDF5 file
+
+        Parameters
+        ==========
+        h5 : tables.File
+            open HDF5 file
+        symbol : str
+            registered symbol
+        window : str
+            available time window
+        create : bool
+            create empty timeseries if not found
+            -file must be open in write/append mode
+
+        Returns
+        =======
+        return : tables.Group
+            timeseries group (None if not found and not created,
+            or if file still uses the layout of older versions)
+        """
+        path = self.get_path(symbol, window)
+        if path in h5:
+            return h5.get_node(path)
+        group_path = '/' + self.ensure_symbol(symbol)
+        if group_path in h5 and is_legacy_node(h5.get_node(group_path)):
+            print('{} uses the single-timeseries layout of older versions - '
+                  'run migrate_datafile()'.format(h5.filename))
+            return None
+        if not create:
+            return None
+        return create_timeseries(h5, path)
+
+
+def create_timeseries(h5, path):
+    """
+    Create empty timeseries group at path, using the
+    compression and chunk shape stored with the file
+    """
+    where, name = path.rsplit('/', 1)
+    attrs = h5.root._v_attrs
+    filters = attrs.filters if 'filters' in attrs else None
+    chunkshape = attrs.chunkshape if 'chunkshape' in attrs else None
+    h5.create_ts(where or '/', name, CryptoCompareTable, filters=filters,
+                 chunkshape=chunkshape, createparents=True)
+    node = h5.get_node(path)
+    init_metadata(node)
+    if filters is not None:
+        set_storage_options(node, filters, chunkshape)
+    return node
+
+
+def is_legacy_node(group):
+    """
+    Check if symbol group is a timeseries itself, as
+    written by versions without per-window groups
+    """
+    return is_timeseries_node(group)
+
+
+def is_timeseries_node(group):
+    """Check if group is a tstables timeseries"""
+    return '_TS_TABLES_CLASS' in group._v_attrs
+
+
+def open_timeseries(node):
+    """
+    Get timeseries of group, applying its stored
+    compression and chunk shape to new partitions
+    """
+    tseries = node._f_get_timeseries()
+    attrs = node._v_attrs
+    if 'filters' in attrs:
+        tseries.table_filters = attrs.filters
+    if 'chunkshape' in attrs:
+        tseries.table_chunkshape = attrs.chunkshape
+    return tseries
+
+
+def set_storage_options(node, filters, chunkshape=None):
+    """
+    Store compression and chunk shape of timeseries group
+    (or of the file, when given the root group)
+    -partitions created on later appends inherit the filters
+    """
+    node._v_filters = filters
+    node._v_attrs.filters = filters
+    node._v_attrs.chunkshape = chunkshape
+
+
+def init_metadata(node):
+    """Set metadata attributes of a new (empty) timeseries group"""
+    node._v_attrs.min_timestamp = None
+    node._v_attrs.max_timestamp = None
+    node._v_attrs.nrows = 0
+    node._v_attrs.last_append = None
+
+
+# registry used by all data functions
+registry = SymbolRegistry()
+
+
+def register_symbol(*symbols):
+    """Add symbol(s) to the registry used by all data functions"""
+    registry.register(*symbols)
+
+
+def get_symbols():
+    """Get symbols registered for all data functions"""
+    return registry.symbols
@@ -0,0 +1,342 @@
+#
+# PyAlgoGem Project
+# data/trade_store
+#
+# functions to keep Gemini public trades in a sibling HDF5 file
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import re
+import time
+import numpy as np
+import tables as tb
+import tstables as ts
+
+from pandas import DataFrame, to_datetime
+
+from ._hdf5_access import get_partition_tables
+from ._gap_index import get_partition_table, merge_rows, PARTITION_LENGTH
+from ._helper_functions import ensure_hdf5, convert_to_datetime, convert_datetime_to_timestamp, \
+    make_filters
+from ._symbol_registry import open_timeseries
+
+# trade side: taker bought (ask removed), sold (bid removed), auction fill
+SIDES = {'buy': 1, 'sell': -1, 'auction': 0}
+
+# max number of trades returned by each Gemini request
+MAX_TRADES = 500
+
+
+class TradeTable(tb.IsDescription):
+    """
+    Description of table of public trades
+    -33 bytes per trade
+    """
+    timestamp = tb.Int64Col(pos=0)
+    tid = tb.Int64Col(pos=1)
+    price = tb.Float64Col(pos=2)
+    amount = tb.Float64Col(pos=3)
+    side = tb.Int8Col(pos=4)
+
+
+TRADE_DTYPE = tb.Description(TradeTable.columns)._v_dtype
+
+
+def get_trade_file(file='data.h5'):
+    """Get name of trade file of HDF5 file: data.h5 -> data_trades.h5"""
+    file = ensure_hdf5(str(file))
+    return file[:-3] + '_trades.h5'
+
+
+def ensure_trade_symbol(symbol):
+    """Ensure symbol is a Gemini symbol, e.g. 'btcusd' - returned in lower case"""
+    symbol_str = str(symbol).lower()
+    if not re.match(r'^[a-z][a-z0-9]*$', symbol_str):
+        raise ValueError('Symbol must be alphanumeric Gemini symbol, e.g. btcusd')
+    return symbol_str
+
+
+def make_trade_records(trades):
+    """
+    Convert trades returned by GeminiAPI.get_trades_history()
+    (list of dict or DataFrame) into array of TradeTable rows,
+    sorted by timestamp and trade ID
+    """
+    if isinstance(trades, DataFrame):
+        trades = trades.to_dict('records')
+    records = np.empty(len(trades), dtype=TRADE_DTYPE)
+    for row, trade in enumerate(trades):
+        records[row] = (int(trade['timestampms']), int(trade['tid']), float(trade['price']),
+                        float(trade['amount']), SIDES.get(trade.get('type'), 0))
+    return records[np.lexsort((records['tid'], records['timestamp']))]
+
+
+def append_trades(node, records):
+    """
+    Append trades (sorted array of TradeTable rows) to trade
+    timeseries group, skipping trade IDs already stored
+
+    Returns
+    =======
+    return : int
+        number of trades stored
+    """
+    records = records[np.unique(records['tid'], return_index=True)[1]]
+    records = records[np.lexsort((records['tid'], records['timestamp']))]
+    if len(records) == 0:
+        return 0
+    attrs = node._v_attrs
+    # only partitions overlapping the new trades can hold their IDs
+    for table in get_partition_tables(node, int(records['timestamp'][0]),
+                                      int(records['timestamp'][-1])):
+        records = records[~np.isin(records['tid'], table.col('tid'))]
+    if len(records) == 0:
+        return 0
+    late = np.zeros(len(records), dtype=bool)
+    if attrs.max_timestamp is not None:
+        late = records['timestamp'] < attrs.max_timestamp
+    # trades older than the last stored one cannot go through
+    # tstables, so they are merged into their partitions
+    days = records['timestamp'][late] // PARTITION_LENGTH
+    for day in np.unique(days):
+        merge_rows(get_partition_table(node, int(day) * PARTITION_LENGTH, TradeTable),
+                   records[late][days == day])
+    if (~late).any():
+        open_timeseries(node).append(records[~late])
+    if attrs.min_timestamp is None or records['timestamp'][0] < attrs.min_timestamp:
+        attrs.min_timestamp = int(records['timestamp'][0])
+    if attrs.max_timestamp is None or records['timestamp'][-1] > attrs.max_timestamp:
+        attrs.max_timestamp = int(records['timestamp'][-1])
+    attrs.nrows = attrs.nrows + len(records)
+    attrs.last_tid = max(int(records['tid'].max()), attrs.last_tid or 0)
+    attrs.last_append = int(time.time() * 1000)
+    return len(records)
+
+
+def get_trade_node(h5, symbol, create=False):
+    """Get (or create) trade timeseries group of symbol on open trade file"""
+    path = '/' + symbol
+    if path in h5:
+        return h5.get_node(path)
+    if not create:
+        return None
+    h5.create_ts('/', symbol, TradeTable, filters=make_filters())
+    node = h5.get_node(path)
+    node._v_attrs.min_timestamp = None
+    node._v_attrs.max_timestamp = None
+    node._v_attrs.nrows = 0
+    node._v_attrs.last_tid = None
+    node._v_attrs.last_append = None
+    return node
+
+
+def store_trades(symbol, trades, file='data.h5'):
+    """
+    Store trades returned by GeminiAPI.get_trades_history()
+    in trade file of HDF5 file, deduplicated by trade ID
+
+    Parameters
+    ==========
+    symbol : str
+        Gemini symbol of trades, e.g. 'btcusd'
+    trades : list of dict or DataFrame
+        trades as returned by Gemini
+    file : str
+        name of HDF5 file (trades go to sibling file data_trades.h5)
+
+    Returns
+    =======
+    return : int
+        number of new trades stored
+    """
+    symbol = ensure_trade_symbol(symbol)
+    records = make_trade_records(trades)
+    if len(records) == 0:
+        return 0
+    trade_file = get_trade_file(file)
+
+    try:
+        with tb.open_file(trade_file, 'a', libver='latest') as f:
+            stored = append_trades(get_trade_node(f, symbol, create=True), records)
+            f.flush()
+        return stored
+    except:
+        print("Error storing trades in {}".format(trade_file))
+        return 0
+
+
+def sync_trades(api, symbol, file='data.h5', since=None, max_requests=None):
+    """
+    Download public trades of symbol from Gemini with a
+    'since' cursor and store them in trade file of HDF5 file
+    -cursor starts at the last stored trade (or since) and
+    moves forward until Gemini returns no newer trades
+
+    Parameters
+    ==========
+    api : GeminiAPI
+        API object used for requests
+    symbol : str
+        Gemini symbol of trades, e.g. 'btcusd'
+    file : str
+        name of HDF5 file (trades go to sibling file data_trades.h5)
+    since : datetime or int
+        start of download (ms since epoch if int)
+        -default: last stored trade, or most recent trades
+    max_requests : int
+        stop after this many requests (default: no limit)
+
+    Returns
+    =======
+    return : int
+        number of new trades stored
+    """
+    symbol = ensure_trade_symbol(symbol)
+    if since is None:
+        metadata = get_trades_metadata(symbol, file)
+        if metadata is not None:
+            since = metadata['max_timestamp']
+    elif not isinstance(since, (int, np.integer)):
+        since = convert_datetime_to_timestamp(convert_to_datetime(since))
+
+    stored, requests = 0, 0
+    while max_requests is None or requests < max_requests:
+        trades = api.get_trades_history(symbol, since=since, limit_trades=MAX_TRADES,
+                                        dataframe=False)
+        requests += 1
+        if not isinstance(trades, list) or len(trades) == 0:
+            break
+        new = store_trades(symbol, trades, file=file)
+        stored += new
+        cursor = max(int(trade['timestampms']) for trade in trades)
+        # done once caught up, or if the cursor cannot move on
+        if len(trades) < MAX_TRADES or (new == 0 and cursor == since):
+            break
+        since = cursor
+    print('{} new trades of {} stored in {}'.format(stored, symbol, get_trade_file(file)))
+    return stored
+
+
+def backfill_trades(api, symbol, start, end=None, file='data.h5', max_workers=4,
+                    interval=None):
+    """
+    Download public trades of symbol from Gemini over a time
+    range, sub-ranges concurrently (GeminiAPI.backfill_trades_history()),
+    storing each chunk as it arrives so memory use stays flat
+    -trades already stored are skipped
+
+    Parameters
+    ==========
+    api : GeminiAPI
+        API object used for requests
+    symbol : str
+        Gemini symbol of trades, e.g. 'btcusd'
+    start, end : datetime or int
+        range of download (ms since epoch if int), end default now
+    file : str
+        name of HDF5 file (trades go to sibling file data_trades.h5)
+    max_workers : int
+        number of sub-ranges downloaded at once
+    interval : int or timedelta
+        length of sub-ranges (default: GeminiAPI's, 1 hour)
+
+    Returns
+    =======
+    return : int
+        number of new trades stored
+    """
+    symbol = ensure_trade_symbol(symbol)
+    start, end = [date if date is None or isinstance(date, (int, np.integer))
+                  else convert_datetime_to_timestamp(convert_to_datetime(date))
+                  for date in [start, end]]
+    kwargs = dict() if interval is None else {'interval': interval}
+    stored = 0
+    for trades in api.backfill_trades_history(symbol, start, end, max_workers=max_workers,
+                                              dataframe=False, **kwargs):
+        stored += store_trades(symbol, trades, file=file)
+    print('{} new trades of {} stored in {}'.format(stored, symbol, get_trade_file(file)))
+    return stored
+
+
+def read_trades(symbol, start=None, end=None, file='data.h5', dataframe=True):
+    """
+    Read stored trades of symbol between start and end (inclusive)
+
+    Parameters
+    ==========
+    symbol : str
+        Gemini symbol of trades, e.g. 'btcusd'
+    start, end : datetime
+        first and last date of timeslice to read
+        -default: all stored trades
+    file : str
+        name of HDF5 file (trades are read from data_trades.h5)
+    dataframe : bool
+        return DataFrame indexed by datetime, otherwise
+        array of TradeTable rows
+
+    Returns
+    =======
+    return : DataFrame or array
+        trades sorted by timestamp (None if none stored)
+    """
+    symbol = ensure_trade_symbol(symbol)
+    start_ms = None if start is None else convert_datetime_to_timestamp(convert_to_datetime(start))
+    end_ms = None if end is None else convert_datetime_to_timestamp(convert_to_datetime(end))
+    if start_ms is not None and end_ms is not None and start_ms > end_ms:
+        raise ValueError('Start time must not be after end time')
+    trade_file = get_trade_file(file)
+
+    try:
+        with tb.open_file(trade_file, 'r', libver='latest') as f:
+            node = get_trade_node(f, symbol)
+            if node is None:
+                print('No trades found for {} in {}'.format(symbol, trade_file))
+                return
+            parts = list()
+            for table in get_partition_tables(node, start_ms, end_ms):
+                timestamps = table.col('timestamp')
+                first = 0 if start_ms is None else np.searchsorted(timestamps, start_ms, 'left')
+                last = len(timestamps) if end_ms is None else \
+                    np.searchsorted(timestamps, end_ms, 'right')
+                if last > first:
+                    parts.append(table.read(first, last))
+        records = np.concatenate(parts) if parts else np.empty(0, dtype=TRADE_DTYPE)
+    except:
+        print("Error reading trades from {}".format(trade_file))
+        return
+    if not dataframe:
+        return records
+    return DataFrame({col: records[col] for col in ['tid', 'price', 'amount', 'side']},
+                     index=to_datetime(records['timestamp'], unit='ms'),
+                     columns=['tid', 'price', 'amount', 'side'])
+
+
+def get_trades_metadata(symbol, file='data.h5'):
+    """
+    Get stored metadata of trades of symbol
+
+    Returns
+    =======
+    return : dict
+        min_timestamp, max_timestamp : ms since epoch of first/last trade
+        nrows : number of stored trades
+        last_tid : highest stored trade ID
+        last_append : ms since epoch of last append
+        (None if no trades stored)
+    """
+    symbol = ensure_trade_symbol(symbol)
+    trade_file = get_trade_file(file)
+    if not os.path.isfile(trade_file):
+        return
+    try:
+        with tb.open_file(trade_file, 'r', libver='latest') as f:
+            node = get_trade_node(f, symbol)
+            if node is None:
+                return
+            return {attr: node._v_attrs[attr] for attr in
+                    ['min_timestamp', 'max_timestamp', 'nrows', 'last_tid', 'last_append']}
+    except:
+        return
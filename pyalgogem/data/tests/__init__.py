@@ -0,0 +1,8 @@
+#
+# PyAlgoGem Project
+# data/tests/
+#
+# tests of local HDF5 data storage
+#
+# Andrew Edmonds - 2018
+#
@@ -0,0 +1,27 @@
+#
+# PyAlgoGem Project
+# data/tests/conftest
+#
+# fixtures shared by tests of data storage
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_bars(start, periods, freq='min', seed=0):
+    """Random-walk bars indexed by datetime, as returned by CryptoCompare"""
+    close = 1000 + np.cumsum(np.random.RandomState(seed).normal(0, 1, periods))
+    index = pd.date_range(start, periods=periods, freq=freq)
+    return pd.DataFrame({'close': close, 'high': close + 1, 'low': close - 1, 'open': close,
+                         'volumefrom': np.ones(periods), 'volumeto': close}, index=index)
+
+
+@pytest.fixture
+def datafile(tmpdir):
+    """Name of new, empty HDF5 file"""
+    from pyalgogem.data import create_datafile
+    return create_datafile(str(tmpdir.join('data.h5')))
@@ -0,0 +1,69 @@
+#
+# PyAlgoGem Project
+# data/tests/test_append_writer
+#
+# tests of the single-writer append queue
+#
+# Andrew Edmonds - 2018
+#
+
+import threading
+import numpy as np
+import pytest
+
+from pyalgogem.data import DatafileWriter, append_to_datafile, read_datafile
+
+from .conftest import make_bars
+
+
+def test_concurrent_producers(datafile):
+    bars = {symbol: make_bars('2018-01-01', 600, seed=seed)
+            for seed, symbol in enumerate(['BTC', 'ETH'])}
+
+    def produce(writer, symbol):
+        # small frames, as from a live recorder
+        for start in range(0, 600, 20):
+            writer.put(symbol, bars[symbol].iloc[start:start + 20], window='M')
+
+    with DatafileWriter(datafile, flush_interval=0.05) as writer:
+        threads = [threading.Thread(target=produce, args=(writer, symbol)) for symbol in bars]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.flush()
+        stats = writer.get_stats()
+    assert stats['rows_written'] == 1200 and stats['queue_depth'] == 0
+    for symbol, frame in bars.items():
+        assert np.allclose(read_datafile(symbol, file=datafile, window='M').values, frame.values)
+
+
+def test_stored_rows_are_dropped(datafile):
+    bars = make_bars('2018-01-01', 300)
+    append_to_datafile('BTC', bars.iloc[:200], file=datafile, window='M')
+    with DatafileWriter(datafile) as writer:
+        writer.put('BTC', bars.iloc[100:], window='M')
+        writer.flush()
+        stats = writer.get_stats()
+    assert stats['rows_dropped'] == 100 and stats['rows_written'] == 100
+    assert len(read_datafile('BTC', file=datafile, window='M')) == 300
+
+
+def test_failed_frames_are_kept(datafile):
+    bars = make_bars('2018-01-01', 100)
+    with DatafileWriter(datafile) as writer:
+        # wrong columns for the table - does not hold up the other symbol
+        writer.put('BTC', bars[['close']], window='M')
+        writer.put('ETH', bars, window='M')
+        writer.flush()
+        failed = writer.get_failed()
+        assert writer.get_stats()['errors'] == 1
+    assert [(symbol, window, len(frame)) for symbol, window, frame in failed] == [('BTC', 'M', 100)]
+    assert writer.get_failed() == []
+    assert len(read_datafile('ETH', file=datafile, window='M')) == 100
+
+
+def test_put_requires_running_writer(datafile):
+    writer = DatafileWriter(datafile)
+    with pytest.raises(ValueError):
+        writer.put('BTC', make_bars('2018-01-01', 10), window='M')
@@ -0,0 +1,91 @@
+#
+# PyAlgoGem Project
+# data/tests/test_bar_builder
+#
+# tests of streaming aggregation of trades into bars
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyalgogem.data import BarBuilder, build_bars, read_datafile
+from pyalgogem.deploy._mock_exchange import MockMarket
+
+
+@pytest.fixture
+def trades():
+    """An hour of public trades of a mock market, 3 seconds apart"""
+    return list(MockMarket('btcusd', 10000, history=1200, seed=0).trades)
+
+
+def resample_trades(trades, freq):
+    frame = pd.DataFrame({'price': [float(trade['price']) for trade in trades],
+                          'amount': [float(trade['amount']) for trade in trades]},
+                         index=pd.to_datetime([trade['timestampms'] for trade in trades],
+                                              unit='ms'))
+    frame['value'] = frame['price'] * frame['amount']
+    resampler = frame.resample(freq)
+    bars = pd.DataFrame({'close': resampler['price'].last(), 'high': resampler['price'].max(),
+                         'low': resampler['price'].min(), 'open': resampler['price'].first(),
+                         'vol_from': resampler['amount'].sum(), 'vol_to': resampler['value'].sum()})
+    return bars[['close', 'high', 'low', 'open', 'vol_from', 'vol_to']]
+
+
+def process_batches(builder, trades, size):
+    bars = [builder.process(trades[start:start + size]) for start in range(0, len(trades), size)]
+    return pd.concat([frame for frame in bars + [builder.flush()] if len(frame) > 0])
+
+
+def test_time_bars_match_resampled_trades(trades):
+    bars = build_bars(trades, interval='5min')
+    expected = resample_trades(trades, '5min')
+    assert (bars.index == expected.index).all()
+    assert np.allclose(bars.values, expected.values)
+
+
+def test_streamed_bars_match_batch_bars(trades):
+    # neighbouring trades arrive swapped, within the tolerance
+    swapped = list(trades)
+    swapped[1::2], swapped[::2] = trades[::2], trades[1::2]
+    builder = BarBuilder(interval='5min', tolerance=10000)
+    streamed = process_batches(builder, swapped, 37)
+    expected = build_bars(trades, interval='5min')
+    assert np.allclose(streamed.values, expected.values)
+    assert builder.get_stats()['late'] == 0
+    # overlapping requests repeat pending trades
+    builder = BarBuilder(interval='5min', tolerance=3600000)
+    builder.process(trades[:100])
+    builder.process(trades[50:100])
+    assert builder.get_stats()['duplicates'] == 50
+
+
+def test_trades_later_than_tolerance_are_dropped(trades):
+    builder = BarBuilder(interval='1min', tolerance=0)
+    builder.process(trades[100:200])
+    builder.process(trades[:10])
+    assert builder.get_stats()['late'] == 10
+
+
+def test_tick_and_volume_bars(trades):
+    tick = build_bars(trades, kind='tick', size=100)
+    assert len(tick) == 12
+    assert np.allclose(tick['vol_from'].values, [sum(float(trade['amount'])
+                                                     for trade in trades[start:start + 100])
+                                                 for start in range(0, 1200, 100)])
+    volume = process_batches(BarBuilder(kind='volume', size=20), trades, 45)
+    expected = build_bars(trades, kind='volume', size=20)
+    assert np.allclose(volume.values, expected.values)
+    # overshoot of a bar counts towards the next one
+    assert len(volume) == int(np.ceil(sum(float(trade['amount']) for trade in trades) / 20))
+
+
+def test_bars_are_stored(tmpdir, trades):
+    file = str(tmpdir.join('data.h5'))
+    builder = BarBuilder('BTC', window='M', file=file)
+    streamed = process_batches(builder, trades, 100)
+    assert np.allclose(read_datafile('BTC', file=file, window='M').values, streamed.values)
+    with pytest.raises(ValueError):
+        BarBuilder('BTC', interval='5min', window='M', file=file)
@@ -0,0 +1,49 @@
+#
+# PyAlgoGem Project
+# data/tests/test_bar_pyramid
+#
+# tests of pre-aggregated bar levels
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+
+from pyalgogem.data import append_to_datafile, build_pyramid, read_datafile
+
+from .conftest import make_bars
+
+
+def resample_bars(bars, freq):
+    resampler = bars.resample(freq)
+    return resampler.agg({'close': 'last', 'high': 'max', 'low': 'min', 'open': 'first',
+                          'volumefrom': 'sum', 'volumeto': 'sum'})[list(bars.columns)]
+
+
+def test_levels_match_resampled_minute_bars(datafile):
+    bars = make_bars('2018-01-01', 3000)
+    # appended in parts that split an hour
+    append_to_datafile('BTC', bars.iloc[:1730], file=datafile, window='M')
+    append_to_datafile('BTC', bars.iloc[1730:], file=datafile, window='M')
+    for level, freq in [('5m', '5min'), ('1h', '60min')]:
+        data = read_datafile('BTC', file=datafile, level=level, window='M')
+        expected = resample_bars(bars, freq)
+        assert (data.index == expected.index).all()
+        assert np.allclose(data.values, expected.values)
+
+
+def test_open_bar_is_pending(datafile):
+    bars = make_bars('2018-01-01', 90)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    # only the first hour is complete
+    assert len(read_datafile('BTC', file=datafile, level='1h', window='M')) == 1
+    append_to_datafile('BTC', make_bars('2018-01-01 01:30', 30), file=datafile, window='M')
+    assert len(read_datafile('BTC', file=datafile, level='1h', window='M')) == 2
+
+
+def test_build_pyramid_matches_appended_levels(datafile):
+    append_to_datafile('BTC', make_bars('2018-01-01', 3000), file=datafile, window='M')
+    before = read_datafile('BTC', file=datafile, level='15m', window='M')
+    build_pyramid('BTC', file=datafile)
+    after = read_datafile('BTC', file=datafile, level='15m', window='M')
+    assert np.allclose(before.values, after.values)
@@ -0,0 +1,48 @@
+#
+# PyAlgoGem Project
+# data/tests/test_column_reads
+#
+# tests of column-projected reads of stored timeseries
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pytest
+
+from pyalgogem.data import append_to_datafile, read_datafile
+
+from .conftest import make_bars
+
+
+@pytest.fixture
+def bars(datafile):
+    bars = make_bars('2018-01-01', 3000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    return bars
+
+
+def test_read_selected_columns(datafile, bars):
+    data = read_datafile('BTC', file=datafile, columns=['close', 'vol_to'], window='M')
+    assert list(data.columns) == ['close', 'vol_to']
+    assert (data.index == bars.index).all()
+    assert np.allclose(data.values, bars[['close', 'volumeto']].values)
+    # a single column name is accepted as well
+    close = read_datafile('BTC', file=datafile, columns='close', window='M')
+    assert list(close.columns) == ['close']
+
+
+def test_read_columns_of_timeslice(datafile, bars):
+    start, end = bars.index[1500].to_pydatetime(), bars.index[2499].to_pydatetime()
+    data = read_datafile('BTC', start=start, end=end, file=datafile, all_data=False,
+                         columns=['close'], window='M')
+    expected = bars.loc[start:end, ['close']]
+    assert len(data) == len(expected)
+    assert np.allclose(data.values, expected.values)
+
+
+def test_invalid_columns_raise(datafile, bars):
+    with pytest.raises(ValueError):
+        read_datafile('BTC', file=datafile, columns=['price'], window='M')
+    with pytest.raises(ValueError):
+        read_datafile('BTC', file=datafile, columns=[], window='M')
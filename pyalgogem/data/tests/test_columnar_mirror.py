@@ -0,0 +1,53 @@
+#
+# PyAlgoGem Project
+# data/tests/test_columnar_mirror
+#
+# tests of the memory-mapped columnar mirror
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+
+from pyalgogem.data import append_to_datafile, create_mirror, has_mirror, load_mirror, \
+    read_datafile
+
+from .conftest import make_bars
+
+
+def assert_mirror_equal(arrays, data):
+    timestamps = np.asarray(data.index.values, dtype='datetime64[ms]').astype(np.int64)
+    assert np.array_equal(arrays['timestamp'], timestamps)
+    for column in data.columns:
+        assert np.allclose(arrays[column], data[column].values)
+
+
+def test_mirror_matches_datafile(datafile):
+    append_to_datafile('BTC', make_bars('2018-01-01', 3000), file=datafile, window='M')
+    assert not has_mirror('BTC', file=datafile, window='M')
+    create_mirror('BTC', file=datafile, window='M')
+    arrays = load_mirror('BTC', file=datafile, window='M')
+    assert isinstance(arrays['close'], np.memmap)
+    assert_mirror_equal(arrays, read_datafile('BTC', file=datafile, window='M'))
+
+
+def test_mirror_follows_appends(datafile):
+    bars = make_bars('2018-01-01', 3000)
+    append_to_datafile('BTC', bars.iloc[:2000], file=datafile, window='M')
+    create_mirror('BTC', file=datafile, window='M')
+    append_to_datafile('BTC', bars.iloc[2000:], file=datafile, window='M')
+    arrays = load_mirror('BTC', file=datafile, window='M')
+    assert len(arrays['timestamp']) == 3000
+    assert_mirror_equal(arrays, read_datafile('BTC', file=datafile, window='M'))
+
+
+def test_load_timeslice_of_columns(datafile):
+    bars = make_bars('2018-01-01', 3000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    create_mirror('BTC', file=datafile, window='M')
+    start, end = bars.index[100].to_pydatetime(), bars.index[199].to_pydatetime()
+    arrays = load_mirror('BTC', start=start, end=end, file=datafile, columns=['close'],
+                         window='M')
+    assert sorted(arrays) == ['close', 'timestamp']
+    # start and end are inclusive
+    assert np.allclose(arrays['close'], bars['close'].values[100:200])
@@ -0,0 +1,57 @@
+#
+# PyAlgoGem Project
+# data/tests/test_file_management
+#
+# tests of compression and chunk shape of data files
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pytest
+import tables as tb
+
+from pyalgogem.data import append_to_datafile, create_datafile, read_datafile, repack_datafile
+
+from .conftest import make_bars
+
+
+def get_partition_tables(name):
+    with tb.open_file(name, 'r') as h5:
+        return [(table.filters, table.chunkshape)
+                for table in h5.walk_nodes('/BTC/M', classname='Table')]
+
+
+def test_partitions_use_storage_options_of_file(tmpdir):
+    name = create_datafile(str(tmpdir.join('data.h5')), complib='blosc:zstd', complevel=7,
+                           chunkshape=256)
+    append_to_datafile('BTC', make_bars('2018-01-01', 3000), file=name, window='M')
+    tables = get_partition_tables(name)
+    assert len(tables) > 0
+    for filters, chunkshape in tables:
+        assert filters.complib == 'blosc:zstd' and filters.complevel == 7
+        assert chunkshape == (256,)
+
+
+def test_repack_changes_storage_options_and_keeps_data(datafile):
+    bars = make_bars('2018-01-01', 3000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    repack_datafile(datafile, complib='zlib', complevel=1, chunkshape=512)
+    for filters, chunkshape in get_partition_tables(datafile):
+        assert filters.complib == 'zlib' and filters.complevel == 1
+        assert chunkshape == (512,)
+    assert np.allclose(read_datafile('BTC', file=datafile, window='M').values, bars.values)
+    # later partitions inherit the new options
+    append_to_datafile('BTC', make_bars('2018-01-03 02:00', 2000), file=datafile, window='M')
+    for filters, chunkshape in get_partition_tables(datafile):
+        assert filters.complib == 'zlib' and chunkshape == (512,)
+
+
+def test_invalid_storage_options_raise(tmpdir):
+    name = str(tmpdir.join('data.h5'))
+    with pytest.raises(ValueError):
+        create_datafile(name, complib='gzip')
+    with pytest.raises(ValueError):
+        create_datafile(name, complevel=10)
+    with pytest.raises(ValueError):
+        create_datafile(name, chunkshape=0)
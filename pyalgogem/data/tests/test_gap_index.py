@@ -0,0 +1,73 @@
+#
+# PyAlgoGem Project
+# data/tests/test_gap_index
+#
+# tests of the gap index and targeted backfill
+#
+# Andrew Edmonds - 2018
+#
+
+import datetime as dt
+import threading
+import numpy as np
+import pytest
+
+from pyalgogem.data import append_to_datafile, backfill_datafile, get_gaps, insert_to_datafile, \
+    read_datafile
+
+from .conftest import make_bars
+
+
+@pytest.fixture
+def bars(datafile):
+    bars = make_bars('2018-01-01', 3000)
+    # leave out two gaps
+    for part in [bars.iloc[:1000], bars.iloc[1500:2000], bars.iloc[2100:]]:
+        append_to_datafile('BTC', part, file=datafile, window='M')
+    return bars
+
+
+def get_bounds(bars, first, last):
+    return bars.index.tz_localize('UTC')[first].to_pydatetime(), \
+           bars.index.tz_localize('UTC')[last].to_pydatetime()
+
+
+def test_gaps_are_indexed(datafile, bars):
+    assert get_gaps('BTC', file=datafile, window='M') == [get_bounds(bars, 1000, 1499),
+                                                          get_bounds(bars, 2000, 2099)]
+
+
+def test_backfill_fetches_only_gaps(datafile, bars):
+    requested = list()
+    lock = threading.Lock()
+
+    def fetch(start, end):
+        with lock:
+            requested.append((start, end))
+        start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+        # sources return more bars than requested
+        return bars.loc[start - dt.timedelta(minutes=5):end + dt.timedelta(minutes=5)]
+
+    summary = backfill_datafile('BTC', fetch, file=datafile, window='M', max_workers=3,
+                                max_bars=200)
+    # 500 missing bars take 3 requests, 100 missing bars take 1
+    assert summary == {'gaps': 2, 'requests': 4, 'rows': 600}
+    assert sorted(requested)[0] == get_bounds(bars, 1000, 1199)
+    assert np.allclose(read_datafile('BTC', file=datafile, window='M').values, bars.values)
+    assert get_gaps('BTC', file=datafile, window='M') == []
+
+
+def test_gaps_without_source_data_stay_indexed(datafile, bars):
+    def fetch(start, end):
+        if start.replace(tzinfo=None) >= bars.index[2000]:
+            return None
+        return bars.loc[start.replace(tzinfo=None):end.replace(tzinfo=None)]
+
+    assert backfill_datafile('BTC', fetch, file=datafile, window='M')['rows'] == 500
+    assert get_gaps('BTC', file=datafile, window='M') == [get_bounds(bars, 2000, 2099)]
+
+
+def test_insert_skips_stored_rows(datafile, bars):
+    assert insert_to_datafile('BTC', bars.iloc[900:1100], file=datafile, window='M') == 100
+    assert get_gaps('BTC', file=datafile, window='M')[0] == get_bounds(bars, 1100, 1499)
+    assert len(read_datafile('BTC', file=datafile, window='M')) == 2500
@@ -0,0 +1,64 @@
+#
+# PyAlgoGem Project
+# data/tests/test_iter_datafile
+#
+# tests of chunked reads of stored timeseries
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyalgogem.data import append_to_datafile, iter_datafile, read_datafile
+
+from .conftest import make_bars
+
+
+@pytest.fixture
+def bars(datafile):
+    # parts of four daily partitions
+    bars = make_bars('2018-01-01 12:00', 4000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    return bars
+
+
+def test_daily_chunks_concatenate_to_full_read(datafile, bars):
+    chunks = list(iter_datafile('BTC', file=datafile, window='M'))
+    assert [len(chunk) for chunk in chunks] == [720, 1440, 1440, 400]
+    data = pd.concat(chunks)
+    assert data.index.is_monotonic_increasing
+    assert np.allclose(data.values, read_datafile('BTC', file=datafile, window='M').values)
+    assert [len(chunk) for chunk in iter_datafile('BTC', file=datafile, chunk='2D',
+                                                  window='M')] == [2160, 1840]
+
+
+def test_row_chunks_as_arrays(datafile, bars):
+    chunks = list(iter_datafile('BTC', file=datafile, rows=1500, columns=['close'], window='M',
+                                as_arrays=True))
+    assert [len(chunk['timestamp']) for chunk in chunks] == [1500, 1500, 1000]
+    assert sorted(chunks[0]) == ['close', 'timestamp']
+    assert np.allclose(np.concatenate([chunk['close'] for chunk in chunks]),
+                       bars['close'].values)
+    timestamps = np.concatenate([chunk['timestamp'] for chunk in chunks])
+    assert np.array_equal(timestamps, np.asarray(bars.index.values, dtype='datetime64[ms]')
+                          .astype(np.int64))
+
+
+def test_timeslice_and_early_close(datafile, bars):
+    start, end = bars.index[1000].to_pydatetime(), bars.index[2999].to_pydatetime()
+    chunks = iter_datafile('BTC', start=start, end=end, file=datafile, rows=500, window='M')
+    first = next(chunks)
+    assert first.index[0] == bars.index[1000] and len(first) == 500
+    # closing the generator releases the file
+    chunks.close()
+    append_to_datafile('BTC', make_bars('2018-01-04 06:40', 10), file=datafile, window='M')
+    assert len(read_datafile('BTC', file=datafile, window='M')) == 4010
+
+
+def test_invalid_chunks_raise(datafile, bars):
+    with pytest.raises(ValueError):
+        iter_datafile('BTC', file=datafile, chunk='1H', window='M')
+    with pytest.raises(ValueError):
+        iter_datafile('BTC', file=datafile, rows=0, window='M')
@@ -0,0 +1,48 @@
+#
+# PyAlgoGem Project
+# data/tests/test_metadata
+#
+# tests of min/max date metadata of stored timeseries
+#
+# Andrew Edmonds - 2018
+#
+
+import tables as tb
+
+from pyalgogem.data import append_to_datafile, get_datafile_metadata, get_minmax_daterange, \
+    rebuild_metadata
+
+from .conftest import make_bars
+
+
+def test_metadata_follows_appends(datafile):
+    assert get_minmax_daterange('BTC', file=datafile, window='M') == (None, None)
+    bars = make_bars('2018-01-01', 3000)
+    append_to_datafile('BTC', bars.iloc[:1000], file=datafile, window='M')
+    append_to_datafile('BTC', bars.iloc[1000:], file=datafile, window='M')
+    metadata = get_datafile_metadata('BTC', file=datafile, window='M')
+    assert metadata['nrows'] == 3000
+    assert metadata['min_timestamp'] == bars.index.tz_localize('UTC')[0]
+    assert metadata['max_timestamp'] == bars.index.tz_localize('UTC')[-1]
+    assert metadata['last_append'] is not None
+    assert get_minmax_daterange('BTC', file=datafile, window='M') == \
+        (metadata['min_timestamp'], metadata['max_timestamp'])
+
+
+def test_rebuild_metadata_of_older_file(datafile):
+    bars = make_bars('2018-01-01', 3000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    expected = get_datafile_metadata('BTC', file=datafile, window='M')
+    # files written by older versions hold no metadata
+    with tb.open_file(datafile, 'a') as h5:
+        attrs = h5.get_node('/BTC/M')._v_attrs
+        for attr in ['min_timestamp', 'max_timestamp', 'nrows', 'last_append']:
+            del attrs[attr]
+    assert get_datafile_metadata('BTC', file=datafile, window='M') is None
+    # min and max fall back to walking the timeseries
+    assert get_minmax_daterange('BTC', file=datafile, window='M') == \
+        (expected['min_timestamp'], expected['max_timestamp'])
+    rebuild_metadata(datafile)
+    metadata = get_datafile_metadata('BTC', file=datafile, window='M')
+    for attr in ['min_timestamp', 'max_timestamp', 'nrows']:
+        assert metadata[attr] == expected[attr]
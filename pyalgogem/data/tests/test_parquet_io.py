@@ -0,0 +1,76 @@
+#
+# PyAlgoGem Project
+# data/tests/test_parquet_io
+#
+# tests of Parquet export and import
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import numpy as np
+import pytest
+
+from pyalgogem.data import append_to_datafile, create_datafile, export_parquet, import_parquet, \
+    read_datafile
+
+from .conftest import make_bars
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def read_partition(directory, name):
+    return pq.read_table(os.path.join(directory, 'BTC', 'M', name)).to_pandas().set_index('timestamp')
+
+
+def test_export_is_partitioned_and_imports_back(tmpdir, datafile):
+    bars = make_bars('2018-01-30', 6000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    directory = str(tmpdir.join('parquet'))
+    assert export_parquet('BTC', directory, file=datafile, window='M') == 6000
+    assert sorted(os.listdir(os.path.join(directory, 'BTC', 'M'))) == ['2018-01.parquet',
+                                                                    '2018-02.parquet']
+    other = create_datafile(str(tmpdir.join('other.h5')))
+    append_to_datafile('BTC', bars.iloc[1000:2000], file=other, window='M')
+    # rows already stored are skipped
+    assert import_parquet('BTC', directory, file=other, window='M') == 5000
+    assert np.allclose(read_datafile('BTC', file=other, window='M').values, bars.values)
+
+
+def test_exporting_twice_into_partition_keeps_other_rows(tmpdir, datafile):
+    bars = make_bars('2018-01-01', 3000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    directory = str(tmpdir.join('parquet'))
+    export_parquet('BTC', directory, file=datafile, window='M')
+    # second export of a partial range, with changed values
+    update = make_bars('2018-01-01 10:00', 100, seed=1)
+    other = create_datafile(str(tmpdir.join('other.h5')))
+    append_to_datafile('BTC', update, file=other, window='M')
+    assert export_parquet('BTC', directory, file=other, window='M') == 100
+    merged = read_partition(directory, '2018-01.parquet')
+    assert len(merged) == 3000
+    assert merged.index.is_monotonic_increasing and merged.index.is_unique
+    assert np.allclose(merged['close'].values[600:700], update['close'].values)
+    assert np.allclose(merged['close'].values[:600], bars['close'].values[:600])
+    assert np.allclose(merged['close'].values[700:], bars['close'].values[700:])
+    assert not os.path.exists(os.path.join(directory, 'BTC', 'M', '2018-01.parquet.tmp'))
+
+
+def test_export_range_by_day_in_row_groups(tmpdir, datafile):
+    bars = make_bars('2018-01-01', 5000)
+    append_to_datafile('BTC', bars, file=datafile, window='M')
+    directory = str(tmpdir.join('parquet'))
+    start, end = bars.index[1000].to_pydatetime(), bars.index[3999].to_pydatetime()
+    assert export_parquet('BTC', directory, start=start, end=end, file=datafile, window='M',
+                          partition='D') == 3000
+    assert sorted(os.listdir(os.path.join(directory, 'BTC', 'M'))) == \
+        ['2018-01-01.parquet', '2018-01-02.parquet', '2018-01-03.parquet']
+    # monthly file is streamed one day (row group) at a time
+    export_parquet('BTC', str(tmpdir.join('monthly')), file=datafile, window='M')
+    monthly = pq.ParquetFile(str(tmpdir.join('monthly', 'BTC', 'M', '2018-01.parquet')))
+    assert monthly.metadata.num_row_groups == 4 and monthly.metadata.num_rows == 5000
+
+
+def test_invalid_partition_raises(tmpdir, datafile):
+    with pytest.raises(ValueError):
+        export_parquet('BTC', str(tmpdir), file=datafile, window='M', partition='W')
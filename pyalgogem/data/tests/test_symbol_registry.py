@@ -0,0 +1,57 @@
+#
+# PyAlgoGem Project
+# data/tests/test_symbol_registry
+#
+# tests of the symbol registry and per-symbol storage groups
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pytest
+import tables as tb
+
+from pyalgogem.data import SymbolRegistry, append_to_datafiles, get_symbols, migrate_datafile, \
+    read_datafile, read_datafiles, register_symbol, registry
+from pyalgogem.data._symbol_registry import CryptoCompareTable
+
+from .conftest import make_bars
+
+
+def test_registry_normalizes_and_validates():
+    symbols = SymbolRegistry(symbols=['btc'], windows=['D'])
+    symbols.register('ethusd')
+    assert symbols.symbols == ['BTC', 'ETHUSD']
+    assert symbols.ensure_symbol('EthUsd') == 'ETHUSD'
+    assert symbols.get_path('btc', 'd') == '/BTC/D'
+    with pytest.raises(ValueError):
+        symbols.ensure_symbol('XRP')
+    with pytest.raises(ValueError):
+        symbols.ensure_window('M')
+    with pytest.raises(ValueError):
+        symbols.register('BTC/USD')
+
+
+def test_registered_symbols_are_stored_per_group(datafile):
+    register_symbol('ZEC')
+    try:
+        assert 'ZEC' in get_symbols()
+        bars = {'BTC': make_bars('2018-01-01', 100), 'ZEC': make_bars('2018-01-01', 100, seed=1)}
+        append_to_datafiles(bars, file=datafile, window='H')
+        with tb.open_file(datafile, 'r') as h5:
+            assert '/BTC/H' in h5 and '/ZEC/H' in h5
+        data = read_datafiles(['BTC', 'ZEC'], file=datafile, window='H')
+        for symbol, frame in bars.items():
+            assert np.allclose(data[symbol].values, frame.values)
+    finally:
+        registry.unregister('ZEC')
+
+
+def test_migrate_single_timeseries_layout(datafile):
+    bars = make_bars('2018-01-01', 100)
+    # older versions stored one timeseries per symbol at /<symbol>
+    with tb.open_file(datafile, 'a') as h5:
+        h5.create_ts('/', 'BTC', CryptoCompareTable).append(bars)
+    assert read_datafile('BTC', file=datafile) is None
+    migrate_datafile(datafile, window='D')
+    assert np.allclose(read_datafile('BTC', file=datafile).values, bars.values)
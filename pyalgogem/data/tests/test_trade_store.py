@@ -0,0 +1,72 @@
+#
+# PyAlgoGem Project
+# data/tests/test_trade_store
+#
+# tests of the local store of public trades
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pytest
+
+from pyalgogem.data import get_trades_metadata, read_trades, store_trades, sync_trades
+from pyalgogem.data._helper_functions import convert_timestamp_ms_to_datetime
+from pyalgogem.deploy._mock_exchange import MockMarket
+
+
+class MarketAPI(object):
+    """GeminiAPI stand-in serving the public trades of a mock market"""
+
+    def __init__(self, market):
+        self.market = market
+        self.requests = 0
+
+    def get_trades_history(self, symbol, since=None, limit_trades=50, dataframe=True):
+        self.requests += 1
+        return self.market.get_trades(since, limit_trades)
+
+
+@pytest.fixture
+def market():
+    return MockMarket('btcusd', 10000, history=1200, seed=0)
+
+
+def test_sync_pages_forward_and_resumes(tmpdir, market):
+    file = str(tmpdir.join('data.h5'))
+    api = MarketAPI(market)
+    assert sync_trades(api, 'btcusd', file=file, since=0) == 1200
+    # pages of 500 trades, the last one overlapping the previous
+    assert api.requests == 3
+    stored = read_trades('btcusd', file=file)
+    assert list(stored['tid']) == [trade['tid'] for trade in market.trades]
+    assert stored.index.is_monotonic_increasing
+    for _ in range(10):
+        market.trade()
+    # resumes from the last stored trade
+    assert sync_trades(api, 'btcusd', file=file) == 10
+    metadata = get_trades_metadata('btcusd', file=file)
+    assert metadata['nrows'] == 1210 and metadata['last_tid'] == market.trades[-1]['tid']
+
+
+def test_duplicate_and_late_trades(tmpdir, market):
+    file = str(tmpdir.join('data.h5'))
+    trades = list(market.trades)
+    assert store_trades('BTCUSD', trades[600:], file=file) == 600
+    assert store_trades('btcusd', trades[500:700], file=file) == 100
+    stored = read_trades('btcusd', file=file, dataframe=False)
+    assert len(stored) == 700
+    assert np.array_equal(stored['tid'], np.arange(501, 1201))
+    assert np.all(np.diff(stored['timestamp']) > 0)
+
+
+def test_read_range_is_inclusive(tmpdir, market):
+    file = str(tmpdir.join('data.h5'))
+    trades = list(market.trades)
+    store_trades('btcusd', trades, file=file)
+    start = convert_timestamp_ms_to_datetime(trades[100]['timestampms'])
+    end = convert_timestamp_ms_to_datetime(trades[199]['timestampms'])
+    stored = read_trades('btcusd', start=start, end=end, file=file)
+    assert list(stored['tid']) == list(range(101, 201))
+    with pytest.raises(ValueError):
+        read_trades('btcusd', start=end, end=start, file=file)
@@ -7,5 +7,12 @@
 # Andrew Edmonds - 2018
 #
 
-from ._gemini_api import GeminiAPI
-from ._gemini_streamer_api import GeminiStreamAPI
+from pyalgogem._lazy_loader import lazy_attributes
+
+lazy_attributes(__name__, {'._gemini_api': ['GeminiAPI'],
+                           '._gemini_async_api': ['AsyncGeminiAPI'],
+                           '._gemini_streamer_api': ['GeminiStreamAPI'],
+                           '._nonce': ['NonceGenerator'],
+                           '._order_book': ['OrderBook'],
+                           '._order_state': ['OrderStateCache'],
+                           '._mock_exchange': ['MockGeminiExchange']})
@@ -16,14 +16,28 @@ import time
 import base64
 import json
 import requests
-import pandas as pd
+import threading
 import datetime as dt
 
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from ._latency_metrics import LatencyRecorder
+from ._nonce import NonceGenerator, get_key_lock
+from ._order_state import OrderStateCache
+from ._response_cache import ResponseCache
+from ._history_backfill import iter_history, MAX_RESULTS, TRADES_INTERVAL, AUCTIONS_INTERVAL
+from ._rate_limiter import make_limiter, PUBLIC_BURST, PRIVATE_RATE, PRIVATE_BURST
+
 
 class GeminiAPI(object):
     """
     Wrapper class object for Retrieval of Price Data
     For Cryptocurrencies Using the CryptoCompare API
+    -safe to share between threads (e.g. a thread pool sending
+    cancels and status polls): connections are pooled, nonces
+    strictly increasing, and private requests of an API key are
+    sent one at a time, so they reach Gemini in nonce order
 
     Methods
     =======
@@ -31,10 +45,24 @@ class GeminiAPI(object):
         sends all public requests to Gemini server
     send_private_request :
         sends all private requests to Gemini server
+    sign_private_request :
+        nonce and sign private request just before it is sent
+    make_private_headers :
+        nonce and sign payload of private request
+    send_request :
+        sends request on pooled session, recording latency
+    send_cached_request :
+        sends request unless its response is cached
     new_order :
         create new trade order
+    new_orders :
+        create many trade orders from a thread pool
     cancel_order :
         cancel trade order
+    cancel_orders :
+        cancel many trade orders from a thread pool
+    get_batch_stats :
+        get throughput of last batch of orders/cancels
     cancel_all_session_orders :
         kill all orders placed during current session
     cancel_all_active_orders :
@@ -43,6 +71,10 @@ class GeminiAPI(object):
         get current status of any order via order ID
     get_active_orders :
         get all open active orders
+    get_cached_order_status :
+        get status of order from order events cache (no request)
+    get_cached_active_orders :
+        get live orders from order events cache (no request)
     get_past_trades :
         get past history of trades placed
     get_trade_volumes :
@@ -59,57 +91,235 @@ class GeminiAPI(object):
         get current order book on Gemini network
     get_trades_history :
         get history of trades on Gemini
+    backfill_trades_history :
+        get trades of time range in chunks, downloaded concurrently
     get_current_auction :
         get current status of exchange auction
     get_auction_history :
         get historical data of exchange auction
+    backfill_auction_history :
+        get auction events of time range in chunks, downloaded concurrently
+    iter_history :
+        download paginated history concurrently, used by backfills
     make_timestamp :
         create timestamp to use for API calls
+    get_latency_stats :
+        get latency histograms of requests per endpoint
+    reset_latency_stats :
+        remove all recorded latencies
+    record_latency :
+        record latency of request sent to endpoint
+    get_cache_stats :
+        get hits and misses of cached responses per method
+    invalidate_cache :
+        remove cached responses
+    close :
+        close pooled connections to Gemini server
     """
 
-    def __init__(self, key, secret_key, sandbox=True, debug=False):
+    def __init__(self, key, secret_key, sandbox=True, debug=False, timeout=10,
+                 pool_connections=2, pool_maxsize=16, nonce_file=None, url=None,
+                 public_rate=None, public_burst=PUBLIC_BURST,
+                 private_rate=PRIVATE_RATE, private_burst=PRIVATE_BURST, cache_ttl=None):
         self.__key = key
         self.__secret_key = secret_key
         self.__sandbox = sandbox
         self.__debug = debug
         self.__last_order_id = None
-        if sandbox:
+        self.__order_lock = threading.Lock()
+        # nonces stay increasing across threads, and across
+        # restarts if their high-water mark is kept in nonce_file
+        self.__nonce = NonceGenerator(nonce_file)
+        # shared by all clients of key in this process
+        self.__key_lock = get_key_lock(key)
+        self.__timeout = timeout
+        if url is not None:
+            # e.g. local mock exchange
+            self.__url = url.rstrip('/') + '/'
+        elif sandbox:
             self.__url = 'https://api.sandbox.gemini.com/v1/'
         else:
             self.__url = 'https://api.gemini.com/v1/'
+        # one session keeps connections alive between requests, so
+        # orders and cancels skip the TCP and TLS handshakes
+        # -pool_maxsize connections are kept per host, enough for
+        # requests sent from a thread pool
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.__session.mount('https://', adapter)
+        self.__session.mount('http://', adapter)
+        self.__latency = LatencyRecorder()
+        # separate token buckets (None - no limit) keep public and
+        # private requests under Gemini's rate limits - public
+        # requests are only limited if asked, e.g. public_rate=1
+        self.public_limiter = make_limiter(public_rate, public_burst)
+        self.private_limiter = make_limiter(private_rate, private_burst)
+        self.__batch_stats = None
+        # kept up to date by GeminiStreamAPI.subscribe_orders()
+        self.order_cache = OrderStateCache()
+        # responses of get_symbols(), get_ticker() and get_trade_volume()
+        # are kept for cache_ttl seconds per method, e.g. {'ticker': 0.2}
+        self.cache = ResponseCache(cache_ttl)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def url(self):
+        """Base URL of Gemini REST API"""
+        return self.__url
+
+    @property
+    def key_lock(self):
+        """Lock held by private requests of API key from signing until answered"""
+        return self.__key_lock
+
+    @property
+    def timeout(self):
+        """Seconds to wait for response of Gemini server"""
+        return self.__timeout
+
+    def close(self):
+        """Close pooled connections to Gemini server"""
+        self.__session.close()
+
+    def get_latency_stats(self, endpoint=None):
+        """
+        Get latency statistics of requests sent per endpoint
+        -symbols are dropped from endpoints, e.g. 'book/btcusd'
+        is recorded as 'book/'
+
+        Parameters
+        ==========
+        endpoint : str
+            endpoint to get statistics of, e.g. 'order/new'
+            -default: all endpoints
+
+        Returns
+        =======
+        return : dict
+            count : number of completed requests
+            errors : number of failed requests
+            mean, min, max : latency in milliseconds
+            p50, p90, p99 : percentile latencies in milliseconds
+                (upper bound of histogram bucket)
+            buckets : number of requests per bucket, keyed by
+                upper bound in milliseconds
+            (dict of these per endpoint if no endpoint given)
+        """
+        return self.__latency.get_stats(endpoint)
+
+    def reset_latency_stats(self):
+        """Remove all recorded latencies"""
+        self.__latency.reset()
+
+    def record_latency(self, method, latency=None):
+        """Record latency (ms) of request to method, or an error if None"""
+        self.__latency.record(method, latency)
+
+    def send_request(self, http_method, path, wait=0, **kwargs):
+        """
+        Send request to path (method and query string) on pooled
+        session after waiting wait seconds (for rate limiter),
+        recording its latency under the method's endpoint
+        """
+        if wait > 0:
+            time.sleep(wait)
+        url = self.__url + path
+        method = path.split('?')[0]
+        started = time.perf_counter()
+        try:
+            response = self.__session.request(http_method, url, timeout=self.__timeout, **kwargs)
+        except:
+            self.record_latency(method)
+            raise
+        self.record_latency(method, (time.perf_counter() - started) * 1000)
+        return response.json()
+
+    def send_cached_request(self, method, key, function, *args):
+        """
+        Call function (sending request) with args unless response
+        of method (e.g. 'ticker') and key (e.g. symbol) is cached
+        -concurrent calls wait for the same request
+        """
+        return self.cache.fetch(method, key, lambda: function(*args))
+
+    def get_cache_stats(self, method=None):
+        """
+        Get hits, misses, coalesced requests and hit rate of cached
+        responses per method ('symbols', 'ticker', 'tradevolume'),
+        see ResponseCache.get_stats()
+        """
+        return self.cache.get_stats(method)
+
+    def invalidate_cache(self, method=None, key=None):
+        """
+        Remove cached responses of method (all if None), and
+        key (e.g. symbol of 'ticker') - next calls send requests
+        """
+        self.cache.invalidate(method, key)
 
     def send_public_request(self, method, **kwargs):
         """Sends all public request to the Gemini server"""
-        url = self.__url + method
+        path = method
         paras = list()
 
         for key in kwargs:
             paras.append('%s=%s' % (key, kwargs[key]))
         if len(paras) is not 0:
             paras_string = '&'.join(paras)
-            url = url + '?' + paras_string
+            path = path + '?' + paras_string
         if self.__debug:
-            print('URL: ', url)
+            print('URL: ', self.__url + path)
+        wait = 0 if self.public_limiter is None else self.public_limiter.reserve()
 
-        return requests.get(url, timeout=10).json()
+        return self.send_request('GET', path, wait=wait)
 
     def send_private_request(self, method, payload):
-        """Sends all private requests to the Gemini server"""
-        payload['nonce'] = str(int(time.time() * 100000))
-        payload = json.dumps(payload)
-
-        payload_encode = base64.b64encode(bytearray(payload, 'utf-8'))
-        sig = hmac.new(bytearray(self.__secret_key, 'utf-8'),
-                       payload_encode, hashlib.sha384).hexdigest()
-        headers = {'X-GEMINI-APIKEY': self.__key,
-                   'X-GEMINI-PAYLOAD': payload_encode,
-                   'X-GEMINI-SIGNATURE': sig}
-        url = self.__url + method
+        """
+        Sends all private requests to the Gemini server
+        -waits for the rate limiter before the payload is nonced
+        and signed, so requests go out with fresh nonces in order
+        -the key's lock is held from signing until the response
+        arrives, as requests of other threads could overtake it
+        -a request rejected for its nonce (e.g. used by another
+        process with the same key) is signed again and resent once
+        """
+        if self.private_limiter is not None:
+            self.private_limiter.acquire()
+        with self.__key_lock:
+            response = self.send_request('POST', method,
+                                         headers=self.sign_private_request(method, payload))
+            if is_invalid_nonce(response):
+                response = self.send_request('POST', method,
+                                             headers=self.sign_private_request(method, payload))
+
+        return response
+
+    def sign_private_request(self, method, payload):
+        """Headers of private request to method, printing it in debug mode"""
+        headers = self.make_private_headers(payload)
         if self.__debug:
-            print('URL: ', url)
+            print('URL: ', self.__url + method)
             print('Payload: ', payload)
+        return headers
 
-        return requests.post(url, headers=headers, timeout=10).json()
+    def make_private_headers(self, payload):
+        """
+        Add nonce to payload (dict) and get headers of request
+        signed with secret key (HMAC-SHA384), also used to
+        subscribe to order events
+        """
+        payload['nonce'] = str(self.__nonce.next())
+        payload_encode = base64.b64encode(bytearray(json.dumps(payload), 'utf-8'))
+        sig = hmac.new(bytearray(self.__secret_key, 'utf-8'),
+                       payload_encode, hashlib.sha384).hexdigest()
+        return {'X-GEMINI-APIKEY': self.__key,
+                'X-GEMINI-PAYLOAD': payload_encode.decode(),
+                'X-GEMINI-SIGNATURE': sig}
 
     def new_order(self, symbol, amount, price, side, option='',
                   client_order_id=False):
@@ -208,18 +418,115 @@ class GeminiAPI(object):
 
         if client_order_id is not False:
 
-            if self.last_order_id and not client_order_id > self.last_order_id:
-                raise ValueError(
-                    'client_order_id is not increasing ( %s !> %s )'
-                    % (client_order_id, self.last_order_id))
+            # check and update together, orders may be sent from many threads
+            with self.__order_lock:
+                if self.__last_order_id and not client_order_id > self.__last_order_id:
+                    raise ValueError(
+                        'client_order_id is not increasing ( %s !> %s )'
+                        % (client_order_id, self.__last_order_id))
 
-            self.last_order_id = client_order_id
+                self.__last_order_id = client_order_id
             params['client_order_id'] = str(client_order_id)
 
         res = self.send_private_request(method, params)
 
         return res
 
+    def new_orders(self, orders, max_workers=8):
+        """
+        Place many orders from a thread pool, under the private rate
+        limiter - requests of the key are still sent one at a time
+        (see send_private_request()), so none is rejected for its nonce
+
+        Parameters
+        ==========
+        orders : list of dict or tuple
+            arguments of new_order() of each order, e.g.
+            {'symbol': 'btcusd', 'amount': 0.1, 'price': 9500, 'side': 'buy'}
+            or ('btcusd', 0.1, 9500, 'buy')
+        max_workers : int
+            max number of orders sent at once
+
+        Response
+        ========
+        List of results of new_order(), in order of orders
+        -an order raising an error gets a dictionary with
+        'result': 'error', 'reason' and 'message' (as Gemini errors)
+        -throughput of batch is returned by get_batch_stats()
+        """
+        return self.send_batch(self.new_order, [get_call_arguments(order) for order in orders],
+                               max_workers)
+
+    def cancel_orders(self, order_ids, max_workers=8):
+        """
+        Cancel many orders from a thread pool, under the private rate
+        limiter, sent one at a time as new_orders()
+
+        Parameters
+        ==========
+        order_ids : list
+            order IDs as given in the field 'order_id' of
+            the return of new_order()
+        max_workers : int
+            max number of cancels sent at once
+
+        Response
+        ========
+        List of results of cancel_order(), in order of order_ids
+        (see new_orders())
+        """
+        return self.send_batch(self.cancel_order, [((order_id,), dict()) for order_id in order_ids],
+                               max_workers)
+
+    def send_batch(self, function, calls, max_workers=8):
+        """
+        Call function with each (args, kwargs) of calls on a thread
+        pool, returning results (or errors) in order of calls
+        -private requests wait for the key's lock, so they are
+        answered in nonce order
+        """
+        started = time.perf_counter()
+
+        def send(call):
+            try:
+                return function(*call[0], **call[1])
+            except Exception as error:
+                return make_error_result(error)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(send, calls))
+        self.set_batch_stats(results, time.perf_counter() - started)
+        return results
+
+    def set_batch_stats(self, results, seconds):
+        """Store statistics of last batch of requests"""
+        errors = sum(1 for result in results
+                     if isinstance(result, dict) and result.get('result') == 'error')
+        self.__batch_stats = {'requests': len(results),
+                              'errors': errors,
+                              'seconds': seconds,
+                              'requests_per_second': len(results) / seconds if seconds > 0 else None}
+        if self.__debug:
+            print('{} requests ({} errors) in {:.3f}s'.format(len(results), errors, seconds))
+
+    def get_batch_stats(self):
+        """
+        Get statistics of last new_orders()/cancel_orders() batch
+
+        Response
+        ========
+        requests : int
+            number of requests in batch
+        errors : int
+            number of requests returning an error
+        seconds : float
+            time taken by batch
+        requests_per_second : float
+            achieved throughput
+        (None if no batch sent yet)
+        """
+        return None if self.__batch_stats is None else dict(self.__batch_stats)
+
     def cancel_order(self, order_id):
         """
         This will cancel an order. If the order is already canceled,
@@ -370,6 +677,31 @@ class GeminiAPI(object):
         res = self.send_private_request(method, params)
         return res
 
+    def get_cached_order_status(self, order_id):
+        """
+        Gets the status of an order from the local cache kept up
+        to date by the order events stream (see
+        GeminiStreamAPI.subscribe_orders()), without a request
+
+        Response
+        ========
+        Fields of get_order_status() (prices and amounts as float)
+        plus 'state' ('accepted', 'booked', 'partially_filled',
+        'filled', 'cancelled', 'rejected', or 'closed' if found
+        closed after a reconnect), 'updated' (timestampms of last
+        event) - None if the order is not cached
+        -order_cache.synced is False while the stream is
+        recovering from a gap
+        """
+        return self.order_cache.get(order_id)
+
+    def get_cached_active_orders(self, symbol=None):
+        """
+        Gets all live orders (of symbol) from the local cache,
+        without a request (see get_cached_order_status())
+        """
+        return self.order_cache.get_active(symbol)
+
     def get_past_trades(self, symbol, limit_trades=50, since=None):
         """
         Delivers information about your trades in the past.
@@ -452,6 +784,7 @@ class GeminiAPI(object):
     def get_trade_volume(self):
         """
         Returns the trade volume.
+        (cached for cache_ttl['tradevolume'] seconds, default 60)
 
         Response
         =======
@@ -529,7 +862,8 @@ class GeminiAPI(object):
         method = 'tradevolume'
         params = {'request': '/v1/tradevolume'}
 
-        res = self.send_private_request(method, params)
+        res = self.send_cached_request('tradevolume', None, self.send_private_request,
+                                       method, params)
 
         return res
 
@@ -584,12 +918,16 @@ class GeminiAPI(object):
         # Public request
 
     def get_symbols(self):
-        """Returns a list of all available symbols for trading"""
-        return self.send_public_request('symbols')
+        """
+        Returns a list of all available symbols for trading
+        (cached for cache_ttl['symbols'] seconds, default 1 hour)
+        """
+        return self.send_cached_request('symbols', None, self.send_public_request, 'symbols')
 
     def get_ticker(self, symbol):
         """
         Returns information about recent trading activity for the symbol.
+        (cached for cache_ttl['ticker'] seconds, default 0.5)
 
         Parameters:
         symbol (string): The symbol to retrieve trading activities for.
@@ -615,9 +953,8 @@ class GeminiAPI(object):
                 The volume denominated in the quantity currency.
         """
         method = 'pubticker/' + symbol
-        kwargs = dict()
 
-        return self.send_public_request(method, **kwargs)
+        return self.send_cached_request('ticker', symbol, self.send_public_request, method)
 
     def get_current_order_book(self, symbol, limit_bids=50, limit_asks=50):
         """
@@ -756,14 +1093,7 @@ class GeminiAPI(object):
                                         include_breaks=include_breaks)
 
         if dataframe is True:
-            data = pd.DataFrame(data)
-            if len(data) > 0:
-                data['amount'] = data['amount'].astype(float)
-                data['price'] = data['price'].astype(float)
-                data['datetime'] = data['timestamp'].apply(
-                    lambda x: dt.datetime.fromtimestamp(x))
-                data.set_index('datetime', drop=True, inplace=True)
-                data.sort_index(inplace=True)
+            data = make_trades_frame(data)
 
         return data
 
@@ -902,8 +1232,108 @@ class GeminiAPI(object):
             limit_auction_results=limit_auction_results,
             include_indicative=include_indicative)
 
+    def backfill_trades_history(self, symbol, start, end=None, interval=TRADES_INTERVAL,
+                                max_workers=4, include_breaks=False, dataframe=True):
+        """
+        This will return the executed trades of a time range, as
+        an iterator of chunks sorted by time (oldest first)
+        -range is split into sub-ranges of interval, downloaded
+        max_workers at a time (each page by page with 'since'),
+        under the public rate limiter
+        -trades are deduplicated on trade ID
+        -only max_workers sub-ranges are held in memory, however
+        long the range
+        -'since' pages by millisecond, so only the first 500 trades
+        of a millisecond holding more can be downloaded
+
+        Parameters
+        ==========
+        symbol : str
+            The symbol to retrieve the trades for.
+        start : int or datetime.datetime
+            Start of range (ms since epoch if int)
+        end : int or datetime.datetime (optional)
+            End of range (excluded), default now
+        interval : int or datetime.timedelta
+            Length of sub-ranges (ms if int), default 1 hour
+        max_workers : int
+            Number of sub-ranges downloaded at once
+        include_breaks : bool
+            Whether to include broken trades.
+        dataframe : bool
+            Chunks are DataFrames (as get_trades_history()),
+            otherwise lists of trades as returned by Gemini
+
+        Response
+        ========
+        Iterator of chunks of trades, one per sub-range with trades
+        """
+        start, end = self.make_range(start, end)
+
+        def fetch(since):
+            return self.get_trades_history(symbol, since=since, limit_trades=MAX_RESULTS,
+                                           include_breaks=include_breaks, dataframe=False)
+
+        return self.iter_history(fetch, start, end, 'tid', interval, max_workers,
+                                 make_trades_frame if dataframe else None)
+
+    def backfill_auction_history(self, symbol, start, end=None, interval=AUCTIONS_INTERVAL,
+                                 max_workers=4, include_indicative=False, dataframe=True):
+        """
+        This will return the auction events of a time range, as an
+        iterator of chunks sorted by time (see backfill_trades_history())
+        -events are deduplicated on auction ID, or on event ID if
+        indicative prices are included (several events per auction)
+
+        Parameters
+        ==========
+        symbol : str
+            The symbol to retrieve the auction for.
+        start : int or datetime.datetime
+            Start of range (ms since epoch if int)
+        end : int or datetime.datetime (optional)
+            End of range (excluded), default now
+        interval : int or datetime.timedelta
+            Length of sub-ranges (ms if int), default 30 days
+        max_workers : int
+            Number of sub-ranges downloaded at once
+        include_indicative : bool
+            Whether to include publication of indicative prices and quantities.
+        dataframe : bool
+            Chunks are DataFrames indexed by datetime, otherwise
+            lists of auction events as returned by Gemini
+        """
+        start, end = self.make_range(start, end)
+
+        def fetch(since):
+            return self.get_auction_history(symbol, since=since, limit_auction_results=MAX_RESULTS,
+                                            include_indicative=include_indicative)
+
+        return self.iter_history(fetch, start, end, 'eid' if include_indicative else 'auction_id',
+                                 interval, max_workers, make_auctions_frame if dataframe else None)
+
+    def iter_history(self, fetch, start, end, key, interval, max_workers=4, convert=None):
+        """
+        Iterator of chunks of records of [start, end) downloaded
+        with fetch(since) on a thread pool (see history_backfill)
+        """
+        return iter_history(fetch, start, end, key, interval, max_workers, convert)
+
         # Helper functions
 
+    def make_range(self, start, end=None):
+        """
+        Helper function, (start, end) in milliseconds from UNIX epoch
+        of datetimes or integers (ms), end defaulting to now
+        """
+        if end is None:
+            end = int(time.time() * 1000)
+        start, end = [self.make_timestamp(date) if isinstance(date, dt.date) else int(date)
+                      for date in [start, end]]
+        if end <= start:
+            raise ValueError('end must be after start')
+        return start, end
+
     def make_timestamp(self, date):
         """
         Helper function, generates a timestamp in milliseconds from UNIX epoch
@@ -918,3 +1348,54 @@ class GeminiAPI(object):
                                or datetime.datetime')
         return int(delta.total_seconds() * 1000)
 
+
+def get_call_arguments(order):
+    """Get (args, kwargs) of order given as dict or tuple"""
+    if isinstance(order, dict):
+        return tuple(), order
+    return tuple(order), dict()
+
+
+def is_invalid_nonce(response):
+    """Check if Gemini rejected request for its nonce"""
+    return isinstance(response, dict) and response.get('result') == 'error' and \
+        response.get('reason') == 'InvalidNonce'
+
+
+def make_error_result(error):
+    """Result of request raising error, in the format of Gemini errors"""
+    return {'result': 'error', 'reason': type(error).__name__, 'message': str(error)}
+
+
+def make_trades_frame(trades):
+    """Convert trades returned by Gemini into DataFrame indexed by datetime"""
+    # imported here to keep pandas out of package import
+    import pandas as pd
+    data = pd.DataFrame(trades)
+    if len(data) > 0:
+        data['amount'] = data['amount'].astype(float)
+        data['price'] = data['price'].astype(float)
+        # Gemini returns trades newest first: sort by time, then
+        # trade ID for trades of the same millisecond
+        data.sort_values(['timestampms', 'tid'], inplace=True)
+        data['datetime'] = data['timestamp'].apply(
+            lambda x: dt.datetime.fromtimestamp(x))
+        data.set_index('datetime', drop=True, inplace=True)
+    return data
+
+
+def make_auctions_frame(events):
+    """Convert auction events returned by Gemini into DataFrame indexed by datetime"""
+    # imported here to keep pandas out of package import
+    import pandas as pd
+    data = pd.DataFrame(events)
+    if len(data) > 0:
+        for column in ['auction_price', 'auction_quantity', 'highest_bid_price',
+                       'lowest_ask_price', 'collar_price']:
+            if column in data:
+                data[column] = data[column].astype(float)
+        data['datetime'] = data['timestamp'].apply(
+            lambda x: dt.datetime.fromtimestamp(x))
+        data.set_index('datetime', drop=True, inplace=True)
+        data.sort_index(kind='mergesort', inplace=True)
+    return data
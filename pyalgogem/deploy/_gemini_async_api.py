@@ -0,0 +1,193 @@
+#
+# PyAlgoGem Project
+# deploy/gemini_async_api
+#
+# asyncio client of Gemini REST API
+#
+# Andrew Edmonds - 2018
+#
+
+import time
+import asyncio
+
+from ._gemini_api import GeminiAPI, make_trades_frame, make_error_result, is_invalid_nonce
+from ._rate_limiter import PUBLIC_BURST, PRIVATE_RATE, PRIVATE_BURST
+from ._history_backfill import iter_history_async
+
+
+def get_aiohttp():
+    """Import aiohttp (optional dependency) on first use"""
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('AsyncGeminiAPI requires aiohttp - pip install aiohttp')
+    return aiohttp
+
+
+class AsyncGeminiAPI(GeminiAPI):
+    """
+    Asyncio counterpart of GeminiAPI with the same methods, each
+    a coroutine: orders, cancels and status checks can run
+    concurrently, e.g. asyncio.gather(api.cancel_order(1),
+    api.new_order('btcusd', 1, 10000, 'buy'))
+    -requests share one aiohttp connection pool (keep-alive)
+    -payloads are signed (HMAC-SHA384) and nonced by GeminiAPI
+    when a method is called, so requests get their nonces
+    in call order
+    -url can point at a local mock exchange for testing
+
+    Methods
+    =======
+    send_request :
+        sends request on pooled aiohttp session (coroutine)
+    send_private_request :
+        sends private request after rate limiter wait (coroutine)
+    send_cached_request :
+        sends request unless its response is cached (coroutine)
+    send_batch :
+        sends many requests concurrently (coroutine), used
+        by new_orders() and cancel_orders()
+    get_trades_history :
+        get history of trades on Gemini (coroutine)
+    iter_history :
+        download paginated history concurrently on the event
+        loop, so backfill_trades_history() and
+        backfill_auction_history() are asynchronous generators
+        (async for chunk in api.backfill_trades_history(...))
+    close :
+        close pooled connections to Gemini server (coroutine)
+    (other methods as GeminiAPI, all coroutines except
+    make_timestamp, make_range, make_private_headers, cached order
+    statuses, cache and latency statistics)
+    """
+
+    def __init__(self, key, secret_key, sandbox=True, debug=False, timeout=10,
+                 pool_maxsize=16, nonce_file=None, url=None,
+                 public_rate=None, public_burst=PUBLIC_BURST,
+                 private_rate=PRIVATE_RATE, private_burst=PRIVATE_BURST, cache_ttl=None):
+        GeminiAPI.__init__(self, key, secret_key, sandbox=sandbox, debug=debug, timeout=timeout,
+                           pool_maxsize=pool_maxsize, nonce_file=nonce_file, url=url,
+                           public_rate=public_rate, public_burst=public_burst,
+                           private_rate=private_rate, private_burst=private_burst,
+                           cache_ttl=cache_ttl)
+        self.__aiohttp = get_aiohttp()
+        self.__pool_maxsize = pool_maxsize
+        self.__session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def get_session(self):
+        """
+        Get aiohttp session, created on first request as it
+        must belong to the running event loop
+        """
+        if self.__session is None or self.__session.closed:
+            aiohttp = self.__aiohttp
+            connector = aiohttp.TCPConnector(limit=self.__pool_maxsize)
+            self.__session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.__session
+
+    async def close(self):
+        """Close pooled connections to Gemini server"""
+        GeminiAPI.close(self)
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def send_request(self, http_method, path, wait=0, **kwargs):
+        """
+        Send request to path (method and query string) on pooled
+        session after waiting wait seconds (for rate limiter),
+        recording its latency under the method's endpoint
+        """
+        if wait > 0:
+            await asyncio.sleep(wait)
+        session = self.get_session()
+        method = path.split('?')[0]
+        started = time.perf_counter()
+        try:
+            async with session.request(http_method, self.url + path, **kwargs) as response:
+                data = await response.json(content_type=None)
+        except:
+            self.record_latency(method)
+            raise
+        self.record_latency(method, (time.perf_counter() - started) * 1000)
+        return data
+
+    async def send_cached_request(self, method, key, function, *args):
+        """
+        Await function (sending request) with args unless response
+        of method and key is cached, as GeminiAPI.send_cached_request()
+        """
+        return await self.cache.fetch_async(method, key, lambda: function(*args))
+
+    async def send_private_request(self, method, payload):
+        """
+        Sends private request (coroutine) once the rate limiter
+        allows it, nonced and signed only then so requests go
+        out with fresh nonces in order
+        -a request rejected for its nonce (overtaken by a request
+        signed after it) is signed again and resent once
+        """
+        wait = 0 if self.private_limiter is None else self.private_limiter.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        response = await self.send_request('POST', method,
+                                           headers=self.sign_private_request(method, payload))
+        if is_invalid_nonce(response):
+            response = await self.send_request('POST', method,
+                                               headers=self.sign_private_request(method, payload))
+        return response
+
+    async def send_batch(self, function, calls, max_workers=None):
+        """
+        Call function with each (args, kwargs) of calls concurrently
+        on the event loop, returning results (or errors) in order
+        of calls (max_workers is not used)
+        -requests overtaken by one signed after them are retried
+        once (see send_private_request())
+        """
+        started = time.perf_counter()
+        requests = list()
+        for args, kwargs in calls:
+            try:
+                requests.append(function(*args, **kwargs))
+            except Exception as error:
+                # invalid arguments, raised before any request is sent
+                requests.append(get_error_result(error))
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        results = [make_error_result(result) if isinstance(result, Exception) else result
+                   for result in results]
+        self.set_batch_stats(results, time.perf_counter() - started)
+        return results
+
+    async def get_trades_history(self, symbol, since=None, limit_trades=50,
+                                 include_breaks=False, dataframe=True):
+        """
+        This will return the executed trades, as
+        GeminiAPI.get_trades_history()
+        """
+        data = await GeminiAPI.get_trades_history(self, symbol, since=since,
+                                                  limit_trades=limit_trades,
+                                                  include_breaks=include_breaks,
+                                                  dataframe=False)
+        if dataframe is True:
+            data = make_trades_frame(data)
+        return data
+
+    def iter_history(self, fetch, start, end, key, interval, max_workers=4, convert=None):
+        """
+        Asynchronous generator of chunks of records of [start, end)
+        downloaded with coroutine fetch(since) (see history_backfill)
+        """
+        return iter_history_async(fetch, start, end, key, interval, max_workers, convert)
+
+
+async def get_error_result(error):
+    """Coroutine returning result of request raising error"""
+    return make_error_result(error)
@@ -10,18 +10,466 @@
 # Andrew Edmonds - 2018
 #
 
+import json
+import time
+import queue
+import threading
+
+from ._latency_metrics import LatencyRecorder
+from ._order_state import ORDER_EVENTS, ORDER_EVENT_TYPES, parse_order
+
+
+def get_websocket():
+    """Import websocket-client (optional dependency) on first use"""
+    try:
+        import websocket
+    except ImportError:
+        raise ImportError('GeminiStreamAPI requires websocket-client - pip install websocket-client')
+    return websocket
+
 
 class GeminiStreamAPI(object):
     """
-    Wrapper class object for Retrieval of Price Data
-    For Cryptocurrencies Using the CryptoCompare API
+    Wrapper class object for streaming market data of
+    Cryptocurrencies via the Gemini WebSocket API
+    -one connection (and reader thread) per symbol parses
+    messages into events: 'change' (order book level),
+    'trade', 'auction_*', and 'gap' when the stream restarts
+    (after a socket_sequence gap or a dropped connection)
+    -events are handed to registered callbacks on a dispatcher
+    thread, through a bounded queue
+    -each message's socket_sequence is checked: on a gap (or
+    events dropped from a full queue) the symbol reconnects and
+    receives a fresh order book snapshot ('initial' changes)
+    -the authenticated order events stream (subscribe_orders())
+    keeps GeminiAPI.order_cache up to date; after it reconnects,
+    live orders are reconciled with one get_active_orders() request
+
+    Methods
+    =======
+    subscribe :
+        add symbols to stream
+    subscribe_orders :
+        add order events of account to stream
+    add_callback :
+        register function called with each event
+    remove_callback :
+        unregister function
+    start :
+        connect to Gemini and start streaming
+    stop :
+        close connections and stop streaming
+    get_stats :
+        get number of messages, gaps, reconnects, dropped events
+    get_latency_stats :
+        get latency from exchange event to callback per symbol
     """
 
-    def __init__(self, key, secret_key,sandbox=True,debug=False):
+    def __init__(self, key, secret_key, sandbox=True, debug=False, url=None, max_queue=10000,
+                 heartbeat=True, reconnect_delay=0.5, max_reconnect_delay=30, timeout=30,
+                 order_url=None):
         self.__key = key
         self.__secret_key = secret_key
         self.__sandbox = sandbox
         self.__debug = debug
+        if url is not None:
+            # e.g. local mock exchange
+            self.__url = url.rstrip('/') + '/'
+        elif sandbox:
+            self.__url = 'wss://api.sandbox.gemini.com/v1/marketdata/'
+        else:
+            self.__url = 'wss://api.gemini.com/v1/marketdata/'
+        if order_url is not None:
+            self.__order_url = order_url
+        elif sandbox:
+            self.__order_url = 'wss://api.sandbox.gemini.com/v1/order/events'
+        else:
+            self.__order_url = 'wss://api.gemini.com/v1/order/events'
+        if max_queue < 1:
+            raise ValueError('Max queue must be at least 1')
+        self.heartbeat = heartbeat
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.timeout = timeout
+        self.__symbols = list()
+        self.__order_api = None
+        self.__order_symbols = None
+        self.__callbacks = list()
+        self.__queue = queue.Queue(maxsize=max_queue)
+        self.__threads = list()
+        self.__sockets = dict()
+        self.__resync = set()
+        self.__running = threading.Event()
+        self.__lock = threading.Lock()
+        self.__latency = LatencyRecorder()
+        self.__stats = {'messages': 0, 'events': 0, 'gaps': 0, 'reconnects': 0,
+                        'dropped': 0, 'callback_errors': 0, 'reconcile_errors': 0}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def symbols(self):
+        """Symbols streamed"""
+        return list(self.__symbols)
+
+    @property
+    def running(self):
+        """Streams are running"""
+        return self.__running.is_set()
+
+    def subscribe(self, *symbols):
+        """Add symbols (e.g. 'btcusd') to stream - before start()"""
+        if self.running:
+            raise ValueError('Subscribe to symbols before starting stream')
+        for symbol in symbols:
+            symbol = str(symbol).lower()
+            if symbol not in self.__symbols:
+                self.__symbols.append(symbol)
+
+    def subscribe_orders(self, api, symbols=None):
+        """
+        Add order events of account (authenticated stream) - before
+        start(), replacing polling of get_order_status()
+
+        Parameters
+        ==========
+        api : GeminiAPI
+            signs the subscription (sharing its nonces), reconciles
+            live orders after reconnects, and has its order_cache
+            kept up to date (read by get_cached_order_status())
+            -must not be an AsyncGeminiAPI
+        symbols : list
+            symbols of orders streamed, e.g. ['btcusd']
+            -default: all symbols
+
+        Events
+        ======
+        'initial' (live orders on connecting), 'accepted', 'rejected',
+        'booked', 'fill', 'cancelled', 'cancel_rejected', 'closed'
+        -fields as get_order_status(), prices and amounts as float
+        -'stream' is 'order_events', fills carry 'fill' (price,
+        amount, fee, liquidity)
+        """
+        if self.running:
+            raise ValueError('Subscribe to order events before starting stream')
+        if self.__order_api is not None:
+            self.remove_callback(self.__order_api.order_cache.apply_event)
+        self.__order_api = api
+        self.__order_symbols = None if symbols is None else [str(symbol).lower() for symbol in symbols]
+        self.add_callback(api.order_cache.apply_event, ORDER_EVENT_TYPES + ['gap', 'reconcile'])
+
+    def add_callback(self, callback, event_types=None):
+        """
+        Register function called with each event (dict)
+
+        Parameters
+        ==========
+        callback : function
+            called on the dispatcher thread with each event
+            -keep it short, events queue up while it runs
+        event_types : list
+            types of events passed to callback, e.g. ['trade']
+            -default: all events
+        """
+        with self.__lock:
+            self.__callbacks.append((callback, None if event_types is None else set(event_types)))
+
+    def remove_callback(self, callback):
+        """Unregister function"""
+        with self.__lock:
+            self.__callbacks = [(function, types) for function, types in self.__callbacks
+                                if function != callback]
+
+    def start(self):
+        """Connect to Gemini and start streaming subscribed symbols"""
+        if self.running:
+            return
+        streams = list(self.__symbols)
+        if self.__order_api is not None:
+            streams.append(ORDER_EVENTS)
+        if len(streams) == 0:
+            raise ValueError('Subscribe to at least one symbol or order events')
+        websocket = get_websocket()
+        self.__running.set()
+        self.__threads = [threading.Thread(target=self.__dispatch, name='GeminiStreamDispatch',
+                                           daemon=True)]
+        for stream in streams:
+            self.__threads.append(threading.Thread(target=self.__read, args=(websocket, stream),
+                                                   name='GeminiStream-' + stream, daemon=True))
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """Close connections and stop streaming"""
+        if not self.running:
+            return
+        self.__running.clear()
+        with self.__lock:
+            sockets = list(self.__sockets.values())
+        for ws in sockets:
+            try:
+                ws.close(timeout=0)
+            except:
+                pass
+        self.__queue.put(None)
+        for thread in self.__threads:
+            thread.join(timeout)
+        self.__threads = list()
+
+    def get_stats(self):
+        """
+        Get statistics of streams
+
+        Returns
+        =======
+        return : dict
+            messages : number of messages received
+            events : number of events passed to callbacks
+            gaps : number of socket_sequence gaps and dropped connections
+            reconnects : number of reconnections
+            dropped : messages dropped as queue was full
+            callback_errors : number of errors raised by callbacks
+            reconcile_errors : failed reconciliations of live orders
+            queue_depth : messages waiting for dispatch
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+        stats['queue_depth'] = self.__queue.qsize()
+        return stats
+
+    def get_latency_stats(self, symbol=None):
+        """
+        Get latency (ms) from exchange event timestamp to
+        callback, per symbol and 'order_events'
+        (see GeminiAPI.get_latency_stats())
+        """
+        return self.__latency.get_stats(symbol)
+
+    def get_url(self, symbol):
+        """URL of market data stream of symbol"""
+        url = self.__url + symbol
+        if self.heartbeat:
+            url += '?heartbeat=true'
+        return url
+
+    def get_order_url(self):
+        """URL of order events stream"""
+        url = self.__order_url
+        if self.__order_symbols is not None:
+            url += '?' + '&'.join('symbolFilter=' + symbol for symbol in self.__order_symbols)
+        return url
+
+    def __count(self, stat, number=1):
+        """Add number to statistic"""
+        with self.__lock:
+            self.__stats[stat] += number
+
+    def __connect(self, websocket, stream):
+        """Open connection of stream (symbol or order events)"""
+        if stream != ORDER_EVENTS:
+            return websocket.create_connection(self.get_url(stream), timeout=self.timeout)
+        # signed like a private request, with a fresh nonce, under
+        # the key's lock so private requests in flight are not overtaken
+        with self.__order_api.key_lock:
+            headers = self.__order_api.make_private_headers({'request': '/v1/order/events'})
+            return websocket.create_connection(self.get_order_url(), timeout=self.timeout,
+                                               header=['{}: {}'.format(key, value)
+                                                       for key, value in headers.items()])
+
+    def __reconcile(self):
+        """
+        Queue live orders of one get_active_orders() request for
+        order cache, covering events missed while disconnected
+        -sent before reading the new connection, so events
+        received meanwhile are applied after it
+        """
+        try:
+            orders = self.__order_api.get_active_orders()
+            if not isinstance(orders, list):
+                raise ValueError(orders)
+        except Exception as error:
+            self.__count('reconcile_errors')
+            if self.__debug:
+                print('Error reconciling orders: {}'.format(error))
+            return
+        self.__put([{'type': 'reconcile', 'symbol': ORDER_EVENTS, 'orders': orders}],
+                   time.time(), block=True)
+
+    def __read(self, websocket, symbol):
+        """Read messages of symbol (or order events), reconnecting on errors and gaps"""
+        delay = self.reconnect_delay
+        connected_before = False
+        while self.running:
+            try:
+                ws = self.__connect(websocket, symbol)
+            except Exception as error:
+                if self.__debug:
+                    print('Error connecting to {}: {}'.format(symbol, error))
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+            with self.__lock:
+                self.__sockets[symbol] = ws
+                self.__resync.discard(symbol)
+                if connected_before:
+                    self.__stats['reconnects'] += 1
+            if connected_before and symbol == ORDER_EVENTS:
+                self.__reconcile()
+            connected_before = True
+            delay = self.reconnect_delay
+            gap_sent = False
+            try:
+                gap_sent = self.__receive(ws, symbol)
+            except Exception as error:
+                if self.running and self.__debug:
+                    print('Error reading {}: {}'.format(symbol, error))
+            finally:
+                with self.__lock:
+                    self.__sockets.pop(symbol, None)
+                try:
+                    ws.close(timeout=0)
+                except:
+                    pass
+                if self.running and not gap_sent:
+                    # connection dropped: messages may be missed until the
+                    # new connection's snapshot, so consumers must resync
+                    self.__count('gaps')
+                    self.__put([{'type': 'gap', 'symbol': symbol, 'expected': None,
+                                 'socket_sequence': None}], time.time(), block=True)
+            # after an overflow, let callbacks catch up before a new snapshot
+            while self.running and self.__queue.qsize() > self.__queue.maxsize // 2:
+                time.sleep(0.01)
+
+    def __receive(self, ws, symbol):
+        """
+        Receive messages until connection closes or a gap is found,
+        True if a gap event was queued
+        """
+        sequence = 0
+        while self.running:
+            message = ws.recv()
+            received = time.time()
+            if not message:
+                return
+            message = json.loads(message)
+            self.__count('messages')
+            socket_sequence = get_socket_sequence(message)
+            if socket_sequence is not None:
+                if socket_sequence != sequence:
+                    # missed messages: order book must be rebuilt from a new
+                    # snapshot (order cache reconciled after reconnecting)
+                    self.__count('gaps')
+                    self.__put([{'type': 'gap', 'symbol': symbol, 'expected': sequence,
+                                 'socket_sequence': socket_sequence}], received, block=True)
+                    return True
+                sequence += 1
+            if symbol in self.__resync:
+                self.__put([{'type': 'gap', 'symbol': symbol, 'expected': sequence,
+                             'socket_sequence': None}], received, block=True)
+                return True
+            if symbol == ORDER_EVENTS:
+                events = parse_order_events(message)
+            else:
+                events = parse_message(message, symbol)
+            if len(events) > 0 and not self.__put(events, received):
+                with self.__lock:
+                    self.__resync.add(symbol)
+
+    def __put(self, events, received, block=False):
+        """
+        Queue events of one message, False if dropped as queue is full
+        -gap events wait for space, so consumers always see them
+        """
+        try:
+            self.__queue.put((events, received), block=block, timeout=self.timeout if block else None)
+            return True
+        except queue.Full:
+            self.__count('dropped')
+            return False
+
+    def __dispatch(self):
+        """Pass queued events to callbacks"""
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            events, received = item
+            with self.__lock:
+                callbacks = list(self.__callbacks)
+            now = time.time()
+            for event in events:
+                if 'timestampms' in event:
+                    self.__latency.record(event.get('stream', event['symbol']),
+                                          now * 1000 - event['timestampms'])
+                for callback, types in callbacks:
+                    if types is not None and event['type'] not in types:
+                        continue
+                    try:
+                        callback(event)
+                    except Exception as error:
+                        self.__count('callback_errors')
+                        if self.__debug:
+                            print('Error in callback: {}'.format(error))
+            self.__count('events', len(events))
+
+
+def parse_message(message, symbol):
+    """
+    Parse message of Gemini market data stream into list of events
+    -prices and amounts are converted to float, order book sides
+    to 'bid'/'ask'
+    """
+    if message.get('type') != 'update':
+        return list()
+    events = list()
+    for raw in message.get('events', list()):
+        event = {'type': raw.get('type'),
+                 'symbol': symbol,
+                 'event_id': message.get('eventId'),
+                 'socket_sequence': message.get('socket_sequence')}
+        if 'timestampms' in message:
+            event['timestampms'] = message['timestampms']
+        if event['type'] == 'change':
+            event['side'] = 'bid' if raw.get('side') == 'bid' else 'ask'
+            event['price'] = float(raw['price'])
+            event['remaining'] = float(raw['remaining'])
+            event['delta'] = float(raw.get('delta', 0))
+            event['reason'] = raw.get('reason')
+        elif event['type'] == 'trade':
+            event['tid'] = raw.get('tid')
+            event['price'] = float(raw['price'])
+            event['amount'] = float(raw['amount'])
+            event['maker_side'] = raw.get('makerSide')
+        else:
+            for key, value in raw.items():
+                event.setdefault(key, value)
+        events.append(event)
+    return events
+
+
+def parse_order_events(message):
+    """
+    Parse message of Gemini order events stream into list of
+    events (heartbeats are dropped), prices and amounts as float
+    """
+    if isinstance(message, dict):
+        message = [message] if message.get('type') == 'subscription_ack' else list()
+    events = list()
+    for raw in message:
+        event = parse_order(raw)
+        event['stream'] = ORDER_EVENTS
+        event.setdefault('symbol', ORDER_EVENTS)
+        events.append(event)
+    return events
+
 
-    def tester(self):
-        print('test','3, 4')
\ No newline at end of file
+def get_socket_sequence(message):
+    """socket_sequence of message (first event of a list), None if not sent"""
+    if isinstance(message, list):
+        return message[0].get('socket_sequence') if len(message) > 0 else None
+    return message.get('socket_sequence')
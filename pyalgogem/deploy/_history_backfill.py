@@ -0,0 +1,158 @@
+#
+# PyAlgoGem Project
+# deploy/history_backfill
+#
+# concurrent paginated download of Gemini trade and auction history
+#
+# Andrew Edmonds - 2018
+#
+
+import asyncio
+import datetime as dt
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# max number of records returned by each Gemini history request
+MAX_RESULTS = 500
+# default length (ms) of sub-ranges downloaded concurrently
+TRADES_INTERVAL = 60 * 60 * 1000
+AUCTIONS_INTERVAL = 30 * 24 * 60 * 60 * 1000
+
+
+def split_range(start, end, interval):
+    """List of (start, end) sub-ranges (ms) of interval covering [start, end)"""
+    if isinstance(interval, dt.timedelta):
+        interval = interval.total_seconds() * 1000
+    interval = int(interval)
+    if interval < 1:
+        raise ValueError('Interval must be at least 1 ms')
+    if end <= start:
+        raise ValueError('End must be after start')
+    return [(first, min(first + interval, end)) for first in range(start, end, interval)]
+
+
+def select_page(page, start, end, cursor, limit=MAX_RESULTS):
+    """
+    Records of page (returned by a 'since' request) within
+    [start, end), and 'since' cursor of next page - None
+    once the sub-range is complete
+    """
+    times = [int(record['timestampms']) for record in page]
+    records = [record for record, time in zip(page, times) if start <= time < end]
+    if len(page) < limit or max(times) >= end:
+        return records, None
+    # next page starts at the newest record (duplicates are dropped),
+    # or moves on 1 ms if the page holds a single millisecond
+    return records, max(max(times), cursor + 1)
+
+
+def check_page(page):
+    """Raise error if Gemini returned an error instead of a page"""
+    if not isinstance(page, list):
+        raise ValueError('Error in history request: {}'.format(page))
+
+
+def sort_records(records, key):
+    """Records deduplicated on key, sorted by timestamp and key"""
+    unique = {record[key]: record for record in records}
+    return sorted(unique.values(), key=lambda record: (int(record['timestampms']), record[key]))
+
+
+def fetch_range(fetch, start, end, key, limit=MAX_RESULTS):
+    """
+    Download records of [start, end) page by page with fetch(since),
+    deduplicated on key and sorted
+    """
+    records, cursor = list(), start - 1
+    while cursor is not None:
+        page = fetch(cursor)
+        check_page(page)
+        if len(page) == 0:
+            break
+        selected, cursor = select_page(page, start, end, cursor, limit)
+        records.extend(selected)
+    return sort_records(records, key)
+
+
+async def fetch_range_async(fetch, start, end, key, limit=MAX_RESULTS):
+    """Coroutine of fetch_range(), fetch(since) returns a coroutine"""
+    records, cursor = list(), start - 1
+    while cursor is not None:
+        page = await fetch(cursor)
+        check_page(page)
+        if len(page) == 0:
+            break
+        selected, cursor = select_page(page, start, end, cursor, limit)
+        records.extend(selected)
+    return sort_records(records, key)
+
+
+def iter_history(fetch, start, end, key, interval, max_workers=4, convert=None, limit=MAX_RESULTS):
+    """
+    Yield records of [start, end) in chronological chunks, one per
+    sub-range of interval, downloaded max_workers at a time
+    -at most max_workers sub-ranges are held in memory, so memory
+    use does not grow with the length of the range
+    -empty sub-ranges are skipped
+
+    Parameters
+    ==========
+    fetch : function
+        fetch(since) returns page of records after since (ms)
+    start, end : int
+        range in ms since epoch
+    key : str
+        unique field of records, e.g. 'tid'
+    interval : int or timedelta
+        length of sub-ranges (ms if int)
+    max_workers : int
+        number of sub-ranges downloaded concurrently
+    convert : function
+        applied to each chunk (list of records), e.g. into DataFrame
+    """
+    ranges = split_range(start, end, interval)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for first, last in ranges:
+            pending.append(executor.submit(fetch_range, fetch, first, last, key, limit))
+            if len(pending) < max_workers:
+                continue
+            records = pending.popleft().result()
+            if len(records) > 0:
+                yield records if convert is None else convert(records)
+        while len(pending) > 0:
+            records = pending.popleft().result()
+            if len(records) > 0:
+                yield records if convert is None else convert(records)
+    finally:
+        # generator closed early: drop sub-ranges not started
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+async def iter_history_async(fetch, start, end, key, interval, max_workers=4, convert=None,
+                             limit=MAX_RESULTS):
+    """
+    Asynchronous generator of iter_history(), sub-ranges are
+    downloaded concurrently on the event loop
+    """
+    ranges = split_range(start, end, interval)
+    pending = deque()
+    try:
+        for first, last in ranges:
+            pending.append(asyncio.ensure_future(fetch_range_async(fetch, first, last, key, limit)))
+            if len(pending) < max_workers:
+                continue
+            records = await pending.popleft()
+            if len(records) > 0:
+                yield records if convert is None else convert(records)
+        while len(pending) > 0:
+            records = await pending.popleft()
+            if len(records) > 0:
+                yield records if convert is None else convert(records)
+    finally:
+        for task in pending:
+            task.cancel()
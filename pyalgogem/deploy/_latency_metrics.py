@@ -0,0 +1,119 @@
+#
+# PyAlgoGem Project
+# deploy/latency_metrics
+#
+# latency histograms of requests sent to each Gemini endpoint
+#
+# Andrew Edmonds - 2018
+#
+
+import bisect
+import threading
+
+# upper bounds (ms) of histogram buckets, last bucket is unbounded
+BUCKET_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+# endpoints ending in the symbol, recorded without it: 'book/btcusd' -> 'book/'
+SYMBOL_ENDPOINTS = ['book', 'pubticker', 'trades', 'auction']
+
+
+class LatencyHistogram(object):
+    """
+    Histogram of request latencies of one endpoint
+    -latencies are counted in fixed buckets (BUCKET_BOUNDS),
+    so recording costs the same however many requests are sent
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, latency):
+        """Count latency (ms) of completed request"""
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+
+    def get_percentile(self, percentile):
+        """Upper bound (ms) of bucket holding percentile (0-100) of latencies"""
+        if self.count == 0:
+            return None
+        rank = percentile / 100. * self.count
+        cumulative = 0
+        for bucket, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count > 0:
+                if bucket == len(BUCKET_BOUNDS):
+                    return self.max
+                return min(BUCKET_BOUNDS[bucket], self.max)
+        return self.max
+
+    def get_stats(self):
+        """Summary of histogram as dict (latencies in ms)"""
+        return {'count': self.count,
+                'errors': self.errors,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min,
+                'max': self.max,
+                'p50': self.get_percentile(50),
+                'p90': self.get_percentile(90),
+                'p99': self.get_percentile(99),
+                'buckets': dict(zip([str(bound) for bound in BUCKET_BOUNDS] + ['inf'],
+                                    self.counts))}
+
+
+class LatencyRecorder(object):
+    """
+    Latency histograms of all endpoints of an API object,
+    safe to record into from many threads
+    """
+
+    def __init__(self):
+        self.__histograms = dict()
+        self.__lock = threading.Lock()
+
+    def record(self, method, latency=None):
+        """Record latency (ms) of request to method, or an error if None"""
+        endpoint = get_endpoint(method)
+        with self.__lock:
+            histogram = self.__histograms.get(endpoint)
+            if histogram is None:
+                histogram = self.__histograms[endpoint] = LatencyHistogram()
+            if latency is None:
+                histogram.errors += 1
+            else:
+                histogram.record(latency)
+
+    def get_stats(self, endpoint=None):
+        """
+        Latency statistics of endpoint (e.g. 'order/new', 'book/'
+        or 'book/btcusd'), or dict of statistics of all endpoints if None
+        """
+        with self.__lock:
+            if endpoint is not None:
+                # endpoints as recorded, or methods including the symbol
+                histogram = self.__histograms.get(endpoint,
+                                                  self.__histograms.get(get_endpoint(endpoint)))
+                return LatencyHistogram().get_stats() if histogram is None else histogram.get_stats()
+            return {name: histogram.get_stats() for name, histogram in self.__histograms.items()}
+
+    def reset(self):
+        """Remove all recorded latencies"""
+        with self.__lock:
+            self.__histograms = dict()
+
+
+def get_endpoint(method):
+    """Endpoint of request method, without symbol: 'auction/btcusd/history' -> 'auction/history'"""
+    parts = method.strip('/').split('/')
+    if parts[0] in SYMBOL_ENDPOINTS and len(parts) > 1:
+        return parts[0] + '/' + '/'.join(parts[2:])
+    return '/'.join(parts)
@@ -0,0 +1,524 @@
+#
+# PyAlgoGem Project
+# deploy/mock_exchange
+#
+# local stand-in for the Gemini REST and market data WebSocket APIs
+#
+# Andrew Edmonds - 2018
+#
+
+import hmac
+import hashlib
+import json
+import time
+import base64
+import random
+import socket
+import asyncio
+import threading
+
+from collections import deque
+
+from ._latency_metrics import LatencyRecorder, get_endpoint
+
+# symbols and starting mid prices of simulated markets
+MOCK_SYMBOLS = {'btcusd': 8000., 'ethusd': 600., 'ethbtc': 0.075}
+BOOK_LEVELS = 20
+
+
+def get_aiohttp_web():
+    """Import aiohttp server (optional dependency) on first use"""
+    try:
+        from aiohttp import web
+    except ImportError:
+        raise ImportError('MockGeminiExchange requires aiohttp - pip install aiohttp')
+    return web
+
+
+class MockMarket(object):
+    """
+    Simulated order book and public trades of one symbol
+    -each step changes a level near the top of the book, and
+    now and then trades at the best price and moves the mid
+    """
+
+    def __init__(self, symbol, price, tick=0.01, history=1000, seed=None):
+        self.symbol = symbol
+        self.tick = tick
+        self.random = random.Random(seed)
+        self.bids = dict()
+        self.asks = dict()
+        self.trades = deque(maxlen=max(history, 1) * 10)
+        self.next_tid = 1
+        self.event_id = 1
+        self.reset(price)
+        # public trades of the last hour
+        now = int(time.time() * 1000)
+        for offset in range(history, 0, -1):
+            self.trade(now - offset * 3600000 // history)
+
+    def reset(self, price):
+        """Build book of BOOK_LEVELS levels on each side of price"""
+        tick = self.tick
+        self.bids = {round(price - tick * (level + 1), 8): self.amount() for level in range(BOOK_LEVELS)}
+        self.asks = {round(price + tick * level, 8): self.amount() for level in range(BOOK_LEVELS)}
+
+    def amount(self):
+        """Random amount of price level"""
+        return round(self.random.uniform(0.01, 5), 4)
+
+    def get_best(self):
+        """Best bid and ask prices"""
+        return max(self.bids), min(self.asks)
+
+    def trade(self, timestampms=None):
+        """Public trade at best bid or ask, returned as Gemini trade"""
+        bid, ask = self.get_best()
+        side = self.random.choice(['buy', 'sell'])
+        timestampms = int(time.time() * 1000) if timestampms is None else timestampms
+        trade = {'timestamp': timestampms // 1000, 'timestampms': timestampms,
+                 'tid': self.next_tid, 'price': str(ask if side == 'buy' else bid),
+                 'amount': str(round(self.random.uniform(0.001, 1), 6)),
+                 'exchange': 'gemini', 'type': side}
+        self.next_tid += 1
+        self.trades.append(trade)
+        return trade
+
+    def step(self):
+        """Advance market, returning events of a market data update"""
+        events = list()
+        side = self.random.choice(['bid', 'ask'])
+        levels = self.bids if side == 'bid' else self.asks
+        bid, ask = self.get_best()
+        best, sign = (bid, -1) if side == 'bid' else (ask, 1)
+        # mostly at or behind the best price, sometimes improving it
+        price = round(best + sign * self.tick * (int(self.random.expovariate(0.5)) - 1), 8)
+        if (side == 'bid' and price >= ask) or (side == 'ask' and price <= bid):
+            price = best
+        amount = 0. if self.random.random() < 0.2 and len(levels) > 1 else self.amount()
+        delta = amount - levels.get(price, 0.)
+        if amount > 0:
+            levels[price] = amount
+        else:
+            levels.pop(price, None)
+        events.append({'type': 'change', 'side': side, 'price': str(price),
+                       'remaining': str(amount), 'delta': str(delta), 'reason': 'cancel' if amount == 0 else 'place'})
+        if self.random.random() < 0.1:
+            trade = self.trade()
+            events.append({'type': 'trade', 'tid': trade['tid'], 'price': trade['price'],
+                           'amount': trade['amount'], 'makerSide': 'ask' if trade['type'] == 'buy' else 'bid'})
+        self.event_id += 1
+        return events
+
+    def get_book(self, limit_bids=50, limit_asks=50):
+        """Order book as returned by Gemini (limit 0 - all levels)"""
+        bids = sorted(self.bids.items(), reverse=True)
+        asks = sorted(self.asks.items())
+        bids = bids[:limit_bids] if limit_bids else bids
+        asks = asks[:limit_asks] if limit_asks else asks
+        now = str(int(time.time()))
+        return {'bids': [{'price': str(price), 'amount': str(amount), 'timestamp': now} for price, amount in bids],
+                'asks': [{'price': str(price), 'amount': str(amount), 'timestamp': now} for price, amount in asks]}
+
+    def get_ticker(self):
+        """Ticker as returned by Gemini"""
+        bid, ask = self.get_best()
+        last = self.trades[-1]['price'] if self.trades else str(bid)
+        volume = sum(float(trade['amount']) for trade in self.trades)
+        return {'bid': str(bid), 'ask': str(ask), 'last': last,
+                'volume': {self.symbol[:3].upper(): str(volume),
+                           self.symbol[3:].upper(): str(volume * float(last)),
+                           'timestamp': int(time.time() * 1000)}}
+
+    def get_trades(self, since=None, limit_trades=50):
+        """
+        Public trades, newest first: the most recent, or the oldest
+        trades at or after since (ms)
+        """
+        if since is None:
+            trades = list(self.trades)[-limit_trades:]
+        else:
+            trades = [trade for trade in self.trades if trade['timestampms'] >= since][:limit_trades]
+        return trades[::-1]
+
+
+class MockGeminiExchange(object):
+    """
+    Local stand-in for the Gemini REST API and market data
+    WebSocket, to load-test order paths and measure the cost of
+    GeminiAPI's signing, serialization and parsing offline
+    -runs an aiohttp server (pip install aiohttp) on its own
+    thread and event loop; point GeminiAPI / AsyncGeminiAPI at
+    url and GeminiStreamAPI at ws_url
+    -REST: order/new, order/cancel, order/status, orders,
+    order/cancel/session, order/cancel/all, mytrades, balances,
+    tradevolume, heartbeat, symbols, pubticker, book, trades
+    -orders crossing the simulated book fill at once at the best
+    price, others rest until cancelled
+    -market data: 'initial' snapshot then update_rate updates per
+    second of each symbol, with socket_sequence and heartbeats
+    -each request waits latency (plus uniform jitter) seconds
+
+    Attributes
+    ==========
+    latency : float or dict
+        seconds added to each request, or per endpoint named as
+        in GeminiAPI.get_latency_stats() (e.g. {'order/new': 0.05,
+        'book/': 0.02, 'default': 0.01}) - 'marketdata' delays each
+        market data message
+    jitter : float
+        max random seconds added to latency
+    strict_nonce : bool
+        reject nonces not above the last one of the key (as
+        Gemini), otherwise only reused nonces
+    keys : dict
+        secret key of each API key, to verify signatures
+        (default: signatures are not checked)
+
+    Methods
+    =======
+    start :
+        start server on its own thread
+    stop :
+        stop server
+    get_stats :
+        get number of requests and handling time per endpoint
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0., jitter=0., update_rate=10,
+                 symbols=None, strict_nonce=False, keys=None, seed=None):
+        self.__web = get_aiohttp_web()
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.update_rate = update_rate
+        self.strict_nonce = strict_nonce
+        self.keys = keys
+        self.__random = random.Random(seed)
+        self.markets = {symbol: MockMarket(symbol, price, seed=seed)
+                        for symbol, price in (symbols or MOCK_SYMBOLS).items()}
+        self.__orders = dict()
+        self.__my_trades = list()
+        self.__next_order_id = 1
+        self.__nonces = dict()
+        self.__subscribers = {symbol: list() for symbol in self.markets}
+        self.__latency = LatencyRecorder()
+        self.__loop = None
+        self.__thread = None
+        self.__started = threading.Event()
+        self.__error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def url(self):
+        """Base URL of REST API (GeminiAPI url)"""
+        return 'http://{}:{}/v1/'.format(self.host, self.port)
+
+    @property
+    def ws_url(self):
+        """Base URL of market data (GeminiStreamAPI url)"""
+        return 'ws://{}:{}/v1/marketdata/'.format(self.host, self.port)
+
+    def start(self):
+        """Start server on its own thread, returns once it accepts connections"""
+        if self.__thread is not None:
+            return
+        # bound here, so port 0 picks a free port before the server starts
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        self.__started.clear()
+        self.__error = None
+        self.__thread = threading.Thread(target=self.__serve, args=(sock,),
+                                         name='MockGeminiExchange', daemon=True)
+        self.__thread.start()
+        self.__started.wait()
+        if self.__error is not None:
+            self.__thread.join()
+            self.__thread = None
+            raise self.__error
+
+    def stop(self):
+        """Stop server and close connections"""
+        if self.__thread is None:
+            return
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__thread = None
+
+    def get_stats(self, endpoint=None):
+        """
+        Get number of requests and server-side handling time (ms,
+        including injected latency) per endpoint, as
+        GeminiAPI.get_latency_stats()
+        """
+        return self.__latency.get_stats(endpoint)
+
+    def __serve(self, sock):
+        """Run server on event loop of this thread"""
+        web = self.__web
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.__loop = loop
+        try:
+            runner = self.__setup(web, loop, sock)
+        except Exception as error:
+            self.__error = error
+            sock.close()
+            loop.close()
+            self.__started.set()
+            return
+        tasks = [loop.create_task(self.__run_market(symbol)) for symbol in self.markets]
+        self.__started.set()
+        try:
+            loop.run_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(runner.cleanup())
+            loop.close()
+
+    def __setup(self, web, loop, sock):
+        """Start aiohttp server of routes on sock, returning its runner"""
+        app = web.Application()
+        for path, handler in [('symbols', self.__symbols), ('pubticker/{symbol}', self.__ticker),
+                              ('book/{symbol}', self.__book), ('trades/{symbol}', self.__trades)]:
+            app.router.add_get('/v1/' + path, handler)
+        for path in ['order/new', 'order/cancel', 'order/status', 'orders', 'order/cancel/session',
+                     'order/cancel/all', 'mytrades', 'balances', 'tradevolume', 'heartbeat']:
+            app.router.add_post('/v1/' + path, self.__private)
+        app.router.add_get('/v1/marketdata/{symbol}', self.__marketdata)
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.SockSite(runner, sock).start())
+        return runner
+
+    async def __delay(self, endpoint):
+        """Wait injected latency of endpoint"""
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(endpoint, latency.get('default', 0.))
+        latency += self.__random.uniform(0, self.jitter) if self.jitter else 0.
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+    async def __respond(self, method, function, *args):
+        """
+        Response of function after injected latency, recording
+        handling time under endpoint of method (as GeminiAPI)
+        """
+        started = time.perf_counter()
+        await self.__delay(get_endpoint(method))
+        try:
+            data, status = function(*args), 200
+        except KeyError as error:
+            data, status = make_error('InvalidSymbol', 'Unknown {}'.format(error)), 400
+        except ValueError as error:
+            data, status = make_error('InvalidRequest', str(error)), 400
+        self.__latency.record(method, (time.perf_counter() - started) * 1000)
+        return self.__web.json_response(data, status=status)
+
+    # public endpoints
+
+    async def __symbols(self, request):
+        return await self.__respond('symbols', lambda: sorted(self.markets))
+
+    async def __ticker(self, request):
+        market = request.match_info['symbol']
+        return await self.__respond('pubticker/' + market, lambda: self.markets[market].get_ticker())
+
+    async def __book(self, request):
+        market, query = request.match_info['symbol'], request.query
+        return await self.__respond('book/' + market, lambda: self.markets[market].get_book(
+            int(query.get('limit_bids', 50)), int(query.get('limit_asks', 50))))
+
+    async def __trades(self, request):
+        market, query = request.match_info['symbol'], request.query
+        since = query.get('since') or query.get('timestamp')
+        return await self.__respond('trades/' + market, lambda: self.markets[market].get_trades(
+            int(since) if since else None, int(query.get('limit_trades', 50))))
+
+    # private endpoints
+
+    async def __private(self, request):
+        """Check key, signature and nonce of private request, then handle it"""
+        endpoint = request.path[len('/v1/'):]
+        try:
+            payload = self.__check_private(request.headers)
+        except ValueError as error:
+            self.__latency.record(endpoint)
+            return self.__web.json_response(make_error(*error.args), status=400)
+        handler = {'order/new': self.__new_order,
+                   'order/cancel': self.__cancel_order,
+                   'order/status': self.__order_status,
+                   'orders': self.__active_orders,
+                   'order/cancel/session': self.__cancel_all,
+                   'order/cancel/all': self.__cancel_all,
+                   'mytrades': self.__past_trades,
+                   'balances': self.__balances,
+                   'tradevolume': lambda payload: [[]],
+                   'heartbeat': lambda payload: {'result': 'ok'}}[endpoint]
+        return await self.__respond(endpoint, handler, payload)
+
+    def __check_private(self, headers):
+        """Payload of private request, ValueError(reason, message) if invalid"""
+        try:
+            key = headers['X-GEMINI-APIKEY']
+            encoded = headers['X-GEMINI-PAYLOAD']
+            payload = json.loads(base64.b64decode(encoded).decode())
+            nonce = int(payload['nonce'])
+        except Exception:
+            raise ValueError('MissingAccounts', 'Missing or malformed authentication headers')
+        if self.keys is not None:
+            if key not in self.keys:
+                raise ValueError('InvalidSignature', 'Unknown API key')
+            signature = hmac.new(bytearray(self.keys[key], 'utf-8'), bytearray(encoded, 'utf-8'),
+                                 hashlib.sha384).hexdigest()
+            if not hmac.compare_digest(signature, headers.get('X-GEMINI-SIGNATURE', '')):
+                raise ValueError('InvalidSignature', 'Signature does not match payload')
+        # runs on the event loop thread only, so needs no lock
+        nonces = self.__nonces.setdefault(key, {'last': 0, 'seen': set()})
+        if nonce in nonces['seen'] or (self.strict_nonce and nonce <= nonces['last']):
+            raise ValueError('InvalidNonce', 'Nonce {} has already been used'.format(nonce))
+        nonces['seen'].add(nonce)
+        nonces['last'] = max(nonces['last'], nonce)
+        return payload
+
+    def __new_order(self, payload):
+        """Place order: fills at once at best price if it crosses the book"""
+        market = self.markets[payload['symbol']]
+        side, price, amount = payload['side'], float(payload['price']), float(payload['amount'])
+        if side not in ['buy', 'sell'] or price <= 0 or amount <= 0:
+            raise ValueError('Invalid side, price or amount')
+        options = payload.get('options', list())
+        bid, ask = market.get_best()
+        crosses = price >= ask if side == 'buy' else price <= bid
+        now = int(time.time() * 1000)
+        order = {'order_id': str(self.__next_order_id), 'id': str(self.__next_order_id),
+                 'symbol': market.symbol, 'exchange': 'gemini', 'side': side,
+                 'type': 'exchange limit', 'timestamp': str(now // 1000), 'timestampms': now,
+                 'is_live': True, 'is_cancelled': False, 'is_hidden': False, 'was_forced': False,
+                 'price': str(price), 'original_amount': str(amount), 'executed_amount': '0',
+                 'remaining_amount': str(amount), 'avg_execution_price': '0', 'options': options}
+        if 'client_order_id' in payload:
+            order['client_order_id'] = payload['client_order_id']
+        self.__next_order_id += 1
+        if crosses and 'maker-or-cancel' not in options:
+            fill_price = ask if side == 'buy' else bid
+            order.update({'is_live': False, 'executed_amount': str(amount), 'remaining_amount': '0',
+                          'avg_execution_price': str(fill_price)})
+            self.__my_trades.append({'price': str(fill_price), 'amount': str(amount),
+                                     'timestamp': now // 1000, 'timestampms': now,
+                                     'type': side.capitalize(), 'aggressor': True,
+                                     'fee_currency': market.symbol[3:].upper(),
+                                     'fee_amount': str(round(fill_price * amount * 0.0025, 8)),
+                                     'tid': market.next_tid, 'order_id': order['order_id'],
+                                     'exchange': 'gemini', 'is_auction_fill': False,
+                                     'symbol': market.symbol})
+            market.next_tid += 1
+        elif crosses or 'immediate-or-cancel' in options:
+            order.update({'is_live': False, 'is_cancelled': True})
+        self.__orders[order['order_id']] = order
+        return order
+
+    def __get_order(self, payload):
+        """Order of payload's order_id"""
+        order = self.__orders.get(str(payload.get('order_id')))
+        if order is None:
+            raise ValueError('Order {} not found'.format(payload.get('order_id')))
+        return order
+
+    def __cancel_order(self, payload):
+        order = self.__get_order(payload)
+        if order['is_live']:
+            order.update({'is_live': False, 'is_cancelled': True})
+        return order
+
+    def __order_status(self, payload):
+        return self.__get_order(payload)
+
+    def __active_orders(self, payload):
+        return [order for order in self.__orders.values() if order['is_live']]
+
+    def __cancel_all(self, payload):
+        cancelled = list()
+        for order in self.__orders.values():
+            if order['is_live']:
+                order.update({'is_live': False, 'is_cancelled': True})
+                cancelled.append(int(order['order_id']))
+        return {'result': 'ok', 'details': {'cancelledOrders': cancelled, 'cancelRejects': list()}}
+
+    def __past_trades(self, payload):
+        since = int(payload.get('timestamp') or 0)
+        trades = [trade for trade in self.__my_trades
+                  if trade['symbol'] == payload.get('symbol') and trade['timestampms'] >= since]
+        return trades[::-1][:int(payload.get('limit_trades', 50))]
+
+    def __balances(self, payload):
+        return [{'currency': currency, 'amount': '1000', 'available': '1000',
+                 'availableForWithdrawal': '1000', 'type': 'exchange'}
+                for currency in ['BTC', 'ETH', 'USD']]
+
+    # market data
+
+    async def __run_market(self, symbol):
+        """Step market of symbol update_rate times per second, sending updates to subscribers"""
+        market = self.markets[symbol]
+        while True:
+            await asyncio.sleep(1. / self.update_rate)
+            events = market.step()
+            now = time.time()
+            for queue in self.__subscribers[symbol]:
+                # own copy per connection, which adds its socket_sequence
+                queue.put_nowait({'type': 'update', 'eventId': market.event_id,
+                                  'timestamp': int(now), 'timestampms': int(now * 1000),
+                                  'events': events})
+
+    async def __marketdata(self, request):
+        """Market data stream: 'initial' snapshot, then updates and heartbeats"""
+        web = self.__web
+        symbol = request.match_info['symbol']
+        if symbol not in self.markets:
+            return web.json_response(make_error('InvalidSymbol', 'Unknown symbol'), status=400)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        heartbeat = request.query.get('heartbeat') == 'true'
+        queue = asyncio.Queue()
+        self.__subscribers[symbol].append(queue)
+        market, sequence = self.markets[symbol], 0
+        try:
+            book = market.get_book(0, 0)
+            events = [{'type': 'change', 'side': side[:-1], 'price': level['price'],
+                       'remaining': level['amount'], 'delta': level['amount'], 'reason': 'initial'}
+                      for side in ['bids', 'asks'] for level in book[side]]
+            await ws.send_str(json.dumps({'type': 'update', 'eventId': market.event_id,
+                                          'socket_sequence': sequence, 'events': events}))
+            while not ws.closed:
+                try:
+                    message = await asyncio.wait_for(queue.get(), 1.)
+                except asyncio.TimeoutError:
+                    if not heartbeat:
+                        continue
+                    message = {'type': 'heartbeat'}
+                sequence += 1
+                message['socket_sequence'] = sequence
+                await self.__delay('marketdata')
+                await ws.send_str(json.dumps(message))
+        except (ConnectionError, RuntimeError, asyncio.CancelledError):
+            pass
+        finally:
+            self.__subscribers[symbol].remove(queue)
+        return ws
+
+
+def make_error(reason, message):
+    """Error response in the format of Gemini errors"""
+    return {'result': 'error', 'reason': reason, 'message': message}
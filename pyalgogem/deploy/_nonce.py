@@ -0,0 +1,85 @@
+#
+# PyAlgoGem Project
+# deploy/nonce
+#
+# strictly increasing nonces for private Gemini requests
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import time
+import threading
+
+# nonces count 10 microsecond ticks since epoch
+NONCE_SCALE = 100000
+# lock of each API key, see get_key_lock()
+KEY_LOCKS = dict()
+KEY_LOCKS_LOCK = threading.Lock()
+
+
+class NonceGenerator(object):
+    """
+    Source of strictly increasing nonces, safe to share between threads
+    -nonces follow the clock (time * NONCE_SCALE) but never repeat or
+    go back, even for requests in the same tick or after a clock step
+    -with a file, a high-water mark is persisted so nonces also keep
+    increasing across restarts; the mark is written ahead by reserve
+    ticks, so the file is only rewritten once that block is used up
+
+    Attributes
+    ==========
+    file : str
+        name of file holding high-water mark (None - not persisted)
+    reserve : int
+        ticks of nonces reserved by each write of the mark
+    """
+
+    def __init__(self, file=None, reserve=NONCE_SCALE):
+        if reserve < 1:
+            raise ValueError('Reserve must be at least 1')
+        self.file = file
+        self.reserve = int(reserve)
+        self.__lock = threading.Lock()
+        self.__last = 0
+        self.__mark = 0
+        if file is not None and os.path.isfile(file):
+            try:
+                with open(file) as f:
+                    self.__last = self.__mark = int(f.read().strip() or 0)
+            except ValueError:
+                raise ValueError('Nonce file {} must hold an integer'.format(file))
+
+    @property
+    def last(self):
+        """Last nonce issued (or restored high-water mark)"""
+        return self.__last
+
+    def next(self):
+        """Get next nonce, greater than all nonces issued before"""
+        with self.__lock:
+            nonce = max(int(time.time() * NONCE_SCALE), self.__last + 1)
+            if self.file is not None and nonce > self.__mark:
+                self.__persist(nonce + self.reserve)
+            self.__last = nonce
+            return nonce
+
+    def __persist(self, mark):
+        """Write high-water mark to file atomically"""
+        temp = self.file + '.tmp'
+        with open(temp, 'w') as f:
+            f.write(str(mark))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.file)
+        self.__mark = mark
+
+
+def get_key_lock(key):
+    """
+    Lock shared by all clients of API key, held from taking a nonce
+    until the request carrying it is answered, so requests of many
+    threads reach Gemini in nonce order (re-entrant)
+    """
+    with KEY_LOCKS_LOCK:
+        return KEY_LOCKS.setdefault(key, threading.RLock())
@@ -0,0 +1,302 @@
+#
+# PyAlgoGem Project
+# deploy/order_book
+#
+# local L2 order book kept up to date from Gemini market data
+#
+# Andrew Edmonds - 2018
+#
+
+import threading
+import numpy as np
+
+SIDES = ['bid', 'ask']
+
+
+class BookSide(object):
+    """
+    Price levels of one side of order book in numpy arrays
+    -levels are sorted from worst to best price, so the best
+    level is the last one (O(1)) and changes near the top of
+    the book, where most happen, only shift a few levels
+    -levels are found by binary search (O(log n))
+    """
+
+    def __init__(self, side, capacity=1024):
+        self.side = side
+        # bids ascend towards the best (highest) price, asks are
+        # stored as negative prices to ascend towards the lowest
+        self.sign = 1. if side == 'bid' else -1.
+        self.keys = np.empty(capacity, dtype=np.float64)
+        self.amounts = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    def clear(self):
+        """Remove all levels"""
+        self.size = 0
+
+    def update(self, price, amount):
+        """Set amount at price level, removing level if amount is 0"""
+        key = self.sign * price
+        size = self.size
+        position = int(np.searchsorted(self.keys[:size], key))
+        if position < size and self.keys[position] == key:
+            if amount > 0:
+                self.amounts[position] = amount
+            else:
+                self.keys[position:size - 1] = self.keys[position + 1:size]
+                self.amounts[position:size - 1] = self.amounts[position + 1:size]
+                self.size -= 1
+        elif amount > 0:
+            if size == len(self.keys):
+                self.keys = np.resize(self.keys, max(2 * size, 1))
+                self.amounts = np.resize(self.amounts, max(2 * size, 1))
+            self.keys[position + 1:size + 1] = self.keys[position:size]
+            self.amounts[position + 1:size + 1] = self.amounts[position:size]
+            self.keys[position] = key
+            self.amounts[position] = amount
+            self.size += 1
+
+    def get_best(self):
+        """(price, amount) of best level, None if side is empty"""
+        if self.size == 0:
+            return None
+        return float(self.sign * self.keys[self.size - 1]), float(self.amounts[self.size - 1])
+
+    def get_levels(self, levels=None):
+        """Prices and amounts of levels from best to worst (copies)"""
+        size = self.size
+        first = 0 if levels is None else max(size - levels, 0)
+        return self.sign * self.keys[first:size][::-1], self.amounts[first:size][::-1].copy()
+
+
+class OrderBook(object):
+    """
+    Local L2 order book of one Gemini symbol
+    -seeded from a REST snapshot (GeminiAPI.get_current_order_book())
+    and/or kept up to date from GeminiStreamAPI 'change' events
+    -price levels are kept in compact numpy arrays, queries of
+    depth, mid and microprice are vectorized
+    -safe to update from the stream's dispatcher thread while
+    other threads query it
+
+    Attributes
+    ==========
+    symbol : str
+        Gemini symbol, e.g. 'btcusd'
+    synced : bool
+        book holds a full snapshot (False after a stream gap
+        until the next snapshot arrives)
+
+    Methods
+    =======
+    load_snapshot :
+        replace book with REST order book snapshot
+    update :
+        set amount of price level
+    apply_event :
+        apply 'change'/'gap' event of GeminiStreamAPI
+    attach :
+        keep book up to date from GeminiStreamAPI
+    get_best_bid, get_best_ask :
+        best price level of side
+    get_spread, get_mid, get_microprice :
+        top-of-book prices
+    get_depth :
+        price levels of side from best to worst
+    get_cumulative_depth :
+        amount available up to each price
+    get_fill_price :
+        average price of filling amount against side
+    """
+
+    def __init__(self, symbol, capacity=1024):
+        if capacity < 1:
+            raise ValueError('Capacity must be at least 1')
+        self.symbol = str(symbol).lower()
+        self.synced = False
+        self.__sides = {side: BookSide(side, capacity) for side in SIDES}
+        self.__lock = threading.Lock()
+        # stream snapshots are a run of 'initial' changes
+        self.__in_snapshot = False
+        self.updates = 0
+
+    def __len__(self):
+        return sum(side.size for side in self.__sides.values())
+
+    def clear(self):
+        """Remove all price levels"""
+        with self.__lock:
+            for side in self.__sides.values():
+                side.clear()
+            self.synced = False
+
+    def load_snapshot(self, book):
+        """
+        Replace book with snapshot returned by
+        GeminiAPI.get_current_order_book()
+        """
+        with self.__lock:
+            for side, levels in [('bid', book.get('bids', list())), ('ask', book.get('asks', list()))]:
+                book_side = self.__sides[side]
+                book_side.clear()
+                prices = np.array([float(level['price']) for level in levels], dtype=np.float64)
+                amounts = np.array([float(level['amount']) for level in levels], dtype=np.float64)
+                keep = amounts > 0
+                keys, amounts = book_side.sign * prices[keep], amounts[keep]
+                order = np.argsort(keys, kind='mergesort')
+                if len(keys) > len(book_side.keys):
+                    book_side.keys = np.empty(2 * len(keys), dtype=np.float64)
+                    book_side.amounts = np.empty(2 * len(keys), dtype=np.float64)
+                book_side.keys[:len(keys)] = keys[order]
+                book_side.amounts[:len(keys)] = amounts[order]
+                book_side.size = len(keys)
+            self.synced = True
+
+    def update(self, side, price, amount):
+        """Set amount (remaining) at price level of side ('bid'/'ask')"""
+        if side not in self.__sides:
+            raise ValueError('Side must be in: {}'.format(', '.join(SIDES)))
+        with self.__lock:
+            self.__sides[side].update(float(price), float(amount))
+            self.updates += 1
+
+    def apply_event(self, event):
+        """
+        Apply event of GeminiStreamAPI: 'change' sets a price level,
+        'gap' clears the book until the next snapshot
+        """
+        if event.get('symbol', self.symbol) != self.symbol:
+            return
+        if event['type'] == 'gap':
+            self.clear()
+            self.__in_snapshot = False
+        elif event['type'] == 'change':
+            if event.get('reason') == 'initial':
+                if not self.__in_snapshot:
+                    self.clear()
+                    self.__in_snapshot = True
+                self.synced = True
+            else:
+                self.__in_snapshot = False
+            self.update(event['side'], event['price'], event['remaining'])
+
+    def attach(self, stream):
+        """Keep book up to date from GeminiStreamAPI (subscribe symbol before start)"""
+        if self.symbol not in stream.symbols:
+            stream.subscribe(self.symbol)
+        stream.add_callback(self.apply_event, ['change', 'gap'])
+
+    def get_best_bid(self):
+        """(price, amount) of best bid, None if no bids"""
+        with self.__lock:
+            return self.__sides['bid'].get_best()
+
+    def get_best_ask(self):
+        """(price, amount) of best ask, None if no asks"""
+        with self.__lock:
+            return self.__sides['ask'].get_best()
+
+    def get_spread(self):
+        """Best ask minus best bid (None if a side is empty)"""
+        with self.__lock:
+            bid, ask = self.__sides['bid'].get_best(), self.__sides['ask'].get_best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def get_mid(self):
+        """Mid price of best bid and ask (None if a side is empty)"""
+        with self.__lock:
+            bid, ask = self.__sides['bid'].get_best(), self.__sides['ask'].get_best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2.
+
+    def get_microprice(self, levels=1):
+        """
+        Size-weighted mid price: bid and ask prices (average of
+        top levels) weighted by the amount on the opposite side
+        -moves towards the ask as bids outweigh asks
+
+        Parameters
+        ==========
+        levels : int
+            number of levels of each side to use
+        """
+        with self.__lock:
+            bid_prices, bid_amounts = self.__sides['bid'].get_levels(levels)
+            ask_prices, ask_amounts = self.__sides['ask'].get_levels(levels)
+        if len(bid_prices) == 0 or len(ask_prices) == 0:
+            return None
+        bid_size, ask_size = bid_amounts.sum(), ask_amounts.sum()
+        bid = np.dot(bid_prices, bid_amounts) / bid_size
+        ask = np.dot(ask_prices, ask_amounts) / ask_size
+        return (bid * ask_size + ask * bid_size) / (bid_size + ask_size)
+
+    def get_depth(self, side, levels=None):
+        """
+        Price levels of side ('bid'/'ask') from best to worst
+
+        Returns
+        =======
+        return : tuple of arrays
+            prices, amounts of up to levels levels (all if None)
+        """
+        if side not in self.__sides:
+            raise ValueError('Side must be in: {}'.format(', '.join(SIDES)))
+        with self.__lock:
+            return self.__sides[side].get_levels(levels)
+
+    def get_cumulative_depth(self, side, prices=None):
+        """
+        Amount available on side up to (and including) each price
+
+        Parameters
+        ==========
+        side : str
+            'bid' or 'ask'
+        prices : array
+            prices to get depth at (default: each level's price)
+
+        Returns
+        =======
+        return : array
+            cumulative amount from the best price to each price
+        """
+        levels, amounts = self.get_depth(side)
+        cumulative = np.cumsum(amounts)
+        if prices is None:
+            return cumulative
+        # levels run from best to worst: descending for bids, ascending for asks
+        sign = 1. if side == 'bid' else -1.
+        count = np.searchsorted(-sign * levels, -sign * np.asarray(prices, dtype=np.float64), 'right')
+        return np.r_[0., cumulative][count]
+
+    def get_fill_price(self, side, amounts):
+        """
+        Average price of filling amounts against side (buying
+        from 'ask', selling to 'bid'), NaN if side is too thin
+
+        Parameters
+        ==========
+        side : str
+            'bid' or 'ask'
+        amounts : float or array
+            amounts to fill
+        """
+        levels, sizes = self.get_depth(side)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        cumulative = np.r_[0., np.cumsum(sizes)]
+        cost = np.r_[0., np.cumsum(levels * sizes)]
+        # number of levels fully used by each amount
+        full = np.searchsorted(cumulative, amounts, 'right') - 1
+        full = np.minimum(full, len(levels))
+        inside = full < len(levels)
+        rest_price = np.where(inside, levels[np.minimum(full, len(levels) - 1)] if len(levels) else 0., 0.)
+        total = cost[full] + (amounts - cumulative[full]) * rest_price
+        # tolerance for rounding of the summed amounts
+        available = amounts <= cumulative[-1] * (1 + 1e-12)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.where(available, total / amounts, np.nan)
+        return result if result.ndim else float(result)
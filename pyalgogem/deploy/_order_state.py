@@ -0,0 +1,205 @@
+#
+# PyAlgoGem Project
+# deploy/order_state
+#
+# local cache of order states kept up to date from Gemini order events
+#
+# Andrew Edmonds - 2018
+#
+
+import threading
+from collections import OrderedDict
+
+# name of order events stream in GeminiStreamAPI events and statistics
+ORDER_EVENTS = 'order_events'
+ORDER_EVENT_TYPES = ['subscription_ack', 'initial', 'accepted', 'rejected', 'booked',
+                     'fill', 'cancelled', 'cancel_rejected', 'closed']
+NUMERIC_FIELDS = ['price', 'avg_execution_price', 'executed_amount', 'remaining_amount',
+                  'original_amount', 'stop_price']
+ORDER_FIELDS = ['order_id', 'client_order_id', 'symbol', 'side', 'order_type',
+                'timestamp', 'timestampms', 'is_live', 'is_cancelled', 'is_hidden'] + NUMERIC_FIELDS
+
+
+class OrderStateCache(object):
+    """
+    Latest state of each order, kept up to date from the Gemini
+    order events stream (GeminiStreamAPI.subscribe_orders()) so
+    order status can be read without a request
+    -states: 'accepted', 'booked', 'partially_filled', 'filled',
+    'cancelled', 'rejected', and 'closed' for orders found closed
+    by a reconciliation (outcome unknown until get_order_status())
+    -after a stream gap the cache is not synced until the live
+    orders are reconciled with one get_active_orders() request
+    -safe to update from the stream's dispatcher thread while
+    other threads read it
+
+    Attributes
+    ==========
+    synced : bool
+        cache reflects all order events (False after a gap of
+        the order events stream until reconciled)
+    max_closed : int
+        number of closed orders kept
+
+    Methods
+    =======
+    apply_event :
+        apply order event of GeminiStreamAPI
+    reconcile :
+        reconcile live orders with get_active_orders() response
+    get :
+        get cached status of order
+    get_active :
+        get cached status of all live orders
+    get_stats :
+        get number of events applied and orders reconciled
+    """
+
+    def __init__(self, max_closed=10000):
+        self.synced = False
+        self.max_closed = max_closed
+        self.__orders = dict()
+        # closed orders in order of closing, oldest dropped first
+        self.__closed = OrderedDict()
+        self.__needs_reconcile = False
+        self.__lock = threading.Lock()
+        self.__stats = {'events': 0, 'reconciles': 0, 'reconciled_closed': 0}
+
+    def __len__(self):
+        return len(self.__orders)
+
+    def apply_event(self, event):
+        """
+        Apply event of GeminiStreamAPI: order events update the
+        order's state, 'gap' and 'reconcile' events of the order
+        events stream mark the cache unsynced and synced again
+        """
+        if event['type'] == 'gap':
+            if event.get('symbol') == ORDER_EVENTS:
+                with self.__lock:
+                    self.synced = False
+                    self.__needs_reconcile = True
+        elif event['type'] == 'reconcile':
+            self.reconcile(event['orders'])
+        elif event['type'] == 'subscription_ack':
+            with self.__lock:
+                self.synced = not self.__needs_reconcile
+        elif event['type'] in ORDER_EVENT_TYPES and 'order_id' in event:
+            with self.__lock:
+                self.__apply(event)
+                self.__stats['events'] += 1
+
+    def __apply(self, event):
+        """Update state of event's order (lock held)"""
+        order_id = str(event['order_id'])
+        order = self.__orders.setdefault(order_id, {'order_id': order_id})
+        for field in ORDER_FIELDS:
+            if event.get(field) is not None:
+                order[field] = event[field]
+        order['order_id'] = order_id
+        kind = event['type']
+        if kind == 'fill':
+            order['state'] = 'filled' if order.get('remaining_amount', 1) == 0 else 'partially_filled'
+            order['fills'] = order.get('fills', 0) + 1
+        elif kind == 'initial':
+            order['state'] = 'partially_filled' if order.get('executed_amount', 0) > 0 else 'booked'
+        elif kind == 'closed':
+            order['state'] = 'cancelled' if order.get('is_cancelled') else 'filled'
+        elif kind == 'cancel_rejected':
+            order['cancel_reason'] = event.get('cancel_reason', event.get('reason'))
+        else:
+            order['state'] = kind
+        if kind == 'rejected':
+            order['reason'] = event.get('reason')
+        if 'timestampms' in event:
+            order['updated'] = event['timestampms']
+        if kind in ['rejected', 'cancelled', 'closed'] or order.get('is_live') is False:
+            order['is_live'] = False
+            self.__close(order_id)
+
+    def __close(self, order_id):
+        """Keep closed order, dropping the oldest beyond max_closed (lock held)"""
+        self.__closed[order_id] = None
+        self.__closed.move_to_end(order_id)
+        while len(self.__closed) > self.max_closed:
+            oldest, _ = self.__closed.popitem(last=False)
+            self.__orders.pop(oldest, None)
+
+    def reconcile(self, active_orders):
+        """
+        Reconcile live orders with response of get_active_orders():
+        cached live orders missing from it are marked 'closed', and
+        the state of listed orders is updated
+
+        Parameters
+        ==========
+        active_orders : list
+            order statuses returned by GeminiAPI.get_active_orders()
+        """
+        active = {str(order['order_id']): parse_order(order) for order in active_orders}
+        with self.__lock:
+            for order_id, order in list(self.__orders.items()):
+                if order.get('is_live', True) and order_id not in active:
+                    order['is_live'] = False
+                    order['state'] = 'closed'
+                    order['reconciled'] = True
+                    self.__close(order_id)
+                    self.__stats['reconciled_closed'] += 1
+            for order in active.values():
+                # REST statuses name the order type 'type'
+                order['order_type'] = order.get('type')
+                order['type'] = 'initial'
+                self.__apply(order)
+            self.synced = True
+            self.__needs_reconcile = False
+            self.__stats['reconciles'] += 1
+
+    def get(self, order_id):
+        """Cached status (dict) of order, None if order is unknown"""
+        with self.__lock:
+            order = self.__orders.get(str(order_id))
+            return None if order is None else dict(order)
+
+    def get_active(self, symbol=None):
+        """List of cached status of live orders (of symbol)"""
+        with self.__lock:
+            return [dict(order) for order in self.__orders.values()
+                    if order.get('is_live', True) and (symbol is None or order.get('symbol') == symbol)]
+
+    def get_stats(self):
+        """
+        Get statistics of cache
+
+        Returns
+        =======
+        return : dict
+            orders : number of cached orders
+            live : number of live orders
+            events : number of order events applied
+            reconciles : number of reconciliations
+            reconciled_closed : live orders found closed by reconciliations
+            synced : cache reflects all order events
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats['orders'] = len(self.__orders)
+            stats['live'] = len(self.__orders) - len(self.__closed)
+            stats['synced'] = self.synced
+        return stats
+
+
+def parse_order(raw):
+    """
+    Copy of order status or order event with prices and amounts
+    converted to float (Gemini sends them as strings)
+    """
+    order = dict(raw)
+    for field in NUMERIC_FIELDS:
+        if order.get(field) is not None:
+            order[field] = float(order[field])
+    if isinstance(order.get('fill'), dict):
+        order['fill'] = parse_order(order['fill'])
+        for field in ['amount', 'fee']:
+            if order['fill'].get(field) is not None:
+                order['fill'][field] = float(order['fill'][field])
+    return order
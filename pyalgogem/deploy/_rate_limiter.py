@@ -0,0 +1,97 @@
+#
+# PyAlgoGem Project
+# deploy/rate_limiter
+#
+# token-bucket limits of requests sent to Gemini
+#
+# Andrew Edmonds - 2018
+#
+
+import time
+import threading
+
+# Gemini's recommended request rates (per second): public
+# endpoints allow 120 and private 600 requests per minute
+PUBLIC_RATE = 1
+PUBLIC_BURST = 5
+PRIVATE_RATE = 5
+PRIVATE_BURST = 10
+
+
+class TokenBucket(object):
+    """
+    Token-bucket rate limiter, safe to share between threads
+    -bucket refills rate tokens per second up to capacity
+    -each request reserves a token and waits until it is
+    available, so concurrent requests queue in call order
+
+    Attributes
+    ==========
+    rate : float
+        tokens added per second (sustained requests per second)
+    capacity : int
+        max tokens in bucket (requests sent at once in a burst)
+
+    Methods
+    =======
+    reserve :
+        -take tokens, return seconds to wait before using them
+    acquire :
+        -take tokens, sleeping until they are available
+    get_stats :
+        -number of requests and seconds spent waiting
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+        if capacity < 1:
+            raise ValueError('Capacity must be at least 1')
+        self.rate = float(rate)
+        self.capacity = int(capacity)
+        self.__tokens = float(capacity)
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__stats = {'requests': 0, 'waits': 0, 'seconds_waited': 0.0}
+
+    def reserve(self, tokens=1):
+        """Take tokens, return seconds to wait before using them"""
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            # tokens may go negative: later callers wait longer
+            self.__tokens -= tokens
+            wait = max(-self.__tokens / self.rate, 0.)
+            self.__stats['requests'] += 1
+            if wait > 0:
+                self.__stats['waits'] += 1
+                self.__stats['seconds_waited'] += wait
+        return wait
+
+    def acquire(self, tokens=1):
+        """Take tokens, sleeping until they are available"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def get_stats(self):
+        """
+        Get statistics of limiter
+
+        Returns
+        =======
+        return : dict
+            requests : number of reservations
+            waits : number of reservations that had to wait
+            seconds_waited : total seconds waited
+        """
+        with self.__lock:
+            return dict(self.__stats)
+
+
+def make_limiter(rate, burst):
+    """Get TokenBucket of rate and burst, or None if rate is None (no limit)"""
+    if rate is None:
+        return None
+    return TokenBucket(rate, burst)
@@ -0,0 +1,199 @@
+#
+# PyAlgoGem Project
+# deploy/response_cache
+#
+# TTL cache of responses of slow-changing Gemini endpoints
+#
+# Andrew Edmonds - 2018
+#
+
+import copy
+import time
+import asyncio
+import threading
+
+# seconds responses are kept per method (0 or None - not cached)
+CACHE_TTL = {'symbols': 3600,
+             'ticker': 0.5,
+             'tradevolume': 60}
+
+
+class ResponseCache(object):
+    """
+    Time-to-live cache of Gemini responses, per method and
+    arguments, safe to share between threads
+    -concurrent requests for a response that is not cached are
+    coalesced (single-flight): one is sent, the others wait for
+    its response
+    -error responses are not cached, and responses in flight when
+    the cache is invalidated are not stored
+    -callers get copies of cached responses
+
+    Attributes
+    ==========
+    ttl : dict
+        seconds responses are kept per method, e.g. 'ticker'
+
+    Methods
+    =======
+    fetch :
+        get cached response, or call function to get it
+    fetch_async :
+        coroutine of fetch() for coroutine functions
+    invalidate :
+        remove cached responses (of method)
+    get_stats :
+        get hits, misses and coalesced requests per method
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = dict(CACHE_TTL)
+        if ttl is not None:
+            self.ttl.update(ttl)
+        self.__entries = dict()
+        self.__flights = dict()
+        self.__generation = 0
+        self.__lock = threading.Lock()
+        self.__stats = dict()
+
+    def __count(self, method, stat):
+        """Add one to statistic of method (lock held)"""
+        stats = self.__stats.setdefault(method, {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0})
+        stats[stat] += 1
+
+    def __lookup(self, method, key):
+        """
+        Cached response (True, response), or in-flight request
+        (False, flight) - flight is None if caller must send it
+        (lock held)
+        """
+        entry = self.__entries.get((method, key))
+        if entry is not None and entry[0] > time.monotonic():
+            self.__count(method, 'hits')
+            return True, copy.deepcopy(entry[1])
+        flight = self.__flights.get((method, key))
+        self.__count(method, 'misses' if flight is None else 'coalesced')
+        return False, flight
+
+    def __store(self, method, key, response, generation):
+        """Cache response unless it is an error or cache was invalidated (lock held)"""
+        if generation != self.__generation:
+            return
+        if isinstance(response, dict) and response.get('result') == 'error':
+            return
+        self.__entries[(method, key)] = (time.monotonic() + self.ttl[method], response)
+
+    def fetch(self, method, key, function):
+        """
+        Get cached response of method and key (e.g. symbol), or
+        call function to get it - concurrent calls wait for the
+        first one's response
+        """
+        if not self.ttl.get(method):
+            return function()
+        with self.__lock:
+            cached, flight = self.__lookup(method, key)
+            if cached:
+                return flight
+            leader = flight is None
+            if leader:
+                # [done, response, error]
+                flight = self.__flights[(method, key)] = [threading.Event(), None, None]
+                generation = self.__generation
+        if not leader:
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return copy.deepcopy(flight[1])
+        try:
+            flight[1] = function()
+        except Exception as error:
+            flight[2] = error
+            with self.__lock:
+                self.__count(method, 'errors')
+            raise
+        else:
+            with self.__lock:
+                self.__store(method, key, flight[1], generation)
+            return copy.deepcopy(flight[1])
+        finally:
+            with self.__lock:
+                self.__flights.pop((method, key), None)
+            flight[0].set()
+
+    async def fetch_async(self, method, key, function):
+        """
+        Coroutine of fetch(): function returns a coroutine, and
+        concurrent calls on the event loop wait for the first
+        one's response
+        """
+        if not self.ttl.get(method):
+            return await function()
+        with self.__lock:
+            cached, flight = self.__lookup(method, key)
+            if cached:
+                return flight
+            leader = flight is None
+            if leader:
+                flight = self.__flights[(method, key)] = asyncio.get_event_loop().create_future()
+                generation = self.__generation
+        if not leader:
+            return copy.deepcopy(await asyncio.shield(flight))
+        try:
+            response = await function()
+        except Exception as error:
+            flight.set_exception(error)
+            # retrieved here, so no warning if no other call waits
+            flight.exception()
+            with self.__lock:
+                self.__count(method, 'errors')
+            raise
+        else:
+            flight.set_result(response)
+            with self.__lock:
+                self.__store(method, key, response, generation)
+            return copy.deepcopy(response)
+        finally:
+            if not flight.done():
+                # leader cancelled: waiting calls are cancelled too
+                flight.cancel()
+            with self.__lock:
+                self.__flights.pop((method, key), None)
+
+    def invalidate(self, method=None, key=None):
+        """
+        Remove cached responses of method and key (all keys if
+        None, all methods if method is None)
+        """
+        with self.__lock:
+            self.__generation += 1
+            for entry in list(self.__entries):
+                if (method is None or entry[0] == method) and (key is None or entry[1] == key):
+                    del self.__entries[entry]
+
+    def get_stats(self, method=None):
+        """
+        Get statistics of cache
+
+        Returns
+        =======
+        return : dict
+            hits : responses returned from cache
+            misses : requests sent
+            coalesced : calls waiting for a request already sent
+            errors : requests raising errors
+            hit_rate : hits + coalesced per call
+            entries : responses cached (including expired)
+            (dict of these per method if no method given)
+        """
+        with self.__lock:
+            stats = {name: dict(counts) for name, counts in self.__stats.items()}
+            entries = [entry[0] for entry in self.__entries]
+        for name, counts in stats.items():
+            calls = counts['hits'] + counts['misses'] + counts['coalesced']
+            counts['hit_rate'] = (counts['hits'] + counts['coalesced']) / calls if calls else None
+            counts['entries'] = entries.count(name)
+        if method is not None:
+            return stats.get(method, {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0,
+                                      'hit_rate': None, 'entries': 0})
+        return stats
@@ -0,0 +1,8 @@
+#
+# PyAlgoGem Project
+# deploy/tests/
+#
+# tests of Gemini clients, run against the local mock exchange
+#
+# Andrew Edmonds - 2018
+#
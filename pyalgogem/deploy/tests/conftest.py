@@ -0,0 +1,31 @@
+#
+# PyAlgoGem Project
+# deploy/tests/conftest
+#
+# fixtures shared by tests of Gemini clients
+#
+# Andrew Edmonds - 2018
+#
+
+import pytest
+
+# credentials accepted by the strict mock exchange
+KEY = 'mock-key'
+SECRET = 'mock-secret'
+
+
+@pytest.fixture
+def exchange():
+    """Local mock exchange checking keys and nonces as Gemini does"""
+    pytest.importorskip('aiohttp')
+    from pyalgogem.deploy import MockGeminiExchange
+    with MockGeminiExchange(strict_nonce=True, keys={KEY: SECRET}, update_rate=1, seed=0) as mock:
+        yield mock
+
+
+@pytest.fixture
+def gemini(exchange):
+    """GeminiAPI of mock exchange, without rate limits"""
+    from pyalgogem.deploy import GeminiAPI
+    with GeminiAPI(KEY, SECRET, url=exchange.url, public_rate=None, private_rate=None) as api:
+        yield api
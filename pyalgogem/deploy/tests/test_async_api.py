@@ -0,0 +1,62 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_async_api
+#
+# tests of the asyncio client of the Gemini REST API
+#
+# Andrew Edmonds - 2018
+#
+
+import time
+import asyncio
+
+from pyalgogem.deploy import AsyncGeminiAPI
+
+from .conftest import KEY, SECRET
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_concurrent_calls_match_sync_client(exchange, gemini):
+    async def send():
+        async with AsyncGeminiAPI(KEY, SECRET, url=exchange.url, private_rate=None) as api:
+            symbols, trades, *orders = await asyncio.gather(
+                api.get_symbols(), api.get_trades_history('btcusd', since=0),
+                *[api.new_order('btcusd', 0.01, 7000.0 - i, 'buy') for i in range(20)])
+            statuses = await asyncio.gather(*[api.get_order_status(order['order_id'])
+                                              for order in orders])
+            return symbols, trades, orders, statuses, api.get_latency_stats()
+
+    symbols, trades, orders, statuses, latency = run(send())
+    assert symbols == gemini.get_symbols()
+    expected = gemini.get_trades_history('btcusd', since=0)
+    assert (trades.index == expected.index).all()
+    assert list(trades['tid']) == list(expected['tid'])
+    assert [result for result in orders if result.get('result') == 'error'] == []
+    for order, status in zip(orders, statuses):
+        assert status == gemini.get_order_status(order['order_id'])
+    assert latency['order/new']['count'] == 20
+
+
+def test_requests_run_concurrently(exchange):
+    exchange.latency = {'book/': 0.1}
+
+    async def send():
+        async with AsyncGeminiAPI(KEY, SECRET, url=exchange.url) as api:
+            started = exchange.get_stats('book/')['count']
+            books = await asyncio.gather(*[api.get_current_order_book('btcusd')
+                                           for _ in range(10)])
+            return books, exchange.get_stats('book/')['count'] - started
+
+    started = time.perf_counter()
+    books, count = run(send())
+    elapsed = time.perf_counter() - started
+    assert count == 10 and all('bids' in book for book in books)
+    # ten requests of 0.1 s each, sent at once
+    assert elapsed < 0.5
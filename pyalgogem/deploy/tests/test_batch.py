@@ -0,0 +1,53 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_batch
+#
+# tests of batched order placement and cancellation
+#
+# Andrew Edmonds - 2018
+#
+
+import asyncio
+
+from pyalgogem.deploy import GeminiAPI, AsyncGeminiAPI
+
+from .conftest import KEY, SECRET
+
+
+def make_orders(count):
+    return [('btcusd', 0.01, 7000.0 - i, 'buy') for i in range(count)]
+
+
+def test_new_orders_and_cancels_are_not_rejected(exchange, gemini):
+    results = gemini.new_orders(make_orders(100), max_workers=16)
+    assert [result for result in results if result.get('result') == 'error'] == []
+    assert gemini.get_batch_stats()['requests'] == 100
+    cancels = gemini.cancel_orders([result['order_id'] for result in results], max_workers=16)
+    assert all(cancel['is_cancelled'] for cancel in cancels)
+    assert gemini.get_batch_stats()['errors'] == 0
+
+
+def test_batch_returns_invalid_calls_as_errors(exchange, gemini):
+    results = gemini.new_orders([('btcusd', 0.01, 7000.0, 'buy'), ('btcusd',)])
+    assert results[0]['side'] == 'buy'
+    assert results[1]['result'] == 'error' and results[1]['reason'] == 'TypeError'
+
+
+def test_async_batch_is_not_rejected(exchange):
+    async def send():
+        async with AsyncGeminiAPI(KEY, SECRET, url=exchange.url, private_rate=None) as api:
+            return await api.new_orders(make_orders(100))
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(send())
+    finally:
+        loop.close()
+    assert [result for result in results if result.get('result') == 'error'] == []
+
+
+def test_private_limiter_spaces_batch(exchange):
+    with GeminiAPI(KEY, SECRET, url=exchange.url, private_rate=50, private_burst=1) as api:
+        api.new_orders(make_orders(11))
+        # first order uses the burst, the other 10 wait 1/50 s each
+        assert api.get_batch_stats()['seconds'] >= 0.19
+        assert api.private_limiter.get_stats()['waits'] == 10
@@ -0,0 +1,67 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_gemini_api
+#
+# tests of pooled connections and latency metrics of GeminiAPI
+#
+# Andrew Edmonds - 2018
+#
+
+import socket
+import pytest
+import requests
+import urllib3.util.connection
+
+from pyalgogem.deploy import GeminiAPI
+from pyalgogem.deploy._latency_metrics import get_endpoint
+
+
+def test_endpoints_drop_symbols():
+    assert get_endpoint('book/btcusd') == 'book/'
+    assert get_endpoint('/trades/ethusd') == 'trades/'
+    assert get_endpoint('auction/btcusd/history') == 'auction/history'
+    assert get_endpoint('order/new') == 'order/new'
+
+
+def test_latency_is_recorded_per_endpoint(exchange, gemini):
+    exchange.latency = {'book/': 0.02}
+    for symbol in ['btcusd', 'ethusd']:
+        gemini.get_current_order_book(symbol)
+        gemini.get_trades_history(symbol, dataframe=False)
+    gemini.new_order('btcusd', 0.01, 7000.0, 'buy')
+    stats = gemini.get_latency_stats()
+    assert sorted(stats) == ['book/', 'order/new', 'trades/']
+    assert stats['book/']['count'] == 2 and stats['book/']['min'] >= 20
+    assert gemini.get_latency_stats('book/ethusd')['count'] == 2
+    # server-side handling time is recorded the same way
+    assert exchange.get_stats('book/')['count'] == 2
+    gemini.reset_latency_stats()
+    assert gemini.get_latency_stats() == {}
+
+
+def test_failed_requests_are_recorded_as_errors():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    # nothing listens on the port
+    url = 'http://127.0.0.1:{}/v1/'.format(sock.getsockname()[1])
+    sock.close()
+    with GeminiAPI('key', 'secret', url=url, public_rate=None) as api:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            api.get_current_order_book('btcusd')
+        stats = api.get_latency_stats('book/')
+    assert stats['errors'] == 1 and stats['count'] == 0
+
+
+def test_requests_share_pooled_connection(exchange, gemini, monkeypatch):
+    connections = list()
+    create_connection = urllib3.util.connection.create_connection
+
+    def count_connection(*args, **kwargs):
+        connections.append(args[0])
+        return create_connection(*args, **kwargs)
+
+    monkeypatch.setattr(urllib3.util.connection, 'create_connection', count_connection)
+    for _ in range(10):
+        gemini.get_current_order_book('btcusd')
+        gemini.new_order('btcusd', 0.01, 7000.0, 'buy')
+    assert len(connections) == 1
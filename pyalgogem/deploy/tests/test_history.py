@@ -0,0 +1,80 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_history
+#
+# tests of trade and auction history downloads
+#
+# Andrew Edmonds - 2018
+#
+
+import datetime as dt
+import pytest
+
+from pyalgogem.deploy._gemini_api import make_trades_frame
+from pyalgogem.deploy._history_backfill import fetch_range, iter_history, split_range
+
+
+def make_trade(tid, timestampms):
+    return {'tid': tid, 'timestamp': timestampms // 1000, 'timestampms': timestampms,
+            'price': '8000.00', 'amount': '0.1', 'exchange': 'gemini', 'type': 'buy'}
+
+
+def test_trades_frame_is_sorted_by_time_then_trade_id():
+    # newest first, as returned by Gemini
+    trades = [make_trade(5, 2000), make_trade(4, 1500), make_trade(3, 1500), make_trade(2, 1000),
+              make_trade(1, 1000)]
+    data = make_trades_frame(trades)
+    assert list(data['tid']) == [1, 2, 3, 4, 5]
+    assert data.index.is_monotonic_increasing
+
+
+def make_fetch(trades, limit, requests=None):
+    """fetch(since) paging through trades (oldest first) as Gemini does, newest first"""
+    def fetch(since):
+        if requests is not None:
+            requests.append(since)
+        return [trade for trade in trades if trade['timestampms'] >= since][:limit][::-1]
+    return fetch
+
+
+def test_split_range():
+    assert split_range(0, 25, 10) == [(0, 10), (10, 20), (20, 25)]
+    assert split_range(0, 3600000, dt.timedelta(minutes=30)) == [(0, 1800000), (1800000, 3600000)]
+    with pytest.raises(ValueError):
+        split_range(10, 10, 5)
+    with pytest.raises(ValueError):
+        split_range(0, 10, 0)
+
+
+def test_pages_overlap_on_cursor_and_are_deduplicated():
+    # several trades per millisecond, so pages repeat the trades at the cursor
+    trades = [make_trade(tid, 1000 + tid // 3) for tid in range(1, 31)]
+    requests = list()
+    records = fetch_range(make_fetch(trades, 5, requests), 1000, 1010, 'tid', limit=5)
+    assert [record['tid'] for record in records] == list(range(1, 30))
+    assert len(requests) > 6 and requests == sorted(requests)
+
+
+def test_history_is_yielded_in_chronological_chunks():
+    trades = [make_trade(tid, tid * 100) for tid in range(1, 1001)]
+    chunks = list(iter_history(make_fetch(trades, 50), 1000, 90000, 'tid', 10000, max_workers=3,
+                               limit=50))
+    # one chunk per sub-range of 100 trades
+    assert [len(chunk) for chunk in chunks] == [100] * 8 + [90]
+    tids = [trade['tid'] for chunk in chunks for trade in chunk]
+    assert tids == list(range(10, 900))
+    frames = iter_history(make_fetch(trades, 50), 1000, 90000, 'tid', 10000, limit=50,
+                          convert=make_trades_frame)
+    assert list(next(frames)['tid']) == list(range(10, 110))
+    # closing early drops the sub-ranges not downloaded yet
+    frames.close()
+
+
+def test_backfill_from_mock_exchange(exchange, gemini):
+    trades = list(exchange.markets['btcusd'].trades)
+    start, end = trades[0]['timestampms'], trades[999]['timestampms'] + 1
+    chunks = list(gemini.backfill_trades_history('btcusd', start, end, interval=600000,
+                                                 max_workers=4))
+    assert len(chunks) == 6
+    tids = [tid for chunk in chunks for tid in chunk['tid']]
+    assert tids == [trade['tid'] for trade in trades[:1000]]
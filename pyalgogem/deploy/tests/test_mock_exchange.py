@@ -0,0 +1,75 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_mock_exchange
+#
+# tests of the local mock Gemini exchange
+#
+# Andrew Edmonds - 2018
+#
+
+import hmac
+import json
+import time
+import base64
+import hashlib
+
+import pytest
+import requests
+
+from .conftest import KEY, SECRET
+
+
+def post_private(exchange, endpoint, nonce, secret=SECRET, **params):
+    """Send signed private request to exchange, returning decoded response"""
+    payload = dict(params, request='/v1/' + endpoint, nonce=nonce)
+    encoded = base64.b64encode(json.dumps(payload).encode()).decode()
+    signature = hmac.new(bytearray(secret, 'utf-8'), bytearray(encoded, 'utf-8'),
+                         hashlib.sha384).hexdigest()
+    headers = {'X-GEMINI-APIKEY': KEY, 'X-GEMINI-PAYLOAD': encoded,
+               'X-GEMINI-SIGNATURE': signature}
+    return requests.post(exchange.url + endpoint, headers=headers, timeout=10).json()
+
+
+def test_reused_and_lower_nonces_are_rejected(exchange):
+    assert post_private(exchange, 'heartbeat', 1000) == {'result': 'ok'}
+    for nonce in [1000, 999]:
+        response = post_private(exchange, 'heartbeat', nonce)
+        assert response['result'] == 'error'
+        assert response['reason'] == 'InvalidNonce'
+    assert post_private(exchange, 'heartbeat', 1001) == {'result': 'ok'}
+
+
+def test_bad_signature_is_rejected(exchange):
+    response = post_private(exchange, 'heartbeat', 1, secret='wrong-secret')
+    assert response['reason'] == 'InvalidSignature'
+
+
+def test_crossing_orders_fill_and_others_rest(exchange, gemini):
+    price = exchange.markets['btcusd'].get_best()[1]
+    filled = gemini.new_order('btcusd', 0.5, round(price * 2, 2), 'buy')
+    assert float(filled['executed_amount']) == 0.5
+    assert not filled['is_live']
+    resting = gemini.new_order('btcusd', 0.5, round(price / 2, 2), 'buy')
+    assert float(resting['executed_amount']) == 0
+    assert resting['is_live']
+    assert [order['order_id'] for order in gemini.get_active_orders()] == [resting['order_id']]
+
+
+def test_stats_count_requests_per_endpoint(exchange, gemini):
+    for _ in range(3):
+        gemini.get_active_orders()
+    gemini.get_ticker('btcusd')
+    assert exchange.get_stats('orders')['count'] == 3
+    assert exchange.get_stats('pubticker/')['count'] == 1
+    assert exchange.get_stats('order/new')['count'] == 0
+
+
+@pytest.mark.parametrize('latency', [0.2, {'pubticker/': 0.2, 'default': 0.}])
+def test_injected_latency_delays_responses(exchange, gemini, latency):
+    exchange.latency = latency
+    started = time.perf_counter()
+    gemini.get_ticker('btcusd')
+    assert time.perf_counter() - started >= 0.2
+    started = time.perf_counter()
+    gemini.get_active_orders()
+    assert (time.perf_counter() - started >= 0.2) == (latency == 0.2)
@@ -0,0 +1,69 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_nonce
+#
+# tests of nonces of private requests
+#
+# Andrew Edmonds - 2018
+#
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pyalgogem.deploy import GeminiAPI, NonceGenerator
+from pyalgogem.deploy import _nonce
+from pyalgogem.deploy._nonce import get_key_lock
+
+from .conftest import KEY, SECRET
+
+
+def test_nonces_increase_across_threads():
+    nonces = NonceGenerator()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        issued = list(executor.map(lambda _: nonces.next(), range(5000)))
+    assert len(set(issued)) == len(issued)
+    assert nonces.last == max(issued)
+
+
+def test_nonces_increase_across_restarts(tmpdir):
+    file = str(tmpdir.join('nonce.txt'))
+    first = NonceGenerator(file, reserve=10 ** 9)
+    last = max(first.next() for _ in range(10))
+    # a restart within the reserved block starts above the mark
+    assert NonceGenerator(file).next() > last + 10 ** 8
+
+
+def test_key_lock_is_shared_per_key():
+    assert get_key_lock('a') is get_key_lock('a')
+    assert get_key_lock('a') is not get_key_lock('b')
+
+
+def test_threads_sharing_client_send_nonces_in_order(exchange, gemini):
+    orders = [('btcusd', 0.01, 7000.0, 'buy')] * 200
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(lambda order: gemini.new_order(*order), orders))
+    rejected = [result for result in results if result.get('result') == 'error']
+    assert rejected == []
+    assert len(set(result['order_id'] for result in results)) == len(orders)
+
+
+class LaggingClock(object):
+    """Clock running a second behind for its first reading"""
+
+    def __init__(self):
+        self.readings = 0
+
+    def time(self):
+        self.readings += 1
+        return time.time() - (1 if self.readings == 1 else 0)
+
+
+def test_request_rejected_for_nonce_is_resent(exchange, gemini, monkeypatch):
+    # another process using the key got a nonce in first
+    assert 'order_id' in gemini.new_order('btcusd', 0.01, 7000.0, 'buy')
+    clock = LaggingClock()
+    monkeypatch.setattr(_nonce, 'time', clock)
+    with GeminiAPI(KEY, SECRET, url=exchange.url, private_rate=None) as other:
+        result = other.new_order('btcusd', 0.01, 7000.0, 'buy')
+    assert 'order_id' in result
+    assert clock.readings == 2
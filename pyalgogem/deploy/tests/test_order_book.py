@@ -0,0 +1,90 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_order_book
+#
+# tests of the local L2 order book
+#
+# Andrew Edmonds - 2018
+#
+
+import random
+import numpy as np
+import pytest
+
+from pyalgogem.deploy import OrderBook
+
+
+def make_change(side, price, remaining, reason='place'):
+    return {'type': 'change', 'symbol': 'btcusd', 'side': side, 'price': price,
+            'remaining': remaining, 'reason': reason}
+
+
+def test_random_updates_match_reference():
+    rng = random.Random(0)
+    # small capacity, so the arrays grow
+    book = OrderBook('BTCUSD', capacity=4)
+    reference = {'bid': dict(), 'ask': dict()}
+    for _ in range(5000):
+        side = rng.choice(['bid', 'ask'])
+        price = round(100 + (-1 if side == 'bid' else 1) * rng.randint(1, 200) * 0.01, 2)
+        amount = 0. if rng.random() < 0.3 else round(rng.uniform(0.1, 5), 4)
+        book.update(side, price, amount)
+        if amount > 0:
+            reference[side][price] = amount
+        else:
+            reference[side].pop(price, None)
+    for side, reverse in [('bid', True), ('ask', False)]:
+        prices, amounts = book.get_depth(side)
+        expected = sorted(reference[side].items(), reverse=reverse)
+        assert list(prices) == [price for price, _ in expected]
+        assert list(amounts) == [amount for _, amount in expected]
+    assert len(book) == len(reference['bid']) + len(reference['ask'])
+    assert book.get_best_bid() == max(reference['bid'].items())
+    assert book.get_best_ask() == min(reference['ask'].items())
+
+
+def test_snapshot_of_mock_exchange(exchange, gemini):
+    snapshot = gemini.get_current_order_book('btcusd', limit_bids=0, limit_asks=0)
+    book = OrderBook('btcusd')
+    book.load_snapshot(snapshot)
+    assert book.synced
+    prices, amounts = book.get_depth('ask')
+    assert list(prices) == sorted(float(level['price']) for level in snapshot['asks'])
+    bid, ask = book.get_best_bid()[0], book.get_best_ask()[0]
+    assert book.get_spread() == pytest.approx(ask - bid)
+    assert bid < book.get_microprice() < ask
+
+
+def test_gap_clears_book_until_next_snapshot():
+    book = OrderBook('btcusd')
+    for price in [99., 98.]:
+        book.apply_event(make_change('bid', price, 1., 'initial'))
+    book.apply_event(make_change('ask', 101., 1., 'initial'))
+    book.apply_event(make_change('ask', 102., 2.))
+    assert book.synced and len(book) == 4
+    book.apply_event({'type': 'gap', 'symbol': 'btcusd'})
+    assert not book.synced and len(book) == 0
+    # events of other symbols are ignored
+    book.apply_event(dict(make_change('bid', 50., 1., 'initial'), symbol='ethusd'))
+    assert len(book) == 0
+    book.apply_event(make_change('bid', 97., 1., 'initial'))
+    assert book.synced and book.get_best_bid() == (97., 1.)
+
+
+def test_fill_price_and_cumulative_depth():
+    book = OrderBook('btcusd')
+    book.load_snapshot({'asks': [{'price': '101', 'amount': '1'}, {'price': '102', 'amount': '2'}],
+                        'bids': [{'price': '99', 'amount': '3'}]})
+    fills = book.get_fill_price('ask', [0.5, 1., 2., 3., 4.])
+    assert np.allclose(fills[:4], [101., 101., 101.5, 305. / 3])
+    # not enough amount on side
+    assert np.isnan(fills[4])
+    assert book.get_fill_price('bid', 1.) == 99.
+    assert list(book.get_cumulative_depth('ask', [100., 101., 101.5, 103.])) == [0., 1., 1., 3.]
+
+
+def test_invalid_arguments_raise():
+    with pytest.raises(ValueError):
+        OrderBook('btcusd', capacity=0)
+    with pytest.raises(ValueError):
+        OrderBook('btcusd').update('buy', 100., 1.)
@@ -0,0 +1,80 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_order_state
+#
+# tests of the order state cache fed by order events
+#
+# Andrew Edmonds - 2018
+#
+
+from pyalgogem.deploy._order_state import ORDER_EVENTS, OrderStateCache
+from pyalgogem.deploy._gemini_streamer_api import parse_order_events
+
+
+def make_event(kind, order_id, executed, remaining, **fields):
+    """Order event as sent by Gemini (prices and amounts as strings)"""
+    event = {'type': kind, 'order_id': str(order_id), 'symbol': 'btcusd', 'side': 'buy',
+             'order_type': 'exchange limit', 'timestampms': 1500000000000 + order_id,
+             'is_live': kind not in ['cancelled', 'closed'], 'is_cancelled': kind == 'cancelled',
+             'price': '7000.00', 'original_amount': '2', 'executed_amount': str(executed),
+             'remaining_amount': str(remaining)}
+    event.update(fields)
+    return event
+
+
+def apply_message(cache, *events):
+    for event in parse_order_events(list(events)):
+        cache.apply_event(event)
+
+
+def test_order_states_follow_events():
+    cache = OrderStateCache()
+    cache.apply_event({'type': 'subscription_ack', 'symbol': ORDER_EVENTS})
+    assert cache.synced
+    apply_message(cache, make_event('accepted', 1, 0, 2), make_event('accepted', 2, 0, 2))
+    apply_message(cache, make_event('booked', 1, 0, 2), make_event('booked', 2, 0, 2))
+    assert cache.get(1)['state'] == 'booked' and cache.get(1)['price'] == 7000.
+    apply_message(cache, make_event('fill', 1, 1, 1))
+    assert cache.get(1)['state'] == 'partially_filled'
+    apply_message(cache, make_event('fill', 1, 2, 0), make_event('closed', 1, 2, 0))
+    assert cache.get('1')['state'] == 'filled' and cache.get('1')['fills'] == 2
+    apply_message(cache, make_event('cancelled', 2, 0, 2, reason='Requested'))
+    assert cache.get(2)['state'] == 'cancelled'
+    assert cache.get_active() == []
+    apply_message(cache, make_event('rejected', 3, 0, 2, reason='InvalidPrice'))
+    assert cache.get(3)['reason'] == 'InvalidPrice'
+    assert cache.get_stats()['events'] == 9
+
+
+def test_gap_then_reconcile_with_active_orders(exchange, gemini):
+    cache = gemini.order_cache
+    orders = [gemini.new_order('btcusd', 0.01, 7000.0 - i, 'buy') for i in range(3)]
+    for order in orders:
+        apply_message(cache, make_event('booked', int(order['order_id']), 0, 0.01))
+    cache.apply_event({'type': 'subscription_ack', 'symbol': ORDER_EVENTS})
+    # gaps of market data streams do not affect the cache
+    cache.apply_event({'type': 'gap', 'symbol': 'btcusd'})
+    assert cache.synced
+    cache.apply_event({'type': 'gap', 'symbol': ORDER_EVENTS})
+    assert not cache.synced
+    # cancelled while disconnected
+    gemini.cancel_order(int(orders[0]['order_id']))
+    cache.apply_event({'type': 'subscription_ack', 'symbol': ORDER_EVENTS})
+    assert not cache.synced
+    cache.apply_event({'type': 'reconcile', 'symbol': ORDER_EVENTS,
+                       'orders': gemini.get_active_orders()})
+    assert cache.synced
+    status = gemini.get_cached_order_status(orders[0]['order_id'])
+    assert status['state'] == 'closed' and status['reconciled']
+    assert sorted(order['order_id'] for order in gemini.get_cached_active_orders('btcusd')) == \
+        sorted(str(order['order_id']) for order in orders[1:])
+    assert cache.get_stats()['reconciled_closed'] == 1
+
+
+def test_closed_orders_are_dropped_oldest_first():
+    cache = OrderStateCache(max_closed=2)
+    for order_id in range(1, 5):
+        apply_message(cache, make_event('cancelled', order_id, 0, 2))
+    assert cache.get(1) is None and cache.get(2) is None
+    assert cache.get(4)['state'] == 'cancelled'
+    assert len(cache) == 2
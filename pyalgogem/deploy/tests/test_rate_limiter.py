@@ -0,0 +1,35 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_rate_limiter
+#
+# tests of token-bucket rate limits
+#
+# Andrew Edmonds - 2018
+#
+
+import pytest
+
+from pyalgogem.deploy import GeminiAPI
+from pyalgogem.deploy._rate_limiter import TokenBucket
+
+
+def test_burst_is_not_delayed_then_requests_queue():
+    bucket = TokenBucket(10, capacity=3)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits[:3] == [0, 0, 0]
+    # later callers queue behind earlier ones
+    assert 0.09 < waits[3] < waits[4] < 0.21
+
+
+def test_invalid_limits_are_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+    with pytest.raises(ValueError):
+        TokenBucket(1, capacity=0)
+
+
+def test_public_requests_are_not_limited_by_default():
+    api = GeminiAPI('key', 'secret')
+    assert api.public_limiter is None
+    assert api.private_limiter is not None
+    assert GeminiAPI('key', 'secret', public_rate=1).public_limiter.rate == 1
@@ -0,0 +1,77 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_response_cache
+#
+# tests of TTL caching of public Gemini responses
+#
+# Andrew Edmonds - 2018
+#
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from pyalgogem.deploy import GeminiAPI
+from pyalgogem.deploy._response_cache import ResponseCache
+
+
+def test_concurrent_calls_send_one_request():
+    cache = ResponseCache()
+    calls = list()
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {'bid': '100'}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.fetch, 'ticker', 'btcusd', fetch) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        responses = [future.result() for future in futures]
+    assert len(calls) == 1 and all(response == {'bid': '100'} for response in responses)
+    stats = cache.get_stats('ticker')
+    assert stats['misses'] == 1 and stats['coalesced'] == 7
+
+
+def test_responses_expire_and_are_copies():
+    cache = ResponseCache({'ticker': 0.05})
+    first = cache.fetch('ticker', 'btcusd', lambda: {'bid': '100'})
+    first['bid'] = 'changed'
+    assert cache.fetch('ticker', 'btcusd', lambda: {'bid': '101'}) == {'bid': '100'}
+    time.sleep(0.06)
+    assert cache.fetch('ticker', 'btcusd', lambda: {'bid': '101'}) == {'bid': '101'}
+    # methods without ttl are never cached
+    assert cache.fetch('book', 'btcusd', lambda: 1) == 1
+    assert cache.get_stats('book')['misses'] == 0
+
+
+def test_errors_are_not_cached_and_invalidate():
+    cache = ResponseCache()
+    error = {'result': 'error', 'reason': 'RateLimit'}
+    assert cache.fetch('ticker', 'btcusd', lambda: error) == error
+    with pytest.raises(ValueError):
+        cache.fetch('ticker', 'btcusd', lambda: int('x'))
+    assert cache.fetch('ticker', 'btcusd', lambda: {'bid': '100'}) == {'bid': '100'}
+    assert cache.get_stats('ticker')['errors'] == 1
+    cache.fetch('ticker', 'ethusd', lambda: {'bid': '10'})
+    cache.invalidate('ticker', 'btcusd')
+    assert cache.fetch('ticker', 'btcusd', lambda: {'bid': '101'}) == {'bid': '101'}
+    assert cache.fetch('ticker', 'ethusd', lambda: {'bid': '11'}) == {'bid': '10'}
+
+
+def test_cached_endpoints_of_client(exchange):
+    with GeminiAPI('key', 'secret', url=exchange.url, public_rate=None) as api:
+        for _ in range(5):
+            api.get_ticker('btcusd')
+            api.get_symbols()
+        assert exchange.get_stats('pubticker/')['count'] == 1
+        assert exchange.get_stats('symbols')['count'] == 1
+        assert api.get_cache_stats('ticker')['hits'] == 4
+    with GeminiAPI('key', 'secret', url=exchange.url, public_rate=None,
+                   cache_ttl={'ticker': 0}) as api:
+        for _ in range(5):
+            api.get_ticker('btcusd')
+    assert exchange.get_stats('pubticker/')['count'] == 6
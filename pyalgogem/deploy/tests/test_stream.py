@@ -0,0 +1,105 @@
+#
+# PyAlgoGem Project
+# deploy/tests/test_stream
+#
+# tests of the market data WebSocket client
+#
+# Andrew Edmonds - 2018
+#
+
+import json
+import time
+import pytest
+
+from pyalgogem.deploy import GeminiStreamAPI
+from pyalgogem.deploy import _gemini_streamer_api
+
+
+def wait_for(condition, timeout=5):
+    """Wait until condition() is true, or timeout seconds"""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def make_update(sequence, price=100.):
+    return json.dumps({'type': 'update', 'eventId': sequence + 1, 'socket_sequence': sequence,
+                       'events': [{'type': 'change', 'side': 'bid', 'price': str(price),
+                                   'remaining': '1', 'delta': '1', 'reason': 'place'}]})
+
+
+class FakeWebSocket(object):
+    """Connection replaying messages, then dropping (empty message)"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def recv(self):
+        if self.messages:
+            return self.messages.pop(0)
+        time.sleep(0.01)
+        return ''
+
+    def close(self, timeout=0):
+        pass
+
+
+class FakeWebSocketModule(object):
+    """websocket-client stand-in handing out a FakeWebSocket per connection"""
+
+    def __init__(self, *connections):
+        self.connections = list(connections)
+        self.urls = list()
+
+    def create_connection(self, url, timeout=None, header=None):
+        self.urls.append(url)
+        return FakeWebSocket(self.connections.pop(0) if self.connections else list())
+
+
+def stream_events(module, monkeypatch, count):
+    """Types of first count events streamed of btcusd through fake websocket module"""
+    monkeypatch.setattr(_gemini_streamer_api, 'get_websocket', lambda: module)
+    events = list()
+    stream = GeminiStreamAPI('key', 'secret', reconnect_delay=0.01, heartbeat=False)
+    stream.subscribe('btcusd')
+    stream.add_callback(events.append)
+    with stream:
+        assert wait_for(lambda: len(events) >= count)
+    return events[:count], stream.get_stats()
+
+
+def test_events_from_mock_exchange(exchange):
+    pytest.importorskip('websocket')
+    events = list()
+    stream = GeminiStreamAPI('key', 'secret', url=exchange.ws_url)
+    stream.subscribe('btcusd')
+    stream.add_callback(events.append, event_types=['change'])
+    with stream:
+        # snapshot, then an update (or heartbeat) each second
+        assert wait_for(lambda: stream.get_stats()['messages'] >= 2)
+    snapshot = [event for event in events if event['reason'] == 'initial']
+    bids = [event['price'] for event in snapshot if event['side'] == 'bid']
+    asks = [event['price'] for event in snapshot if event['side'] == 'ask']
+    assert len(bids) > 0 and len(asks) > 0 and max(bids) < min(asks)
+    assert all(event['symbol'] == 'btcusd' for event in events)
+    assert stream.get_stats()['gaps'] == 0
+
+
+def test_dropped_connection_sends_gap(monkeypatch):
+    module = FakeWebSocketModule([make_update(0), make_update(1)], [make_update(0)])
+    events, stats = stream_events(module, monkeypatch, 4)
+    assert [event['type'] for event in events] == ['change', 'change', 'gap', 'change']
+    assert events[2]['socket_sequence'] is None
+    assert stats['reconnects'] >= 1
+    assert module.urls[0] == 'wss://api.sandbox.gemini.com/v1/marketdata/btcusd'
+
+
+def test_sequence_gap_reconnects(monkeypatch):
+    module = FakeWebSocketModule([make_update(0), make_update(2)], [make_update(0, 99.)])
+    events, stats = stream_events(module, monkeypatch, 3)
+    assert [event['type'] for event in events] == ['change', 'gap', 'change']
+    assert (events[1]['expected'], events[1]['socket_sequence']) == (1, 2)
+    # snapshot of the new connection
+    assert events[2]['price'] == 99.
+    assert stats['gaps'] >= 1 and stats['reconnects'] >= 1
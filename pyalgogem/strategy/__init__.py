@@ -7,5 +7,7 @@
 # Andrew Edmonds - 2018
 #
 
-from ._dataset import Dataset
-from ._indicator import IndicatorSMA, IndicatorMOM, IndicatorMR
\ No newline at end of file
+from pyalgogem._lazy_loader import lazy_attributes
+
+lazy_attributes(__name__, {'._dataset': ['Dataset'],
+                           '._indicator': ['IndicatorSMA', 'IndicatorMOM', 'IndicatorMR']})
@@ -8,7 +8,7 @@
 #
 
 from numpy import log
-from pandas import DataFrame
+from pandas import DataFrame, Series, to_datetime
 
 
 class Dataset(object):
@@ -30,6 +30,11 @@ class Dataset(object):
     =======
     initialize_returns :
         -recalculates returns based on raw dataset
+    from_memmap :
+        -creates Dataset from memory-mapped mirror arrays
+    get_column :
+        -column of raw dataset as Series (a view of
+        memory-mapped arrays)
 
     """
 
@@ -43,9 +48,36 @@ class Dataset(object):
         input_data: DataFrame
             initial dataset to be used as raw data
         """
+        # memory-mapped columns and their index (see from_memmap())
+        self.__arrays = None
+        self.__index = None
         # raw dataset
         self.raw = input_data
 
+    @classmethod
+    def from_memmap(cls, arrays):
+        """
+        Creates Dataset directly from memory-mapped arrays,
+        kept as they are so their pages stay shared between
+        processes
+        -get_column() and the returns of sample read the arrays
+        without copying them
+        -raw is built on first access: a single column is a view
+        of its array, several columns are copied into one block
+        by pandas
+
+        Parameters
+        ==========
+        arrays : dict
+            'timestamp' (int64 ms since epoch) and value
+            columns as returned by data.load_mirror()
+        """
+        dataset = cls(None)
+        dataset.__index = to_datetime(arrays['timestamp'], unit='ms')
+        dataset.__arrays = {col: values for col, values in arrays.items() if col != 'timestamp'}
+        dataset.initialize_returns()
+        return dataset
+
     def __str__(self):
         """When printing, print sample dataset"""
         return self.raw.__str__()
@@ -53,6 +85,8 @@ class Dataset(object):
     @property
     def raw(self):
         """Raw dataset to load from disk"""
+        if self.__raw is None and self.__arrays is not None:
+            self.__raw = self.__make_raw()
         return self.__raw
 
     @raw.setter
@@ -60,6 +94,7 @@ class Dataset(object):
         if new_raw is None or \
                 isinstance(new_raw, DataFrame):
             self.__raw = new_raw
+            self.__arrays = self.__index = None
             self.initialize_returns()
         else:
             raise ValueError('Must be Pandas DataFrame object')
@@ -79,8 +114,26 @@ class Dataset(object):
 
     def initialize_returns(self):
         """Resets sample data to match raw dataset"""
-        if self.raw is None:
+        if self.__raw is None and self.__arrays is None:
             self.sample = None
         else:
-            data = self.raw.copy()
-            self.sample = DataFrame({'close': data['close'], 'returns': log(data['close'] / data['close'].shift(1))})
+            close = self.get_column('close')
+            self.sample = DataFrame({'close': close, 'returns': log(close / close.shift(1))})
+
+    def get_column(self, column):
+        """
+        Column of raw dataset as Series - a view of its array
+        if Dataset was created from memory-mapped arrays
+        """
+        if self.__arrays is not None:
+            return Series(self.__arrays[column], index=self.__index, name=column, copy=False)
+        return self.raw[column]
+
+    def __make_raw(self):
+        """DataFrame of memory-mapped columns, a view if there is only one"""
+        columns = list(self.__arrays)
+        if len(columns) == 1:
+            values = self.__arrays[columns[0]].reshape(-1, 1)
+            return DataFrame(values, index=self.__index, columns=columns, copy=False)
+        return DataFrame({col: self.get_column(col) for col in columns}, columns=columns,
+                         copy=False)
@@ -10,8 +10,104 @@
 from pyalgogem.strategy import Dataset
 
 import numpy as np
-from pandas import DataFrame
-from scipy.optimize import brute
+from pandas import DataFrame, Series
+
+
+def rolling_mean(values, window):
+    """
+    Mean of each window of values (NaN for the first window - 1)
+    -each mean only depends on the values in its window, so means of a
+    series split into chunks (carrying the last window - 1 values) are
+    bit-identical to means of the whole series
+    -windows are summed from blocks of 1, 2, 4, ... values: O(n log(window))
+
+    Parameters
+    ==========
+    values : array
+        values to average
+    window : int
+        number of values in each window
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    means = np.full(n, np.nan)
+    if n < window:
+        return means
+    total = None
+    offset = 0
+    # block[j] holds sum of values[j:j + size]
+    block, size = values, 1
+    while size <= window:
+        if window & size:
+            part = block[offset:offset + n - window + 1]
+            total = part if total is None else total + part
+            offset += size
+        if size * 2 <= window:
+            block = block[:len(block) - size] + block[size:]
+        size *= 2
+    means[window - 1:] = total / window
+    return means
+
+
+def carry_returns(chunk, state):
+    """
+    Log-returns of close-price of chunk, continuing from the last
+    close-price of the previous chunk (as in Dataset.sample)
+    """
+    close = chunk['close']
+    previous = Series(np.r_[state['close'], close.values][:len(close)], index=close.index)
+    if len(close) > 0:
+        state['close'] = close.values[-1]
+    return DataFrame({'close': close, 'returns': np.log(close / previous)})
+
+
+def carry_shift(values, state, key):
+    """Shift values of chunk by one, filling with last value of the previous chunk"""
+    shifted = Series(np.r_[state[key], values.values[:-1]].astype(np.float64), index=values.index)
+    state[key] = values.values[-1]
+    return shifted
+
+
+def carry_cumsum(values, state, key):
+    """
+    Cumulative sum (skipping NaN) of chunk, continuing from the
+    last sum of the previous chunk (as in Series.cumsum)
+    """
+    vals = values.values.copy()
+    mask = np.isnan(vals)
+    vals[mask] = 0.0
+    if state[key] is None:
+        sums = np.cumsum(vals)
+    else:
+        sums = np.cumsum(np.r_[state[key], vals])[1:]
+    state[key] = sums[-1]
+    sums[mask] = np.nan
+    return Series(sums, index=values.index)
+
+
+def carry_rolling_mean(values, window, state, key):
+    """Rolling mean of chunk, continuing from the last window - 1 values of the previous chunk"""
+    extended = np.r_[state[key], values.values]
+    means = rolling_mean(extended, window)[len(state[key]):]
+    state[key] = extended[max(len(extended) - window + 1, 0):]
+    return Series(means, index=values.index)
+
+
+def new_chunk_state():
+    """State carried between chunks of a chunked backtest"""
+    return {'close': np.nan, 'tail': np.empty(0), 'position': np.nan, 'distance': np.nan,
+            'filled': np.nan, 'creturns': None, 'cstrategy': None}
+
+
+def get_performance(results):
+    """Absolute and out/under performance from last chunk of a chunked backtest"""
+    if results is None:
+        raise ValueError('Not enough data to run strategy')
+    # absolute performance of indicator
+    aperf = results['cstrategy'].iloc[-1]
+    # out/under performance of indicator
+    operf = aperf - results['creturns'].iloc[-1]
+    return round(aperf, 2), round(operf, 2)
 
 
 class IndicatorSMA(object):
@@ -38,6 +134,10 @@ class IndicatorSMA(object):
         recalculate results DataFrame based on current SMA parameters
     plot_results :
         plot results of strategy with current SMA parameters
+    iter_strategy :
+        run strategy over stream of chunks, yielding results of each chunk
+    execute_strategy_chunked :
+        run strategy over stream of chunks in fixed memory
     """
 
     def __init__(self, sma1, sma2, dataset, symbol):
@@ -63,7 +163,8 @@ class IndicatorSMA(object):
         if new_dataset is None or \
                 isinstance(new_dataset, Dataset):
             self.__dataset = new_dataset
-            self.results = self.dataset.sample.copy()
+            # no dataset for chunked backtests
+            self.results = None if new_dataset is None else self.dataset.sample.copy()
         else:
             raise ValueError('Must be Dataset object or None')
 
@@ -87,10 +188,12 @@ class IndicatorSMA(object):
 
     @sma1.setter
     def sma1(self, new_sma1):
-        if (isinstance(new_sma1, int) and
-                1 < new_sma1 < len(self.dataset.sample)):
+        if (isinstance(new_sma1, int) and 1 < new_sma1 and
+                (self.dataset is None or new_sma1 < len(self.dataset.sample))):
             self.__sma1 = new_sma1
-            self.results['SMA1'] = self.results['close'].rolling(new_sma1).mean()
+            if self.results is not None:
+                self.results['SMA1'] = Series(rolling_mean(self.results['close'], new_sma1),
+                                            index=self.results.index)
         else:
             raise ValueError('SMA1 must be greater than 1 and less than the size of the data')
 
@@ -101,10 +204,12 @@ class IndicatorSMA(object):
 
     @sma2.setter
     def sma2(self, new_sma2):
-        if (isinstance(new_sma2, int) and
-                1 < new_sma2 < len(self.dataset.sample)):
+        if (isinstance(new_sma2, int) and 1 < new_sma2 and
+                (self.dataset is None or new_sma2 < len(self.dataset.sample))):
             self.__sma2 = new_sma2
-            self.results['SMA2'] = self.results['close'].rolling(new_sma2).mean()
+            if self.results is not None:
+                self.results['SMA2'] = Series(rolling_mean(self.results['close'], new_sma2),
+                                            index=self.results.index)
         else:
             raise ValueError('SMA2 must be greater than 1 and less than the size of the data')
 
@@ -114,8 +219,10 @@ class IndicatorSMA(object):
         """
         self.results = self.dataset.sample.copy()
         if (self.sma1 and self.sma2):
-            self.results['SMA1'] = self.results['close'].rolling(self.sma1).mean()
-            self.results['SMA2'] = self.results['close'].rolling(self.sma2).mean()
+            self.results['SMA1'] = Series(rolling_mean(self.results['close'], self.sma1),
+                                          index=self.results.index)
+            self.results['SMA2'] = Series(rolling_mean(self.results['close'], self.sma2),
+                                          index=self.results.index)
 
     def execute_strategy(self):
         """
@@ -146,6 +253,59 @@ class IndicatorSMA(object):
                 (self.symbol, self.sma1, self.sma2, aperf, operf)
         self.results[['creturns', 'cstrategy']].plot(title=title, figsize=(10, 6))
 
+    def iter_strategy(self, chunks):
+        """
+        Run backtesting of strategy over stream of chunks
+        -rolling-window tail, last position and cumulative
+        returns are carried from one chunk to the next
+        -results are bit-identical to execute_strategy()
+
+        Parameters
+        ==========
+        chunks : iterable of DataFrame
+            consecutive chunks with 'close' column, e.g.
+            data.iter_datafile(..., columns=['close'])
+
+        Returns
+        =======
+        return : generator
+            results DataFrame of each chunk
+        """
+        state = new_chunk_state()
+        for chunk in chunks:
+            data = carry_returns(chunk, state)
+            # both SMAs share the tail of the longer window
+            close = np.r_[state['tail'], data['close'].values]
+            skip = len(state['tail'])
+            data['SMA1'] = rolling_mean(close, self.sma1)[skip:]
+            data['SMA2'] = rolling_mean(close, self.sma2)[skip:]
+            state['tail'] = close[max(len(close) - max(self.sma1, self.sma2) + 1, 0):]
+            data = data.dropna()
+            if len(data) == 0:
+                continue
+            data['position'] = np.where(data['SMA1'] > data['SMA2'], 1, 0)
+            data['strategy'] = carry_shift(data['position'], state, 'position') * data['returns']
+            data['creturns'] = carry_cumsum(data['returns'], state, 'creturns').apply(np.exp)
+            data['cstrategy'] = carry_cumsum(data['strategy'], state, 'cstrategy').apply(np.exp)
+            yield data
+
+    def execute_strategy_chunked(self, chunks):
+        """
+        Run backtesting of strategy over stream of chunks in fixed memory
+        and return performance metrics as execute_strategy()
+        -only the results of the last chunk are kept in self.results
+
+        Parameters
+        ==========
+        chunks : iterable of DataFrame
+            consecutive chunks with 'close' column
+        """
+        results = None
+        for results in self.iter_strategy(chunks):
+            pass
+        self.results = results
+        return get_performance(results)
+
     def update_and_run(self, SMA):
         """
         Updates SMA parameters and negative absolute performance
@@ -169,6 +329,8 @@ class IndicatorSMA(object):
         rangeSMA1, rangeSMA2 : tuple
             range of SMA parameters of the form (start, end, step size)
         """
+        # imported here to keep scipy out of package import
+        from scipy.optimize import brute
         opt = brute(self.update_and_run, (rangeSMA1, rangeSMA2), finish=None)
         self.sma1, self.sma2 = int(opt[0]), int(opt[1])
         return opt, -self.update_and_run(opt)
@@ -196,6 +358,10 @@ class IndicatorMOM(object):
         recalculate results DataFrame based on current SMA parameters
     plot_results :
         plot results of strategy with current SMA parameters
+    iter_strategy :
+        run strategy over stream of chunks, yielding results of each chunk
+    execute_strategy_chunked :
+        run strategy over stream of chunks in fixed memory
     """
 
     def __init__(self, mom, dataset, symbol):
@@ -220,7 +386,8 @@ class IndicatorMOM(object):
         if new_dataset is None or \
                 isinstance(new_dataset, Dataset):
             self.__dataset = new_dataset
-            self.results = self.dataset.sample.copy()
+            # no dataset for chunked backtests
+            self.results = None if new_dataset is None else self.dataset.sample.copy()
         else:
             raise ValueError('Must be Dataset object or None')
 
@@ -244,8 +411,8 @@ class IndicatorMOM(object):
 
     @mom.setter
     def mom(self, new_mom):
-        if (isinstance(new_mom, int) and
-                1 < new_mom < len(self.dataset.sample)):
+        if (isinstance(new_mom, int) and 1 < new_mom and
+                (self.dataset is None or new_mom < len(self.dataset.sample))):
             self.__mom = new_mom
         else:
             raise ValueError('MOM must be greater than 1 and less than the size of the data')
@@ -261,7 +428,7 @@ class IndicatorMOM(object):
         Run vectorized backtesting of strategy and generate various performance metrics
         """
         data = self.results.copy().dropna()
-        data['position'] = np.sign(data['returns'].rolling(self.mom).mean())
+        data['position'] = np.sign(Series(rolling_mean(data['returns'], self.mom), index=data.index))
         data['strategy'] = data['position'].shift(1) * data['returns']
         # determine when trades take place
         # trades = data['position'].diff().fillna(0) != 0
@@ -289,6 +456,52 @@ class IndicatorMOM(object):
                 (self.symbol, self.mom, aperf, operf)
         self.results[['creturns', 'cstrategy']].plot(title=title, figsize=(10, 6))
 
+    def iter_strategy(self, chunks):
+        """
+        Run backtesting of strategy over stream of chunks
+        -rolling-window tail, last position and cumulative
+        returns are carried from one chunk to the next
+        -results are bit-identical to execute_strategy()
+
+        Parameters
+        ==========
+        chunks : iterable of DataFrame
+            consecutive chunks with 'close' column, e.g.
+            data.iter_datafile(..., columns=['close'])
+
+        Returns
+        =======
+        return : generator
+            results DataFrame of each chunk
+        """
+        state = new_chunk_state()
+        for chunk in chunks:
+            data = carry_returns(chunk, state).dropna()
+            if len(data) == 0:
+                continue
+            data['position'] = np.sign(carry_rolling_mean(data['returns'], self.mom, state, 'tail'))
+            data['strategy'] = carry_shift(data['position'], state, 'position') * data['returns']
+            data['creturns'] = carry_cumsum(data['returns'], state, 'creturns').apply(np.exp)
+            data['cstrategy'] = carry_cumsum(data['strategy'], state, 'cstrategy').apply(np.exp)
+            yield data
+
+    def execute_strategy_chunked(self, chunks):
+        """
+        Run backtesting of strategy over stream of chunks in fixed memory
+        and return performance metrics as execute_strategy()
+        -only the results of the last chunk are kept in self.results
+
+        Parameters
+        ==========
+        chunks : iterable of DataFrame
+            consecutive chunks with 'close' column
+        """
+        results = None
+        for results in self.iter_strategy(chunks):
+            pass
+        self.results = results
+        return get_performance(results)
+
     def update_and_run(self, MOM):
         """
         Updates MOM parameters and negative absolute performance
@@ -315,6 +528,7 @@ class IndicatorMOM(object):
         rangeMOM : tuple
             range of MOM parameter of the form (start, end, step size)
         """
+        from scipy.optimize import brute
         opt = brute(self.update_and_run, (rangeMOM, (0, 1, 1)), finish=None)
         self.mom = int(opt[0])
         return opt, -self.update_and_run(opt)
@@ -342,6 +556,10 @@ class IndicatorMR(object):
         recalculate results DataFrame based on current SMA parameters
     plot_results :
         plot results of strategy with current SMA parameters
+    iter_strategy :
+        run strategy over stream of chunks, yielding results of each chunk
+    execute_strategy_chunked :
+        run strategy over stream of chunks in fixed memory
     """
 
     def __init__(self, sma, threshold, dataset, symbol):
@@ -367,7 +585,8 @@ class IndicatorMR(object):
         if new_dataset is None or \
                 isinstance(new_dataset, Dataset):
             self.__dataset = new_dataset
-            self.results = self.dataset.sample.copy()
+            # no dataset for chunked backtests
+            self.results = None if new_dataset is None else self.dataset.sample.copy()
         else:
             raise ValueError('Must be Dataset object or None')
 
@@ -391,8 +610,8 @@ class IndicatorMR(object):
 
     @sma.setter
     def sma(self, new_sma):
-        if (isinstance(new_sma, int) and
-                1 < new_sma < len(self.dataset.sample)):
+        if (isinstance(new_sma, int) and 1 < new_sma and
+                (self.dataset is None or new_sma < len(self.dataset.sample))):
             self.__sma = new_sma
         else:
             raise ValueError('SMA must be greater than 1 and less than the size of the data')
@@ -421,7 +640,7 @@ class IndicatorMR(object):
         Run vectorized backtesting of strategy and generate various performance metrics
         """
         data = self.results.copy().dropna()
-        data['sma'] = data['returns'].rolling(self.sma).mean()
+        data['sma'] = Series(rolling_mean(data['returns'], self.sma), index=data.index)
         data['distance'] = data['close'] - data['sma']
         # sell signals
         data['position'] = np.where(data['distance'] > self.threshold, -1, np.nan)
@@ -457,6 +676,66 @@ class IndicatorMR(object):
                 (self.symbol, self.sma, self.threshold, aperf, operf)
         self.results[['creturns', 'cstrategy']].plot(title=title, figsize=(10, 6))
 
+    def iter_strategy(self, chunks):
+        """
+        Run backtesting of strategy over stream of chunks
+        -rolling-window tail, last position and cumulative
+        returns are carried from one chunk to the next
+        -results are bit-identical to execute_strategy()
+
+        Parameters
+        ==========
+        chunks : iterable of DataFrame
+            consecutive chunks with 'close' column, e.g.
+            data.iter_datafile(..., columns=['close'])
+
+        Returns
+        =======
+        return : generator
+            results DataFrame of each chunk
+        """
+        state = new_chunk_state()
+        for chunk in chunks:
+            data = carry_returns(chunk, state).dropna()
+            if len(data) == 0:
+                continue
+            data['sma'] = carry_rolling_mean(data['returns'], self.sma, state, 'tail')
+            data['distance'] = data['close'] - data['sma']
+            # sell signals
+            data['position'] = np.where(data['distance'] > self.threshold, -1, np.nan)
+            # buy signals
+            data['position'] = np.where(data['distance'] < -self.threshold, 1, data['position'])
+            # cross of current price and SMA (zero distance)
+            previous = carry_shift(data['distance'], state, 'distance')
+            data['position'] = np.where(data['distance'] * previous < 0, 0, data['position'])
+            # fill forward from last signal of previous chunk
+            if np.isnan(data['position'].iloc[0]):
+                data.loc[data.index[0], 'position'] = state['filled']
+            data['position'] = data['position'].ffill()
+            state['filled'] = data['position'].iloc[-1]
+            data['position'] = data['position'].fillna(0)
+            data['strategy'] = carry_shift(data['position'], state, 'position') * data['returns']
+            data['creturns'] = carry_cumsum(data['returns'], state, 'creturns').apply(np.exp)
+            data['cstrategy'] = carry_cumsum(data['strategy'], state, 'cstrategy').apply(np.exp)
+            yield data
+
+    def execute_strategy_chunked(self, chunks):
+        """
+        Run backtesting of strategy over stream of chunks in fixed memory
+        and return performance metrics as execute_strategy()
+        -only the results of the last chunk are kept in self.results
+
+        Parameters
+        ==========
+        chunks : iterable of DataFrame
+            consecutive chunks with 'close' column
+        """
+        results = None
+        for results in self.iter_strategy(chunks):
+            pass
+        self.results = results
+        return get_performance(results)
+
     def update_and_run(self, SMAthreshold):
         """
         Updates MOM parameters and negative absolute performance
@@ -482,6 +761,7 @@ class IndicatorMR(object):
         rangeThreshold : tuple
             range of MOM parameter of the form (start, end, step size)
         """
+        from scipy.optimize import brute
         opt = brute(self.update_and_run, (rangeMR, rangeThreshold), finish=None)
         self.sma = int(opt[0])
         self.threshold = opt[1]
@@ -0,0 +1,8 @@
+#
+# PyAlgoGem Project
+# strategy/tests/
+#
+# tests of datasets and indicators
+#
+# Andrew Edmonds - 2018
+#
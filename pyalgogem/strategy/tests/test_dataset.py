@@ -0,0 +1,53 @@
+#
+# PyAlgoGem Project
+# strategy/tests/test_dataset
+#
+# tests of Dataset objects
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pandas as pd
+
+from pyalgogem.strategy import Dataset
+
+
+def load_memmaps(tmpdir, columns):
+    """Arrays as returned by data.load_mirror(): one memory-mapped .npy file per column"""
+    values = {'timestamp': np.arange(100, dtype=np.int64) * 60000}
+    values.update({col: np.linspace(1, 2, 100) + i for i, col in enumerate(columns)})
+    arrays = dict()
+    for col, array in values.items():
+        path = str(tmpdir.join(col + '.npy'))
+        np.save(path, array)
+        arrays[col] = np.load(path, mmap_mode='r')
+    return arrays
+
+
+def test_memmap_columns_are_not_copied(tmpdir):
+    arrays = load_memmaps(tmpdir, ['close', 'high', 'low'])
+    dataset = Dataset.from_memmap(arrays)
+    for col in ['close', 'high', 'low']:
+        assert np.shares_memory(dataset.get_column(col).values, arrays[col])
+    assert dataset.sample.index[1] == pd.Timestamp('1970-01-01 00:01')
+    assert np.allclose(dataset.sample['returns'].values[1:], np.log(arrays['close'][1:] /
+                                                                     arrays['close'][:-1]))
+    # building raw does not detach the columns from the arrays
+    assert list(dataset.raw.columns) == ['close', 'high', 'low']
+    assert np.shares_memory(dataset.get_column('close').values, arrays['close'])
+
+
+def test_single_column_raw_is_a_view(tmpdir):
+    arrays = load_memmaps(tmpdir, ['close'])
+    dataset = Dataset.from_memmap(arrays)
+    assert np.shares_memory(dataset.raw['close'].values, arrays['close'])
+
+
+def test_setting_raw_replaces_memmap(tmpdir):
+    dataset = Dataset.from_memmap(load_memmaps(tmpdir, ['close']))
+    dataset.raw = pd.DataFrame({'close': [1., 2., 4.]})
+    assert list(dataset.get_column('close')) == [1., 2., 4.]
+    assert np.allclose(dataset.sample['returns'].values[1:], np.log(2))
+    dataset.raw = None
+    assert dataset.sample is None
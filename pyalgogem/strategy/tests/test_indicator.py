@@ -0,0 +1,63 @@
+#
+# PyAlgoGem Project
+# strategy/tests/test_indicator
+#
+# tests of chunked backtesting of indicators
+#
+# Andrew Edmonds - 2018
+#
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyalgogem.strategy import Dataset, IndicatorMOM, IndicatorMR, IndicatorSMA
+from pyalgogem.strategy._indicator import rolling_mean
+
+COLUMNS = ['position', 'strategy', 'creturns', 'cstrategy']
+
+
+def make_prices(periods=2000, seed=0):
+    close = 1000 * np.exp(np.cumsum(np.random.RandomState(seed).normal(0, 0.01, periods)))
+    return pd.DataFrame({'close': close}, index=pd.date_range('2018-01-01', periods=periods,
+                                                              freq='min'))
+
+
+def split_chunks(data, size):
+    return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('make_indicator', [
+    lambda dataset: IndicatorSMA(10, 50, dataset, 'BTC'),
+    lambda dataset: IndicatorMOM(20, dataset, 'BTC'),
+    lambda dataset: IndicatorMR(30, 0.5, dataset, 'BTC')])
+def test_chunked_results_match_full_run(make_indicator):
+    prices = make_prices()
+    indicator = make_indicator(Dataset(prices))
+    indicator.reset_results()
+    performance = indicator.execute_strategy()
+    expected = indicator.results
+    # chunks shorter than the rolling windows carry their tail
+    for size in [7, 333]:
+        chunked = make_indicator(None)
+        results = pd.concat(list(chunked.iter_strategy(split_chunks(prices, size))))
+        assert (results.index == expected.index).all()
+        for column in COLUMNS:
+            np.testing.assert_array_equal(results[column].values, expected[column].values)
+        assert chunked.execute_strategy_chunked(split_chunks(prices, size)) == performance
+
+
+def test_chunked_run_without_enough_data_raises():
+    indicator = IndicatorSMA(10, 50, None, 'BTC')
+    with pytest.raises(ValueError):
+        indicator.execute_strategy_chunked(split_chunks(make_prices(40), 10))
+
+
+def test_rolling_mean_matches_pandas():
+    values = np.random.RandomState(0).normal(0, 1, 500)
+    for window in [1, 2, 7, 64, 100]:
+        expected = pd.Series(values).rolling(window).mean().values
+        assert np.allclose(rolling_mean(values, window), expected, equal_nan=True)
+    # means of chunks carrying the last window - 1 values are bit-identical
+    means = rolling_mean(values, 7)
+    assert np.array_equal(rolling_mean(values[294:], 7)[6:], means[300:])
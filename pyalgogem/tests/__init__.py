@@ -0,0 +1,8 @@
+#
+# PyAlgoGem Project
+# tests/
+#
+# tests of the package itself
+#
+# Andrew Edmonds - 2018
+#
@@ -0,0 +1,47 @@
+#
+# PyAlgoGem Project
+# tests/test_lazy_loader
+#
+# tests of lazy imports of package attributes
+#
+# Andrew Edmonds - 2018
+#
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+import pyalgogem
+
+# third-party modules importing the packages must not load
+HEAVY_MODULES = ['pandas', 'numpy', 'tables', 'tstables', 'requests', 'scipy', 'pyarrow',
+                 'aiohttp', 'websocket']
+
+
+def get_loaded_modules(statement):
+    """Heavy modules loaded by statement in a fresh interpreter"""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get('PYTHONPATH', '')]))
+    script = '{}\nimport sys, json\nprint(json.dumps([name for name in {!r} if name in sys.modules]))'
+    output = subprocess.check_output([sys.executable, '-c', script.format(statement, HEAVY_MODULES)],
+                                     env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def test_import_does_not_load_dependencies():
+    assert get_loaded_modules('import pyalgogem') == []
+    assert get_loaded_modules('import pyalgogem.base, pyalgogem.data, pyalgogem.deploy, '
+                              'pyalgogem.performance, pyalgogem.strategy') == []
+
+
+def test_attributes_load_on_first_access():
+    assert 'requests' in get_loaded_modules('import pyalgogem.deploy; pyalgogem.deploy.GeminiAPI')
+    from pyalgogem.data import read_datafile
+    from pyalgogem.data._hdf5_access import read_datafile as loaded
+    assert read_datafile is loaded
+    assert 'read_datafile' in dir(pyalgogem.data)
+    assert 'AlgorithmEnvironment' in pyalgogem.__all__
+    with pytest.raises(AttributeError):
+        pyalgogem.data.missing_attribute